@@ -0,0 +1,206 @@
+from array import array as _array
+import hashlib as _hashlib
+import mmap as _mmap
+import os as _os
+import struct as _struct
+import sys as _sys
+
+from .token import *
+
+
+__all__ = ["CSSTokenCache"]
+
+
+class CSSTokenCache:
+
+    # file layout (little endian, each section starts at a multiple of 8):
+    #   header
+    #   kinds          B * tokens   CSSToken.Type values
+    #   starts, ends   q * tokens   offsets in the input (as given, before preprocessing)
+    #   numbers        d * numeric tokens
+    #   field starts   I * (tokens + 1)
+    #   fields         i * fields   string ids, -1 for None
+    #   error codes    i * errors   string ids
+    #   error offsets  q * errors
+    #   string starts  Q * (strings + 1)
+    #   strings        utf-8
+    #
+    # the fields of a token are its slots in order (spans are read as
+    # strings), except the value of numeric tokens which is in numbers,
+    # the errors are the parse errors in the order they were reported
+
+    magic = b"NRCT"
+    version = 3
+
+    # magic, version, reserved, key, tokens, numeric tokens, fields, errors, strings
+    header = _struct.Struct("<4sHH32sQQQQQ")
+
+    numeric_types = (CSSToken.Type.NUMBER, CSSToken.Type.PERCENTAGE, CSSToken.Type.DIMENSION)
+
+    def __init__(self, directory: str):
+
+        self.directory = directory
+        _os.makedirs(directory, exist_ok=True)
+
+        # token classes by type, to rebuild the tokens
+        self.token_classes = {cls.tok_type: cls for cls in CSSToken.__subclasses__()}
+
+
+    @staticmethod
+    def key(css_text: str) -> bytes:
+
+        return _hashlib.sha256(css_text.encode("utf-8", "surrogatepass")).digest()
+
+
+    def path(self, key: bytes) -> str:
+
+        return _os.path.join(self.directory, key.hex() + ".tokens")
+
+
+    @staticmethod
+    def _padding(length: int) -> bytes:
+
+        return bytes(-length % 8)
+
+
+    def write(self, key: bytes, tokens: list[CSSToken], spans: _array, errors: list[tuple[str, int]]):
+
+        # spans are the start and end offsets of the tokens one after another,
+        # errors the parse errors as (code, offset)
+        kinds = _array("B")
+        numbers = _array("d")
+        field_starts = _array("I", [0])
+        fields = _array("i")
+        error_codes = _array("i")
+        error_offsets = _array("q")
+
+        string_ids: dict[str, int] = {}
+
+        for token in tokens:
+
+            tok_type = token.tok_type
+
+            for slot in token.__slots__:
+                value = getattr(token, slot.lstrip("_"))
+
+                if slot == "value" and tok_type in self.numeric_types:
+                    numbers.append(value)
+                    value = None
+
+                if value is None:
+                    fields.append(-1)
+                    continue
+
+                id_ = string_ids.get(value)
+                if id_ is None:
+                    id_ = string_ids[value] = len(string_ids)
+                fields.append(id_)
+
+            kinds.append(tok_type.value)
+            field_starts.append(len(fields))
+
+        for code, offset in errors:
+            error_codes.append(string_ids.setdefault(code, len(string_ids)))
+            error_offsets.append(offset)
+
+        encoded = [string.encode("utf-8", "surrogatepass") for string in string_ids]
+
+        string_starts = _array("Q", [0])
+        for string in encoded:
+            string_starts.append(string_starts[-1] + len(string))
+
+        path = self.path(key)
+        temp_path = f"{path}.{_os.getpid()}.tmp"
+
+        with open(temp_path, "wb") as f:
+
+            f.write(self.header.pack(self.magic, self.version, 0, key, len(kinds), len(numbers), len(fields), len(error_codes), len(encoded)))
+
+            for column in (kinds, spans[0::2], spans[1::2], numbers, field_starts, fields, error_codes, error_offsets, string_starts):
+                if _sys.byteorder == "big":
+                    column = _array(column.typecode, column)
+                    column.byteswap()
+                data = column.tobytes()
+                f.write(data + self._padding(len(data)))
+
+            f.write(b"".join(encoded))
+
+        # readers never see a half written file
+        _os.replace(temp_path, path)
+
+
+    def read(self, key: bytes, tokenizer: "CSSTokenizer") -> None|list[CSSToken]:
+
+        # the cached tokens, None if there is no entry or it is stale, the
+        # parse errors are reported to the sink of the tokenizer (its
+        # css_text is the input, to count the lines)
+        try:
+            f = open(self.path(key), "rb")
+        except FileNotFoundError:
+            return None
+
+        with f:
+            try:
+                mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            except ValueError:
+                return None # empty file
+
+        with mapped:
+
+            if len(mapped) < self.header.size:
+                return None
+
+            magic, version, _, file_key, token_count, number_count, field_count, error_count, string_count = self.header.unpack_from(mapped)
+
+            if (magic, version, file_key) != (self.magic, self.version, key):
+                return None
+
+            with memoryview(mapped) as view:
+                return self._replay(view, tokenizer, token_count, number_count, field_count, error_count, string_count)
+
+
+    def _replay(self, view: memoryview, tokenizer: "CSSTokenizer", token_count: int, number_count: int, field_count: int, error_count: int, string_count: int) -> list[CSSToken]:
+
+        columns = []
+        offset = self.header.size
+
+        for typecode, length in (("B", token_count), ("q", token_count), ("q", token_count), ("d", number_count),
+                                 ("I", token_count + 1), ("i", field_count), ("i", error_count), ("q", error_count), ("Q", string_count + 1)):
+
+            size = _array(typecode).itemsize * length
+
+            # copied out of the map, the map is closed when read() returns
+            column = _array(typecode, view[offset:offset+size].tobytes())
+            if _sys.byteorder == "big":
+                column.byteswap()
+
+            columns.append(column)
+            offset += size + len(self._padding(size))
+
+        kinds, _, _, numbers, field_starts, fields, error_codes, error_offsets, string_starts = columns
+        blob = view[offset:]
+
+        strings = [str(blob[string_starts[i]:string_starts[i+1]], "utf-8", "surrogatepass") for i in range(string_count)]
+
+        numbers = iter(numbers)
+
+        tokens = []
+        for i in range(token_count):
+
+            tok_type = CSSToken.Type(kinds[i])
+            cls = self.token_classes[tok_type]
+            token = cls.__new__(cls)
+
+            for slot, id_ in zip(cls.__slots__, fields[field_starts[i]:field_starts[i+1]]):
+                setattr(token, slot, strings[id_] if id_ != -1 else None)
+
+            if tok_type in self.numeric_types:
+                token.value = next(numbers)
+
+            tokens.append(token)
+
+        for code, offset in zip(error_codes, error_offsets):
+            tokenizer.errors.report(strings[code], tokenizer.css_text, offset)
+
+        blob.release()
+        return tokens
@@ -0,0 +1,105 @@
+from array import array as _array
+from typing import Generator as _Generator
+
+from .token import *
+
+
+__all__ = ["CSSTokenColumns"]
+
+
+class CSSTokenColumns:
+
+    # tokens as a struct of arrays, one entry per token in each column
+
+    # flags
+    ID     = 1 # hash token with "id" type
+    NUMBER = 2 # numeric token with "number" type
+
+    # tokens whose value is a name
+    named_types = (CSSToken.Type.IDENT, CSSToken.Type.FUNCTION, CSSToken.Type.AT_KEYWORD, CSSToken.Type.HASH)
+
+    def __init__(self, previous: "CSSTokenColumns" = None):
+
+        self.kinds   = _array("B") # CSSToken.Type values
+        self.starts  = _array("q") # offsets in the input
+        self.ends    = _array("q")
+        self.names   = _array("q") # name (or dimension unit) ids, -1 if none
+        self.numbers = _array("d") # numeric values, nan if none
+        self.flags   = _array("B")
+
+        # names by id, shared with the previous batch (if any)
+        self.name_table: list[str] = []
+        self.name_ids: dict[str, int] = {}
+
+        if previous is not None:
+            self.name_table = previous.name_table
+            self.name_ids = previous.name_ids
+
+
+    def __len__(self):
+
+        return len(self.kinds)
+
+
+    def __iter__(self) -> _Generator[tuple[int, int, int, int], None, None]:
+
+        # (kind, start, end, name id) rows, no token objects
+        return zip(self.kinds, self.starts, self.ends, self.names)
+
+
+    def __getitem__(self, index: int) -> tuple[CSSToken.Type, int, int, None|str]:
+
+        name = self.names[index]
+        return (
+            CSSToken.Type(self.kinds[index]),
+            self.starts[index],
+            self.ends[index],
+            self.name_table[name] if name != -1 else None,
+        )
+
+
+    def __repr__(self):
+
+        return f"CSSTokenColumns(tokens={len(self)}, names={len(self.name_table)})"
+
+
+    def _intern(self, name: str) -> int:
+
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.name_table)
+            self.name_table.append(name)
+
+        return name_id
+
+
+    def append(self, token: CSSToken, start: int, end: int):
+
+        tok_type = token.tok_type
+        name = -1
+        number = float("nan")
+        flags = 0
+
+        if tok_type in self.named_types:
+            name = self._intern(token.value)
+            if tok_type is CSSToken.Type.HASH and token.type == "id":
+                flags = self.ID
+
+        elif tok_type in (CSSToken.Type.NUMBER, CSSToken.Type.PERCENTAGE, CSSToken.Type.DIMENSION):
+            number = token.value
+            if tok_type is CSSToken.Type.DIMENSION:
+                name = self._intern(token.unit)
+            if tok_type is not CSSToken.Type.PERCENTAGE and token.type == "number":
+                flags = self.NUMBER
+
+        self.kinds.append(tok_type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.names.append(name)
+        self.numbers.append(number)
+        self.flags.append(flags)
+
+
+    def count(self, kind: CSSToken.Type) -> int:
+
+        return self.kinds.count(kind.value)
@@ -0,0 +1,117 @@
+from enum import Enum as _Enum, auto as _auto
+import logging as _logging
+
+
+__all__ = ["CSSParseError", "CSSParseErrors"]
+
+
+class CSSParseError:
+
+    def __init__(self, code: str, offset: int, line: int, column: int):
+
+        self.code = code
+
+        # position in the input, line and column start from 1
+        self.offset = offset
+        self.line = line
+        self.column = column
+
+
+    def __repr__(self):
+
+        return f"CSSParseError(code={self.code!r}, offset={self.offset}, line={self.line}, column={self.column})"
+
+
+class CSSParseErrors:
+
+    class Mode(_Enum):
+
+        OFF     = _auto() # ignore
+        COUNT   = _auto() # only count
+        COLLECT = _auto() # keep a record of each
+        LOG     = _auto() # count and log every n-th
+
+
+    logger = _logging.getLogger("CSS")
+
+    def __init__(self, mode: "CSSParseErrors.Mode" = Mode.COUNT, log_every: int = 100):
+
+        self.mode = mode
+        self.log_every = log_every
+
+        # the output
+        self.count = 0
+        self.errors: list[CSSParseError] = []
+
+        # lines are counted up to this offset
+        self.line_offset = 0
+        self.line = 1
+        self.line_start = 0
+
+        # no work per error for the modes that do not need it
+        self.report = getattr(self, f"_report_{mode.name.lower()}")
+
+
+    def __repr__(self):
+
+        return f"CSSParseErrors(mode={self.mode.name}, count={self.count})"
+
+
+    def __len__(self):
+
+        return self.count
+
+
+    def __iter__(self):
+
+        return iter(self.errors)
+
+
+    def _record(self, code: str, text: str, i: int) -> CSSParseError:
+
+        # errors come in order, count the lines from the previous one
+        if i > self.line_offset:
+
+            start = self.line_offset
+
+            # "\r\n", "\r", "\f" and "\n" end a line, the "\n" of "\r\n" is
+            # counted (even if it is text[i] and comes with the next lines)
+            newlines = text.count("\n", start, i) + text.count("\f", start, i)
+            if text.find("\r", start, i) != -1:
+                newlines += text.count("\r", start, i) - text.count("\r\n", start, i + 1)
+
+            if newlines:
+                self.line += newlines
+                last = max(text.rfind("\n", start, i), text.rfind("\r", start, i), text.rfind("\f", start, i))
+                if text.startswith("\r\n", last):
+                    last = max(text.rfind("\n", start, last), text.rfind("\r", start, last), text.rfind("\f", start, last))
+                self.line_start = last + 1
+
+            self.line_offset = i
+
+        return CSSParseError(code, i, self.line, max(i - self.line_start, 0) + 1)
+
+
+    def _report_off(self, code: str, text: str, i: int):
+
+        pass
+
+
+    def _report_count(self, code: str, text: str, i: int):
+
+        self.count += 1
+
+
+    def _report_collect(self, code: str, text: str, i: int):
+
+        self.count += 1
+        self.errors.append(self._record(code, text, i))
+
+
+    def _report_log(self, code: str, text: str, i: int):
+
+        self.count += 1
+
+        if self.count % self.log_every == 1 or self.log_every == 1:
+            error = self._record(code, text, i)
+            self.logger.warning("Parse error: %s at %d:%d (%d errors so far)", code, error.line, error.column, self.count)
@@ -1,6 +1,8 @@
 from enum import Enum as _Enum, auto as _auto
 from typing import Literal as _Literal
 
+from HTML.span import HTMLSpan as CSSSpan
+
 
 class CSSToken:
     
@@ -33,220 +35,263 @@ class CSSToken:
         RIGHT_BRACE   = _auto()
         EOF           = _auto() # (it is a conceptual token)
     
-    type: Type
+    # the type is a class attribute and the fields are slots,
+    # so tokens have no __dict__ (a field behind a property is in
+    # a slot with a leading underscore)
+    __slots__ = ()
+    
+    tok_type: Type
     
     def __repr__(self):
         
-        attributes = {key: getattr(self, key) for key in self.__dict__ if not key.startswith('__') and not callable(getattr(self, key))}
-        attr_strings = ", ".join(f"{key}={value!r}" for key, value in attributes.items())
+        attr_strings = ", ".join(f"{key}={getattr(self, key)!r}" for key in tuple(key.lstrip("_") for key in self.__slots__) + ("tok_type",))
         
         return f"CSSToken({attr_strings})"
 
 
 class CSSTokenIdent(CSSToken):
     
+    tok_type = CSSToken.Type.IDENT
+    __slots__ = ("value",)
+    
     def __init__(self, value: str = None):
         
         self.value = value
-        self.tok_type = self.Type.IDENT
 
 
 class CSSTokenFunction(CSSToken):
     
+    tok_type = CSSToken.Type.FUNCTION
+    __slots__ = ("value",)
+    
     def __init__(self, value: str = None):
         
         self.value = value
-        self.tok_type = self.Type.FUNCTION
 
 
 class CSSTokenAtKeyword(CSSToken):
     
+    tok_type = CSSToken.Type.AT_KEYWORD
+    __slots__ = ("value",)
+    
     def __init__(self):
         
         self.value: None|str = None
-        self.tok_type = self.Type.AT_KEYWORD
 
 
 class CSSTokenHash(CSSToken):
     
+    tok_type = CSSToken.Type.HASH
+    __slots__ = ("value", "type")
+    
     def __init__(self, value: str = None):
         
         self.value = value
         self.type: _Literal["id", "unrestricted"] = "unrestricted"
-        
-        self.tok_type = self.Type.HASH
 
 
 class CSSTokenString(CSSToken):
     
-    def __init__(self, value: None|str = None):
+    tok_type = CSSToken.Type.STRING
+    __slots__ = ("_value",)
+    
+    def __init__(self, value: None|str|CSSSpan = None):
         
-        self.value = value
-        self.tok_type = self.Type.STRING
+        self._value = value
+    
+    
+    @property
+    def value(self) -> None|str:
+        
+        # the value may be a span of the input until it is read
+        if type(self._value) is CSSSpan:
+            self._value = str(self._value)
+        
+        return self._value
+    
+    
+    @value.setter
+    def value(self, value: None|str|CSSSpan):
+        
+        self._value = value
 
 
 class CSSTokenBadString(CSSToken):
     
+    tok_type = CSSToken.Type.BAD_STRING
+    __slots__ = ("value",)
+    
     def __init__(self):
         
         self.value: None|str = None
-        self.tok_type = self.Type.BAD_STRING
 
 
 class CSSTokenUrl(CSSToken):
     
-    def __init__(self, value: str = None):
+    tok_type = CSSToken.Type.URL
+    __slots__ = ("_value",)
+    
+    def __init__(self, value: str|CSSSpan = None):
         
-        self.value = value
-        self.tok_type = self.Type.URL
+        self._value = value
+    
+    
+    @property
+    def value(self) -> None|str:
+        
+        # the value may be a span of the input until it is read
+        if type(self._value) is CSSSpan:
+            self._value = str(self._value)
+        
+        return self._value
+    
+    
+    @value.setter
+    def value(self, value: None|str|CSSSpan):
+        
+        self._value = value
 
 
 class CSSTokenBadUrl(CSSToken):
     
+    tok_type = CSSToken.Type.BAD_URL
+    __slots__ = ("value",)
+    
     def __init__(self):
         
         self.value: None|str = None
-        self.tok_type = self.Type.BAD_URL
 
 
 class CSSTokenDelim(CSSToken):
     
+    tok_type = CSSToken.Type.DELIM
+    __slots__ = ("value",)
+    
     def __init__(self, value: None|str = None):
         
         self.value = value
-        self.tok_type = self.Type.DELIM
 
 
 class CSSTokenNumber(CSSToken):
     
+    tok_type = CSSToken.Type.NUMBER
+    __slots__ = ("value", "type", "sign_character")
+    
     def __init__(self):
         
         self.value: None|int|float = None
         self.type: _Literal["integer", "number"] = "integer"
         self.sign_character: _Literal["+", "-"]|None = None
-        
-        self.tok_type = self.Type.NUMBER
 
 
 class CSSTokenPercentage(CSSToken):
     
+    tok_type = CSSToken.Type.PERCENTAGE
+    __slots__ = ("value", "sign_character")
+    
     def __init__(self):
                 
         self.value: None|int|float = None
         self.sign_character: _Literal["+", "-"]|None = None
-        
-        self.tok_type = self.Type.PERCENTAGE
 
 
 class CSSTokenDimension(CSSToken):
     
+    tok_type = CSSToken.Type.DIMENSION
+    __slots__ = ("value", "type", "sign_character", "unit")
+    
     def __init__(self):
                 
         self.value: None|int|float = None
         self.type: _Literal["integer", "number"] = "integer"
         self.sign_character: _Literal["+", "-"]|None = None
         self.unit: None|str = None
-        
-        self.tok_type = self.Type.DIMENSION
 
 
 class CSSTokenUnicodeRange(CSSToken):
     
+    tok_type = CSSToken.Type.UNICODE_RANGE
+    __slots__ = ("starting", "ending")
+    
     def __init__(self):
                 
         self.starting: None|str = None
         self.ending: None|str = None
         
-        self.tok_type = self.Type.UNICODE_RANGE
-        
 
 class CSSTokenWhitespace(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.WHITESPACE
+    tok_type = CSSToken.Type.WHITESPACE
+    __slots__ = ()
 
 
 class CSSTokenCDO(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.CDO
+    tok_type = CSSToken.Type.CDO
+    __slots__ = ()
 
 
 class CSSTokenCDC(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.CDC
+    tok_type = CSSToken.Type.CDC
+    __slots__ = ()
 
 
 class CSSTokenColon(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.COLON
+    tok_type = CSSToken.Type.COLON
+    __slots__ = ()
 
 
 class CSSTokenSemicolon(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.SEMICOLON
+    tok_type = CSSToken.Type.SEMICOLON
+    __slots__ = ()
 
 
 class CSSTokenComma(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.COMMA
+    tok_type = CSSToken.Type.COMMA
+    __slots__ = ()
 
 
 class CSSTokenLeftSquare(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.LEFT_SQUARE
-        
+    tok_type = CSSToken.Type.LEFT_SQUARE
+    __slots__ = ()
+
 
 class CSSTokenRightSquare(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.RIGHT_SQUARE
+    tok_type = CSSToken.Type.RIGHT_SQUARE
+    __slots__ = ()
 
 
 class CSSTokenLeftParen(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.LEFT_PAREN
+    tok_type = CSSToken.Type.LEFT_PAREN
+    __slots__ = ()
 
 
 class CSSTokenRightParen(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.RIGHT_PAREN
+    tok_type = CSSToken.Type.RIGHT_PAREN
+    __slots__ = ()
 
 
 class CSSTokenLeftBrace(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.LEFT_BRACE
+    tok_type = CSSToken.Type.LEFT_BRACE
+    __slots__ = ()
 
 
 class CSSTokenRightBrace(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.RIGHT_BRACE
+    tok_type = CSSToken.Type.RIGHT_BRACE
+    __slots__ = ()
 
 
 class CSSTokenEOF(CSSToken):
     
-    def __init__(self):
-        
-        self.tok_type = self.Type.EOF
-        
\ No newline at end of file
+    tok_type = CSSToken.Type.EOF
+    __slots__ = ()
@@ -1,14 +1,34 @@
+from array import array as _array
+import re as _re
 from typing import Literal as _Literal
 from decimal import Decimal as _Decimal
 
 from .token import *
+from .error import *
+from .columns import *
+from .cache import *
 
 
 class CSSTokenizer:
         
     ascii_alpha = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    
+    # see https://www.w3.org/TR/css-syntax-3/#input-preprocessing
+    # the code points are replaced as they are consumed, so the input is
+    # not copied and offsets are in the input as given ("\r\n" is one "\n")
+    preprocessed = {"\r": "\n", "\f": "\n", "\0": u"\ufffd"}
+    
+    # runs of code points that are the value of a string or url as they are,
+    # the value is a span of the input if it is only such code points and
+    # at least span_min_length long (a shorter slice is smaller than the span)
+    string_runs = {
+        "\"": _re.compile(r"[^\"\\\n\r\f\0]*"),
+        "'": _re.compile(r"[^'\\\n\r\f\0]*"),
+    }
+    url_run = _re.compile(r"[^)\t\n\r\f \"'(\\\x00-\x08\x0b\x0e-\x1f\x7f]*")
+    span_min_length = 64
 
-    def __init__(self):
+    def __init__(self, errors: CSSParseErrors = None):
         
         self.unicode_ranges_allowed = True
         
@@ -20,6 +40,19 @@ class CSSTokenizer:
         
         # the output
         self.tokens: list[CSSToken] = []
+        
+        # the output of run_columns(), instead of tokens
+        self.columns: CSSTokenColumns = None
+        self.token_start = 0
+        
+        # start and end offsets of the tokens (only to cache them)
+        self.spans: _array = None
+        
+        # parse errors (count only by default)
+        self.errors = errors if errors is not None else CSSParseErrors()
+        
+        # the parse errors as (code, offset) are added to it if it is a list (only to cache them)
+        self.error_log: list[tuple[str, int]] = None
     
     
     def whitespace(self, c: str): return (len(c) == 1 and c in "\n\t ")
@@ -92,6 +125,12 @@ class CSSTokenizer:
         
         point = self.css_text[self.i]
         self.i += 1
+        
+        if point in "\r\f\0":
+            if point == "\r" and self.css_text.startswith("\n", self.i):
+                self.i += 1
+            point = self.preprocessed[point]
+        
         return point
     
     
@@ -102,8 +141,19 @@ class CSSTokenizer:
         # so, if next code point is requested, n should be = 0
         # and for the second next code point n = 1 ...
         
-        if self.i+n < len(self.css_text):
-            return self.css_text[self.i+n]
+        j = self.i + n
+        
+        if n > 0 and self.css_text.find("\r\n", self.i, j + 1) != -1:
+            # "\r\n" on the way is one code point
+            j = self.i
+            for _ in range(n):
+                j += 2 if self.css_text.startswith("\r\n", j) else 1
+        
+        if j < len(self.css_text):
+            point = self.css_text[j]
+            if point in "\r\f\0":
+                point = self.preprocessed[point]
+            return point
     
         else: return "EOF"
 
@@ -115,14 +165,14 @@ class CSSTokenizer:
             self.i += 2 # consume "/*"
             
             # consume until EOF or comment end
-            while self.i != len(self.css_text) and not (self._nth_next_code_point(0) == "*" and self._nth_next_code_point(1) == "/"):
-                self.i += 1
+            end = self.css_text.find("*/", self.i)
             
-            if self.i == len(self.css_text):
-                self._parse_error()
+            if end == -1:
+                self.i = len(self.css_text)
+                self._parse_error("eof-in-comment")
             
             else:
-                self.i += 2 # consume "*/"
+                self.i = end + 2 # consume "*/"
                 
         # else not a comment: pass
         
@@ -171,7 +221,7 @@ class CSSTokenizer:
             
             while self.whitespace(self._nth_next_code_point(0)) and self.whitespace(self._nth_next_code_point(1)):
                 # consume next
-                self.i += 1
+                self._consume_next_code_point()
             
             if self._nth_next_code_point(0) in "\"'" or (self.whitespace(self._nth_next_code_point(0)) and self._nth_next_code_point(1) in "\"'"):
                 
@@ -194,33 +244,55 @@ class CSSTokenizer:
             ending_code_point = self.css_text[self.i-1] # current code point
         
         token = CSSTokenString("")
+        run = self.string_runs[ending_code_point]
+        
+        # the value is token.value and then css_text[start:end]
+        start = self.i
         
         while 1:
+            # consume the code points that are taken as they are
+            self.i = run.match(self.css_text, self.i).end()
+            end = self.i
+            
             # consume next code point
             c = self._consume_next_code_point()
             
             if c == ending_code_point:
+                token.value = self._span_value(token.value, start, end)
                 return token
         
             elif c == "EOF":
-                self._parse_error()
+                self._parse_error("eof-in-string")
+                token.value = self._span_value(token.value, start, end)
                 return token
         
             elif c == "\n":
-                self._parse_error()
+                self._parse_error("newline-in-string")
                 self._reconsume()
                 return CSSTokenBadString()
 
             elif c == "\\":
+                token.value += self.css_text[start:end]
                 if self._nth_next_code_point(0) == "EOF":
                     pass # do nothing
                 elif self._nth_next_code_point(0) == "\n":
-                    self.i += 1 # consume "\n"
+                    self._consume_next_code_point() # consume "\n"
                 else:
                     token.value += self._consume_escaped_code_point()
+                start = self.i
             
             else:
-                token.value += c
+                token.value += self.css_text[start:end] + c
+                start = self.i
+    
+    
+    def _span_value(self, value: str, start: int, end: int) -> str|CSSSpan:
+        
+        # value and then css_text[start:end], not copied if value is empty
+        if value or end - start < self.span_min_length:
+            return value + self.css_text[start:end]
+        
+        return CSSSpan(self.css_text, start, end)
         
     
     def _consume_url_token(self) -> CSSTokenUrl|CSSTokenBadUrl:
@@ -230,50 +302,62 @@ class CSSTokenizer:
         
         # consume as much whitespace as possible
         while self.whitespace(self._nth_next_code_point(0)):
-            self.i += 1
+            self._consume_next_code_point()
+        
+        # the value is token.value and then css_text[start:end]
+        start = self.i
         
         while 1:
+            # consume the code points that are taken as they are
+            self.i = self.url_run.match(self.css_text, self.i).end()
+            end = self.i
+            
             c = self._consume_next_code_point()
             
             if c == ")":
+                token.value = self._span_value(token.value, start, end)
                 return token
             
             if c == "EOF":
-                self._parse_error()
+                self._parse_error("eof-in-url")
+                token.value = self._span_value(token.value, start, end)
                 return token
             
             if self.whitespace(c):
                 # consume as much whitespace as possible
                 while self.whitespace(self._nth_next_code_point(0)):
-                    self.i += 1
+                    self._consume_next_code_point()
                 
                 if self._nth_next_code_point(0) in (")", "EOF"):
-                    if self._nth_next_code_point(0) == "EOF": self._parse_error()
+                    if self._nth_next_code_point(0) == "EOF": self._parse_error("eof-in-url")
                     # consume it
                     self.i += 1
+                    token.value = self._span_value(token.value, start, end)
                     return token
                 
                 self._consume_remnants_of_bad_url()
                 return CSSTokenBadUrl()
             
             if c in "\"'(" or self.non_printable_code_point(c):
-                self._parse_error()
+                self._parse_error("unexpected-character-in-url")
                 self._consume_remnants_of_bad_url()
                 
                 return CSSTokenBadUrl()
             
             if c == "\\":
                 if self.two_code_points_are_valid_escape():
-                    token.value += self._consume_escaped_code_point()
+                    token.value += self.css_text[start:end] + self._consume_escaped_code_point()
+                    start = self.i
                 
                 else:
-                    self._parse_error()
+                    self._parse_error("invalid-escape-in-url")
                     self._consume_remnants_of_bad_url()
                 
                     return CSSTokenBadUrl()
             
             else:
-                token.value += c
+                token.value += self.css_text[start:end] + c
+                start = self.i
 
     
     def _consume_escaped_code_point(self) -> str:
@@ -297,7 +381,7 @@ class CSSTokenizer:
             
             if self.whitespace(self._nth_next_code_point(0)):
                 # consume it
-                self.i += 1
+                self._consume_next_code_point()
             
             hex_value = int(digits, 16)
             if hex_value == 0 or (0xD800 <= hex_value <= 0xDFFF) or hex_value > 0x10FFFF:
@@ -306,7 +390,7 @@ class CSSTokenizer:
             return chr(hex_value)
         
         if c == "EOF":
-            self._parse_error()
+            self._parse_error("eof-in-escape")
             return u"\ufffd"
         
         return c
@@ -495,22 +579,48 @@ class CSSTokenizer:
         if token is None:
             assert 0, "UNREACHABLE"
         
+        if self.columns is not None:
+            self.columns.append(token, self.token_start, min(self.i, len(self.css_text)))
+            return
+        
         self.tokens.append(token)
+        
+        if self.spans is not None:
+            self.spans.append(self.token_start)
+            self.spans.append(min(self.i, len(self.css_text)))
     
     
-    def _parse_error(self):
+    def _parse_error(self, code: str):
         
-        print("Parse error.")
+        offset = min(max(self.i - 1, 0), len(self.css_text))
+        self.errors.report(code, self.css_text, offset)
         
-    
-    def preprocess(self, css_text: str) -> str:
+        if self.error_log is not None:
+            self.error_log.append((code, offset))
         
-        return css_text.replace("\r\n", "\n").replace("\r", "\n").replace("\f", "\n").replace("\0", u"\ufffd")
-    
     
-    def run(self, css_text: str) -> list[CSSToken]:
+    def run(self, css_text: str, cache: CSSTokenCache = None) -> list[CSSToken]:
         
-        self.css_text = self.preprocess(css_text)
+        if cache is not None:
+            
+            # the tokens of the same input if they are cached,
+            # else tokenize and cache them
+            key = cache.key(css_text)
+            self.css_text = css_text
+            self.tokens = cache.read(key, self)
+            
+            if self.tokens is None:
+                self.spans = _array("q")
+                self.error_log = []
+                try:
+                    cache.write(key, self.run(css_text), self.spans, self.error_log)
+                finally:
+                    self.spans = None
+                    self.error_log = None
+            
+            return self.tokens
+        
+        self.css_text = css_text
         
         self.tokens = []
         
@@ -519,6 +629,7 @@ class CSSTokenizer:
             
             self._consume_comments()
             
+            self.token_start = self.i
             c = self._consume_next_code_point()
             
             if self.whitespace(c):
@@ -630,7 +741,7 @@ class CSSTokenizer:
                     self._emit_token(self._consume_ident_like_token())
                 
                 else:
-                    self._parse_error()
+                    self._parse_error("invalid-escape")
                     self._emit_token(CSSTokenDelim(c))
             
             elif c == "]":
@@ -666,3 +777,18 @@ class CSSTokenizer:
                 self._emit_token(CSSTokenDelim(c))
 
         return self.tokens
+    
+    
+    def run_columns(self, css_text: str, columns: CSSTokenColumns = None) -> CSSTokenColumns:
+        
+        # same as run() but the tokens are appended to columns (a new batch
+        # if not given) instead of a list, a token object is still built
+        # for each token and dropped so this saves memory only
+        self.columns = columns if columns is not None else CSSTokenColumns()
+        
+        try:
+            self.run(css_text)
+            return self.columns
+        
+        finally:
+            self.columns = None
@@ -1,4 +1,5 @@
 from . import token
+from . import stream
 from . import tokenizer
 from . import node
 from . import parser
\ No newline at end of file
@@ -0,0 +1,160 @@
+from itertools import islice as _islice
+from typing import Generator as _Generator
+
+from .span import *
+
+
+__all__ = ["HTMLAttribute", "HTMLAttributes"]
+
+
+class HTMLAttribute:
+
+    # an attribute of HTMLAttributes as a [name, value] list, a view that
+    # reads and writes the map so that changing it changes the attributes
+    # as changing the list did
+    __slots__ = ("attributes", "name")
+
+    def __init__(self, attributes: "HTMLAttributes", name: str):
+
+        self.attributes = attributes
+        self.name = name
+
+
+    def __len__(self):
+
+        return 2
+
+
+    def __iter__(self) -> _Generator[str, None, None]:
+
+        yield self.name
+        yield self.attributes.get(self.name)
+
+
+    def __getitem__(self, index: int) -> str:
+
+        return [self.name, self.attributes.get(self.name)][index]
+
+
+    def __setitem__(self, index: int, value: str):
+
+        if index in (1, -1):
+            self.attributes.map[self.name] = value
+
+        elif index in (0, -2):
+            self.attributes.rename(self.name, value)
+            self.name = value
+
+        else:
+            raise IndexError("attribute index out of range")
+
+
+    def __eq__(self, other):
+
+        if isinstance(other, (HTMLAttribute, list, tuple)):
+            return list(self) == list(other)
+
+        return NotImplemented
+
+
+    def __repr__(self):
+
+        return repr(list(self))
+
+
+class HTMLAttributes:
+
+    # attributes of a tag token or element, an insertion ordered map of
+    # names to values that iterates (and prints) like the [name, value]
+    # list it replaces, a value may be a span of the input until it is read
+    __slots__ = ("map",)
+
+    def __init__(self, attributes: list[list[str, str]] = ()):
+
+        self.map: dict[str, str|HTMLSpan] = {}
+
+        for attribute in attributes:
+            self.append(attribute)
+
+
+    def __len__(self):
+
+        return len(self.map)
+
+
+    def __iter__(self) -> _Generator[HTMLAttribute, None, None]:
+
+        return (HTMLAttribute(self, name) for name in self.map)
+
+
+    def __getitem__(self, index: int) -> HTMLAttribute:
+
+        # by position like the list, a lookup by name is get()
+        if index < 0:
+            index += len(self.map)
+
+        if not 0 <= index < len(self.map):
+            raise IndexError("attribute index out of range")
+
+        return HTMLAttribute(self, next(_islice(self.map, index, None)))
+
+
+    def __eq__(self, other):
+
+        if isinstance(other, HTMLAttributes):
+            return list(self.items()) == list(other.items())
+
+        if isinstance(other, list):
+            return [list(item) for item in self.items()] == other
+
+        return NotImplemented
+
+
+    def __repr__(self):
+
+        return repr([list(item) for item in self.items()])
+
+
+    def items(self) -> _Generator[tuple[str, str], None, None]:
+
+        # (name, value) pairs, without a view per attribute
+        return ((name, self.get(name)) for name in self.map)
+
+
+    def append(self, attribute: list[str, str|HTMLSpan]) -> bool:
+
+        # the first attribute with a name wins, False if it is a duplicate
+        name, value = attribute
+
+        if name in self.map:
+            return False
+
+        self.map[name] = value
+        return True
+
+
+    def has(self, name: str) -> bool:
+
+        return name in self.map
+
+
+    def get(self, name: str, default: None|str = None) -> None|str:
+
+        value = self.map.get(name, default)
+
+        if type(value) is HTMLSpan:
+            value = self.map[name] = str(value)
+
+        return value
+
+
+    def rename(self, name: str, new_name: str):
+
+        # the attribute keeps its position, the new name must not be there already
+        if new_name == name:
+            return
+
+        if new_name in self.map:
+            raise ValueError(f"duplicate attribute name {new_name!r}")
+
+        self.map = {new_name if key == name else key: value for key, value in self.map.items()}
@@ -0,0 +1,296 @@
+from collections import deque as _deque
+from concurrent.futures import FIRST_COMPLETED as _FIRST_COMPLETED, ProcessPoolExecutor as _ProcessPoolExecutor, wait as _wait
+from concurrent.futures.process import BrokenProcessPool as _BrokenProcessPool
+import os as _os
+import traceback as _traceback
+from typing import Generator as _Generator, Iterable as _Iterable
+
+from .names import *
+from .node import *
+from .error import *
+from .parser import *
+
+
+__all__ = ["HTMLBatchResult", "HTMLBatchParser", "parse_many"]
+
+
+class HTMLBatchResult:
+
+    # the result of a document parsed by HTMLBatchParser, the tree is
+    # encoded as plain values (see HTMLBatchParser.encode_tree()) and is
+    # None if parsing the document failed, error says why
+    __slots__ = ("index", "tree", "error", "parse_error_count", "parse_errors")
+
+    def __init__(self, index: int, tree: None|list = None, error: None|str = None,
+                 parse_error_count: int = 0, parse_errors: list[tuple[str, int, int, int]] = ()):
+
+        # position of the document in the input
+        self.index = index
+
+        self.tree = tree
+        self.error = error
+
+        # the parse errors as (code, offset, line, column), only counted
+        # unless the errors are collected
+        self.parse_error_count = parse_error_count
+        self.parse_errors = list(parse_errors)
+
+
+    def __repr__(self):
+
+        return f"HTMLBatchResult(index={self.index}, error={self.error!r}, parse_error_count={self.parse_error_count})"
+
+
+    def document(self) -> None|HTMLNodeDocument:
+
+        if self.tree is None:
+            return None
+
+        document = HTMLBatchParser.decode_tree(self.tree)
+
+        errors = HTMLParseErrors(HTMLParseErrors.Mode.COLLECT if self.parse_errors else HTMLParseErrors.Mode.COUNT)
+        errors.count = self.parse_error_count
+        errors.errors = [HTMLParseError(*error) for error in self.parse_errors]
+        document.parse_errors = errors
+
+        return document
+
+
+class HTMLBatchParser:
+
+    # parses many documents in a pool of processes, the documents are sent
+    # to the workers in chunks and a bounded number of chunks is in flight
+    # so the input is read as the results are taken
+    #
+    # a document that raises (e.g. on a path of the parser that is not
+    # implemented) gives a result with the error, the other documents are
+    # not affected. if a worker dies, the pool is started again and the
+    # documents of the chunks it took down are parsed one by one so only
+    # the one that killed it gives an error
+
+    # tree encoding, the nodes in preorder one after another as:
+    #   document   DOCUMENT, children
+    #   doctype    DOCUMENT_TYPE, name, public id, system id
+    #   element    ELEMENT, tag name, children, attributes, names and values
+    #   text       TEXT, data
+    #   comment    COMMENT, data
+    # (the HTMLNode.Type values), pickled much faster than the nodes
+    DOCUMENT      = HTMLNode.Type.DOCUMENT.value
+    DOCUMENT_TYPE = HTMLNode.Type.DOCUMENT_TYPE.value
+    ELEMENT       = HTMLNode.Type.ELEMENT.value
+    TEXT          = HTMLNode.Type.TEXT.value
+    COMMENT       = HTMLNode.Type.COMMENT.value
+
+    def __init__(self, workers: int = None, chunk_size: int = 16, ordered: bool = True,
+                 mode: HTMLParseErrors.Mode = HTMLParseErrors.Mode.COUNT):
+
+        # processes in the pool, the number of cpus if None
+        self.workers = workers if workers is not None else _os.cpu_count() or 1
+
+        # documents per task
+        self.chunk_size = chunk_size
+
+        # results in the order of the input, else as they are done
+        self.ordered = ordered
+
+        # parse errors of each document
+        self.mode = mode
+
+
+    @classmethod
+    def encode_tree(cls, document: HTMLNodeDocument) -> list:
+
+        encoded = [cls.DOCUMENT, len(document.children)]
+        nodes = list(reversed(document.children))
+
+        # not recursive, the depth of a tree is not bounded
+        while nodes:
+
+            node = nodes.pop()
+            node_type = type(node)
+
+            if node_type is HTMLNodeText:
+                encoded += (cls.TEXT, node.data)
+
+            elif node_type is HTMLNodeElement:
+                encoded += (cls.ELEMENT, node.tag_name, len(node.children), len(node.attributes))
+                for name, value in node.attributes.items():
+                    encoded += (name, value)
+                nodes.extend(reversed(node.children))
+
+            elif node_type is HTMLNodeComment:
+                encoded += (cls.COMMENT, node.data)
+
+            else:
+                encoded += (cls.DOCUMENT_TYPE, node.name, node.public_id, node.system_id)
+
+        return encoded
+
+
+    @classmethod
+    def decode_tree(cls, encoded: list) -> HTMLNodeDocument:
+
+        document = HTMLNodeDocument()
+
+        # [node, children left to decode] of the nodes that are open
+        parents = [[document, encoded[1]]]
+        i = 2
+
+        while i < len(encoded):
+
+            kind = encoded[i]
+            children = 0
+
+            if kind == cls.TEXT:
+                node = HTMLNodeText(encoded[i+1])
+                i += 2
+
+            elif kind == cls.ELEMENT:
+                tag_name, children, attributes = encoded[i+1:i+4]
+                i += 4
+                node = HTMLNodeElement(intern_name(tag_name), [[intern_name(encoded[j]), encoded[j+1]] for j in range(i, i + 2 * attributes, 2)])
+                i += 2 * attributes
+
+            elif kind == cls.COMMENT:
+                node = HTMLNodeComment(encoded[i+1])
+                i += 2
+
+            else:
+                node = HTMLNodeDocumentType(*encoded[i+1:i+4])
+                i += 4
+
+            while parents[-1][1] == 0:
+                parents.pop()
+
+            parent = parents[-1]
+            parent[0].children.append(node)
+            parent[1] -= 1
+
+            if children:
+                parents.append([node, children])
+
+        return document
+
+
+    @staticmethod
+    def _describe(error: Exception) -> str:
+
+        # the exception and where it was raised, e.g. which path is not implemented
+        frame = _traceback.extract_tb(error.__traceback__)[-1]
+        return f"{type(error).__name__}: {error} ({_os.path.basename(frame.filename)}:{frame.lineno} in {frame.name})"
+
+
+    @staticmethod
+    def _parse_chunk(start: int, sources: list[str|bytes], mode: HTMLParseErrors.Mode) -> list[HTMLBatchResult]:
+
+        # runs in a worker
+        results = []
+
+        for k, source in enumerate(sources):
+
+            errors = HTMLParseErrors(mode)
+            result = HTMLBatchResult(start + k)
+
+            try:
+                result.tree = HTMLBatchParser.encode_tree(HTMLParser(errors).run(source))
+            except Exception as error:
+                result.error = HTMLBatchParser._describe(error)
+
+            result.parse_error_count = errors.count
+            result.parse_errors = [(error.code, error.offset, error.line, error.column) for error in errors]
+            results.append(result)
+
+        return results
+
+
+    def _chunks(self, sources: _Iterable[str|bytes]) -> _Generator[tuple[int, list[str|bytes]], None, None]:
+
+        chunk = []
+        start = 0
+
+        for source in sources:
+            chunk.append(source)
+            if len(chunk) == self.chunk_size:
+                yield start, chunk
+                start += len(chunk)
+                chunk = []
+
+        if chunk:
+            yield start, chunk
+
+
+    def run(self, sources: _Iterable[str|bytes]) -> _Generator[HTMLBatchResult, None, None]:
+
+        chunks = self._chunks(sources)
+        executor = _ProcessPoolExecutor(self.workers)
+
+        # future -> (executor, start, sources) and the futures in the order they were submitted
+        in_flight = {}
+        order = _deque()
+
+        def restart():
+            nonlocal executor
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = _ProcessPoolExecutor(self.workers)
+
+        def submit(start: int, chunk: list[str|bytes]):
+            try:
+                future = executor.submit(self._parse_chunk, start, chunk, self.mode)
+            except _BrokenProcessPool:
+                # a worker died since the last result was taken
+                restart()
+                future = executor.submit(self._parse_chunk, start, chunk, self.mode)
+            in_flight[future] = (executor, start, chunk)
+            order.append(future)
+
+        def fill():
+            while len(in_flight) < 2 * self.workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                submit(*chunk)
+
+        try:
+            fill()
+
+            while in_flight:
+
+                if self.ordered:
+                    future = order.popleft()
+                else:
+                    done, _ = _wait(in_flight, return_when=_FIRST_COMPLETED)
+                    future = done.pop()
+                    order.remove(future)
+
+                submitted_to, start, chunk = in_flight.pop(future)
+
+                try:
+                    results = future.result()
+
+                except _BrokenProcessPool:
+
+                    # a worker died, the chunks that were in the pool fail
+                    # with it, they are parsed again one document at a time
+                    if submitted_to is executor:
+                        restart()
+
+                    results = []
+                    for k, source in enumerate(chunk):
+                        try:
+                            results += executor.submit(self._parse_chunk, start + k, [source], self.mode).result()
+                        except _BrokenProcessPool:
+                            restart()
+                            results.append(HTMLBatchResult(start + k, error="BrokenProcessPool: the worker parsing the document died"))
+
+                yield from results
+                fill()
+
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+
+def parse_many(sources: _Iterable[str|bytes], workers: int = None, chunk_size: int = 16, ordered: bool = True,
+               mode: HTMLParseErrors.Mode = HTMLParseErrors.Mode.COUNT) -> _Generator[HTMLBatchResult, None, None]:
+
+    # see HTMLBatchParser
+    return HTMLBatchParser(workers, chunk_size, ordered, mode).run(sources)
@@ -0,0 +1,312 @@
+from array import array as _array
+import hashlib as _hashlib
+import mmap as _mmap
+import os as _os
+import struct as _struct
+import sys as _sys
+from typing import Generator as _Generator, Iterator as _Iterator
+
+from .token import *
+from .names import *
+from .tokenizer import *
+
+
+__all__ = ["HTMLTokenCache"]
+
+
+class HTMLTokenCache:
+
+    # file layout (little endian, each section starts at a multiple of 8):
+    #   header
+    #   kinds          B * tokens   HTMLToken.Type values
+    #   flags          B * tokens   self-closing / force-quirks
+    #   starts, ends   q * tokens   offsets in the input (as given, before preprocessing)
+    #   field starts   I * (tokens + 1)
+    #   fields         i * fields   string ids, -1 for None
+    #   error tokens   I * errors   index of the token each error came before
+    #   error codes    i * errors   string ids
+    #   error offsets  q * errors
+    #   string starts  Q * (strings + 1)
+    #   strings        utf-8
+    #
+    # the fields of a token are its data (character, comment), its name and
+    # identifiers (doctype) or its name and attribute names and values (tags),
+    # the errors are the parse errors of the tokenizer (the parser reports
+    # its own errors again when the tokens are replayed)
+
+    magic = b"NRHT"
+    version = 3
+
+    # magic, version, reserved, key, tokens, fields, errors, strings
+    header = _struct.Struct("<4sHH32sQQQQ")
+
+    # flags
+    SELF_CLOSING = 1
+    FORCE_QUIRKS = 2
+    AT_END       = 4 # the parser reports the errors of the token at its end, not at the char before
+
+    def __init__(self, directory: str):
+
+        self.directory = directory
+        _os.makedirs(directory, exist_ok=True)
+
+
+    @staticmethod
+    def key(source: str|bytes|memoryview, encoding: str = None) -> bytes:
+
+        # content hash, the same input decoded differently is another entry
+        content = _hashlib.sha256()
+        content.update((encoding or "").encode("ascii", "replace") + b"\0")
+
+        if isinstance(source, str):
+            content.update(b"s" + source.encode("utf-8", "surrogatepass"))
+        else:
+            content.update(b"b")
+            content.update(source)
+
+        return content.digest()
+
+
+    def path(self, key: bytes) -> str:
+
+        return _os.path.join(self.directory, key.hex() + ".tokens")
+
+
+    @staticmethod
+    def _padding(length: int) -> bytes:
+
+        return bytes(-length % 8)
+
+
+    @staticmethod
+    def _little_endian(column: _array) -> _array:
+
+        if _sys.byteorder == "big":
+            column = _array(column.typecode, column)
+            column.byteswap()
+
+        return column
+
+
+    def record(self, key: bytes, tokens: _Iterator[HTMLToken], tokenizer: HTMLTokenizer) -> _Generator[HTMLToken, None, None]:
+
+        # pass the tokens of the tokenizer through and write them to the
+        # cache with the EOF token and the parse errors of the tokenizer
+        kinds = _array("B")
+        flags = _array("B")
+        starts = _array("q")
+        ends = _array("q")
+        field_starts = _array("I", [0])
+        fields = _array("i")
+        error_tokens = _array("I")
+        error_codes = _array("i")
+        error_offsets = _array("q")
+
+        error_log = tokenizer.error_log = []
+
+        string_ids: dict[str, int] = {}
+
+        def string_id(string: None|str) -> int:
+            if string is None:
+                return -1
+            id_ = string_ids.get(string)
+            if id_ is None:
+                id_ = string_ids[string] = len(string_ids)
+            return id_
+
+        end = 0
+        for token in tokens:
+
+            # reported while the tokenizer got to the token
+            for code, offset in error_log:
+                error_tokens.append(len(kinds))
+                error_codes.append(string_id(code))
+                error_offsets.append(offset)
+            error_log.clear()
+
+            # recorded before the parser sees (and may change) the token
+            token_type = token.type
+            flag = 0
+
+            if token_type is HTMLToken.Type.CHARACTER or token_type is HTMLToken.Type.COMMENT:
+                fields.append(string_id(token.data))
+
+            elif token_type is HTMLToken.Type.START_TAG or token_type is HTMLToken.Type.END_TAG:
+                fields.append(string_id(token.tag_name))
+                for name, value in token.attributes.items():
+                    fields.append(string_id(name))
+                    fields.append(string_id(value))
+                flag = token.self_closing_tag and self.SELF_CLOSING
+
+            elif token_type is HTMLToken.Type.DOCTYPE:
+                fields.append(string_id(token.name))
+                fields.append(string_id(token.public_identifier))
+                fields.append(string_id(token.system_identifier))
+                flag = token.force_quirks and self.FORCE_QUIRKS
+
+            starts.append(end)
+            end = max(tokenizer.position(), end)
+            ends.append(end)
+
+            if tokenizer.offset + max(tokenizer.i - 1, 0) == end:
+                flag |= self.AT_END
+
+            kinds.append(token_type.value)
+            flags.append(flag)
+            field_starts.append(len(fields))
+
+            if token_type is HTMLToken.Type.EOF:
+                tokenizer.error_log = None
+                self._write(key, kinds, flags, starts, ends, field_starts, fields,
+                            error_tokens, error_codes, error_offsets, list(string_ids))
+
+            yield token
+
+
+    def _write(self, key: bytes, kinds: _array, flags: _array, starts: _array, ends: _array, field_starts: _array, fields: _array,
+               error_tokens: _array, error_codes: _array, error_offsets: _array, strings: list[str]):
+
+        encoded = [string.encode("utf-8", "surrogatepass") for string in strings]
+
+        string_starts = _array("Q", [0])
+        for string in encoded:
+            string_starts.append(string_starts[-1] + len(string))
+
+        path = self.path(key)
+        temp_path = f"{path}.{_os.getpid()}.tmp"
+
+        with open(temp_path, "wb") as f:
+
+            f.write(self.header.pack(self.magic, self.version, 0, key, len(kinds), len(fields), len(error_codes), len(strings)))
+
+            for column in (kinds, flags, starts, ends, field_starts, fields, error_tokens, error_codes, error_offsets, string_starts):
+                data = self._little_endian(column).tobytes()
+                f.write(data + self._padding(len(data)))
+
+            f.write(b"".join(encoded))
+
+        # readers never see a half written file
+        _os.replace(temp_path, path)
+
+
+    def read(self, key: bytes, tokenizer: HTMLTokenizer) -> None|_Generator[HTMLToken, None, None]:
+
+        # the cached tokens, None if there is no entry or it is stale, the
+        # parse errors are reported to the sink of the tokenizer and its
+        # position follows the tokens so the parser reports its errors
+        # where it does when the input is tokenized (the input text is
+        # tokenizer.html_text, only needed to count the lines)
+        path = self.path(key)
+
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+        with f:
+            try:
+                mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            except ValueError:
+                return None # empty file
+
+        if len(mapped) < self.header.size:
+            mapped.close()
+            return None
+
+        magic, version, _, file_key, token_count, field_count, error_count, string_count = self.header.unpack_from(mapped)
+
+        if (magic, version, file_key) != (self.magic, self.version, key):
+            mapped.close()
+            return None
+
+        return self._replay(mapped, tokenizer, token_count, field_count, error_count, string_count)
+
+
+    def _replay(self, mapped: _mmap.mmap, tokenizer: HTMLTokenizer, token_count: int, field_count: int, error_count: int, string_count: int) -> _Generator[HTMLToken, None, None]:
+
+        view = memoryview(mapped)
+        columns = []
+        offset = self.header.size
+
+        for typecode, length in (("B", token_count), ("B", token_count), ("q", token_count), ("q", token_count),
+                                 ("I", token_count + 1), ("i", field_count),
+                                 ("I", error_count), ("i", error_count), ("q", error_count), ("Q", string_count + 1)):
+
+            size = _array(typecode).itemsize * length
+            column = view[offset:offset+size]
+
+            if _sys.byteorder == "big":
+                column = _array(typecode, column.tobytes())
+                column.byteswap()
+            else:
+                column = column.cast(typecode)
+
+            columns.append(column)
+            offset += size + len(self._padding(size))
+
+        kinds, flags, starts, ends, field_starts, fields, error_tokens, error_codes, error_offsets, string_starts = columns
+        blob = view[offset:]
+
+        # decoded on first use
+        strings: list[str] = [None] * string_count
+
+        def string(id_: int) -> None|str:
+            if id_ == -1:
+                return None
+            string_ = strings[id_]
+            if string_ is None:
+                string_ = strings[id_] = str(blob[string_starts[id_]:string_starts[id_+1]], "utf-8", "surrogatepass")
+            return string_
+
+        # the offsets are in the whole input
+        html_text = tokenizer.html_text
+        tokenizer.offset = 0
+        report = tokenizer.errors.report
+        error = 0
+
+        try:
+            for i in range(token_count):
+
+                while error < error_count and error_tokens[error] == i:
+                    report(string(error_codes[error]), html_text, error_offsets[error], 0)
+                    error += 1
+
+                # where the tokenizer was when it passed the token
+                tokenizer.end = ends[i]
+                tokenizer.i = ends[i] + 1 if flags[i] & self.AT_END else ends[i]
+
+                kind = HTMLToken.Type(kinds[i])
+                first = field_starts[i]
+
+                if kind is HTMLToken.Type.CHARACTER:
+                    token = HTMLTokenCharacter(string(fields[first]))
+
+                elif kind is HTMLToken.Type.COMMENT:
+                    token = HTMLTokenComment(string(fields[first]))
+
+                elif kind is HTMLToken.Type.START_TAG or kind is HTMLToken.Type.END_TAG:
+                    token = HTMLTokenStartTag() if kind is HTMLToken.Type.START_TAG else HTMLTokenEndTag()
+                    token.tag_name = intern_name(string(fields[first]))
+                    token.self_closing_tag = int(bool(flags[i] & self.SELF_CLOSING))
+                    for j in range(first + 1, field_starts[i+1], 2):
+                        token.attributes.append([intern_name(string(fields[j])), string(fields[j+1])])
+
+                elif kind is HTMLToken.Type.DOCTYPE:
+                    token = HTMLTokenDoctype()
+                    token.name = string(fields[first])
+                    token.public_identifier = string(fields[first+1])
+                    token.system_identifier = string(fields[first+2])
+                    token.force_quirks = int(bool(flags[i] & self.FORCE_QUIRKS))
+
+                else:
+                    token = HTMLTokenEOF()
+
+                yield token
+
+        finally:
+            for column in columns:
+                if isinstance(column, memoryview):
+                    column.release()
+            blob.release()
+            view.release()
+            mapped.close()
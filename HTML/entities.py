@@ -0,0 +1,52 @@
+from html.entities import html5 as _html5
+
+
+__all__ = ["named_character_references", "numeric_character_references"]
+
+
+# see https://html.spec.whatwg.org/multipage/named-characters.html
+
+# prefix trie of the names (without "&"), each node maps the next char of a
+# name to its child node and "" to the chars of the name that ends there
+# built once on import and shared by all the tokenizers
+named_character_references: dict = {}
+
+for _name, _chars in _html5.items():
+    _node = named_character_references
+    for _c in _name:
+        _node = _node.setdefault(_c, {})
+    _node[""] = _chars
+
+del _name, _chars, _node, _c
+
+
+# see https://html.spec.whatwg.org/multipage/parsing.html#numeric-character-reference-end-state
+numeric_character_references = {
+    0x80: 0x20AC,
+    0x82: 0x201A,
+    0x83: 0x0192,
+    0x84: 0x201E,
+    0x85: 0x2026,
+    0x86: 0x2020,
+    0x87: 0x2021,
+    0x88: 0x02C6,
+    0x89: 0x2030,
+    0x8A: 0x0160,
+    0x8B: 0x2039,
+    0x8C: 0x0152,
+    0x8E: 0x017D,
+    0x91: 0x2018,
+    0x92: 0x2019,
+    0x93: 0x201C,
+    0x94: 0x201D,
+    0x95: 0x2022,
+    0x96: 0x2013,
+    0x97: 0x2014,
+    0x98: 0x02DC,
+    0x99: 0x2122,
+    0x9A: 0x0161,
+    0x9B: 0x203A,
+    0x9C: 0x0153,
+    0x9E: 0x017E,
+    0x9F: 0x0178,
+}
@@ -0,0 +1,130 @@
+from enum import Enum as _Enum, auto as _auto
+import logging as _logging
+
+
+__all__ = ["HTMLParseError", "HTMLParseErrors"]
+
+
+class HTMLParseError:
+
+    def __init__(self, code: str, offset: int, line: int, column: int):
+
+        self.code = code
+
+        # position in the input, line and column start from 1
+        self.offset = offset
+        self.line = line
+        self.column = column
+
+
+    def __repr__(self):
+
+        return f"HTMLParseError(code={self.code!r}, offset={self.offset}, line={self.line}, column={self.column})"
+
+
+class HTMLParseErrors:
+
+    # see https://html.spec.whatwg.org/multipage/parsing.html#parse-errors
+
+    class Mode(_Enum):
+
+        OFF     = _auto() # ignore
+        COUNT   = _auto() # only count
+        COLLECT = _auto() # keep a record of each
+        LOG     = _auto() # count and log every n-th
+
+
+    logger = _logging.getLogger("HTML")
+
+    def __init__(self, mode: "HTMLParseErrors.Mode" = Mode.COUNT, log_every: int = 100):
+
+        self.mode = mode
+        self.log_every = log_every
+
+        # the output
+        self.count = 0
+        self.errors: list[HTMLParseError] = []
+
+        # lines are counted up to this offset
+        self.line_offset = 0
+        self.line = 1
+        self.line_start = 0
+
+        # no work per error for the modes that do not need it
+        self.report = getattr(self, f"_report_{mode.name.lower()}")
+        if mode in (self.Mode.OFF, self.Mode.COUNT):
+            self.advance = self._ignore
+
+
+    def __repr__(self):
+
+        return f"HTMLParseErrors(mode={self.mode.name}, count={self.count})"
+
+
+    def __len__(self):
+
+        return self.count
+
+
+    def __iter__(self):
+
+        return iter(self.errors)
+
+
+    def _ignore(self, *args):
+
+        pass
+
+
+    def advance(self, text: str, i: int, base: int):
+
+        # count the lines up to text[i], text starts at the offset base
+        start = self.line_offset - base
+        if i <= start:
+            return
+
+        # "\r\n", "\r" and "\n" end a line, the "\n" of "\r\n" is
+        # counted (even if it is text[i] and comes with the next lines)
+        newlines = text.count("\n", start, i)
+        if text.find("\r", start, i) != -1:
+            newlines += text.count("\r", start, i) - text.count("\r\n", start, i + 1)
+
+        if newlines:
+            self.line += newlines
+            last = max(text.rfind("\n", start, i), text.rfind("\r", start, i))
+            if text.startswith("\r\n", last):
+                last = max(text.rfind("\n", start, last), text.rfind("\r", start, last))
+            self.line_start = base + last + 1
+
+        self.line_offset = base + i
+
+
+    def _record(self, code: str, text: str, i: int, base: int) -> HTMLParseError:
+
+        self.advance(text, i, base)
+        return HTMLParseError(code, base + i, self.line, max(base + i - self.line_start, 0) + 1)
+
+
+    def _report_off(self, code: str, text: str, i: int, base: int):
+
+        pass
+
+
+    def _report_count(self, code: str, text: str, i: int, base: int):
+
+        self.count += 1
+
+
+    def _report_collect(self, code: str, text: str, i: int, base: int):
+
+        self.count += 1
+        self.errors.append(self._record(code, text, i, base))
+
+
+    def _report_log(self, code: str, text: str, i: int, base: int):
+
+        self.count += 1
+
+        if self.count % self.log_every == 1 or self.log_every == 1:
+            error = self._record(code, text, i, base)
+            self.logger.warning("Parse Error: %s at %d:%d (%d errors so far)", code, error.line, error.column, self.count)
@@ -0,0 +1,347 @@
+import re as _re
+from typing import Iterable as _Iterable
+
+from .token import *
+from .entities import *
+from .names import *
+from .span import *
+from .error import *
+from .tokenizer import *
+
+
+__all__ = ["HTMLFilteredTokenizer"]
+
+
+class HTMLFilteredTokenizer(HTMLTokenizer):
+
+    # a tokenizer that gives only the start tags with the wanted names (and
+    # the EOF token), e.g. for a crawler that extracts links. text is
+    # skipped up to the next "<" without building character tokens, comment
+    # data is not taken, and the attributes of the other tags are dropped.
+    # the parse errors of the skipped text (and dropped attributes) are not
+    # reported
+    #
+    # a tag is matched at once (not in the tag states) if it ends in the
+    # received input, a tag to emit is left to the tag states only if it
+    # has a char that needs normalizing or an unusual character reference
+    #
+    # the tokenizer is switched to the text states after the start tags the
+    # parser switches it for (as in html content, there is no tree to tell
+    # foreign content apart), so a "<a" in a script is not taken as a tag
+
+    # see https://html.spec.whatwg.org/multipage/parsing.html#parsing-main-inbody
+    # (noscript as if scripting is enabled)
+    text_states = {
+        "title":     HTMLTokenizer.State.RCDATA,
+        "textarea":  HTMLTokenizer.State.RCDATA,
+        "style":     HTMLTokenizer.State.RAWTEXT,
+        "xmp":       HTMLTokenizer.State.RAWTEXT,
+        "iframe":    HTMLTokenizer.State.RAWTEXT,
+        "noembed":   HTMLTokenizer.State.RAWTEXT,
+        "noframes":  HTMLTokenizer.State.RAWTEXT,
+        "noscript":  HTMLTokenizer.State.RAWTEXT,
+        "script":    HTMLTokenizer.State.SCRIPT_DATA,
+        "plaintext": HTMLTokenizer.State.PLAIN_TEXT,
+    }
+
+    # a whole start or end tag, the names and values of its attributes are
+    # matched as the tag states consume them so that it ends at the same ">"
+    # see https://html.spec.whatwg.org/multipage/parsing.html#before-attribute-name-state
+    tag = _re.compile(r"""
+        </?([A-Za-z][^\t\n\f\r />]*)                                # tag name
+        (?:
+            [\t\n\f\r /]                                            # between the attributes
+          | [^\t\n\f\r />][^\t\n\f\r />=]*(?![^\t\n\f\r />=])          # attribute name
+            (?:
+                [\t\n\f\r ]*=[\t\n\f\r ]*                              # attribute value
+                (?:"[^"]*"|'[^']*'|[^\t\n\f\r >"'][^\t\n\f\r >]*|(?=>))
+              | (?![\t\n\f\r ]*=)                                   # no value
+            )
+        )*
+        >""", _re.VERBOSE)
+
+    # an attribute in a tag matched above, the value is one of the groups
+    attribute = _re.compile(r"""
+        [\t\n\f\r /]*
+        ([^\t\n\f\r />][^\t\n\f\r />=]*)
+        (?:[\t\n\f\r ]*=[\t\n\f\r ]*(?:"([^"]*)"|'([^']*)'|([^\t\n\f\r >"'][^\t\n\f\r >]*)|))?
+        """, _re.VERBOSE)
+
+    # chars that need normalizing, a tag with one of them is left to the
+    # tag states (so is a value with a reference that is not matched below)
+    normalized_chars = _re.compile(r"[\0\r]")
+
+    # a character reference that is decoded the same wherever it is: a
+    # name with ";" or a number that is not replaced (see _decode_value())
+    character_reference = _re.compile(r"&(?:([A-Za-z][A-Za-z0-9]*;)|#([0-9]+);|#[xX]([0-9A-Fa-f]+);)")
+
+    def __init__(self, tag_names: _Iterable[str], attribute_names: _Iterable[str] = None, errors: HTMLParseErrors = None):
+
+        super().__init__(errors)
+
+        # the start tags to emit, with only these attributes if given
+        self.tag_names = frozenset(intern_name(name) for name in tag_names)
+        self.attribute_names = frozenset(intern_name(name) for name in attribute_names) if attribute_names is not None else None
+
+
+    def _emit_token(self, token: HTMLToken = None) -> HTMLToken:
+
+        if token: self.curr_token = token # shortcut
+
+        token = self.curr_token
+
+        if token.type == HTMLToken.Type.START_TAG:
+
+            self._append_attribute()
+
+            token.tag_name = intern_name(token.tag_name)
+            self.last_emitted_start_tag_name = token.tag_name
+
+            # the tag is ended with ">" (not by EOF)
+            if self.state is self.State.DATA:
+                self.state = self.text_states.get(token.tag_name, self.State.DATA)
+
+            if token.tag_name in self.tag_names:
+                self.emitted_tokens.append(token)
+
+        elif token.type == HTMLToken.Type.END_TAG:
+            self._append_attribute()
+
+        elif token.type == HTMLToken.Type.COMMENT:
+            self.value_start = None # the data is not taken
+            self.value_pieces.clear()
+
+        elif token.type == HTMLToken.Type.EOF:
+            self.emitted_tokens.append(token)
+
+        self.curr_token = None
+        return token
+
+
+    def _append_attribute(self):
+
+        # the attributes of the tags that are not emitted are dropped
+        if self.curr_attribute is not None and (
+                self.curr_token.type != HTMLToken.Type.START_TAG or
+                self.curr_token.tag_name not in self.tag_names or
+                self.attribute_names is not None and self.curr_attribute[0] not in self.attribute_names):
+
+            self.curr_attribute = None
+            self.value_start = None
+            self.value_pieces.clear()
+            return
+
+        super()._append_attribute()
+
+
+    def _emit_character_run(self, run: _re.Pattern, start: int = None) -> HTMLToken:
+
+        self.i = run.match(self.html_text, self.i, self.end).end()
+
+
+    def _emit_text_run(self, text: str, state: "HTMLTokenizer.State", run: _re.Pattern) -> HTMLToken:
+
+        self._reconsume_in(state)
+
+
+    def _match_tag(self) -> bool:
+
+        # the current input char is "<", a whole tag is matched at once
+        # instead of in the tag states and skipped or emitted, False if it
+        # is left to the tag states
+        match = self.tag.match(self.html_text, self.i - 1, self.end)
+
+        if match is None:
+            return False
+
+        if self.html_text[self.i] != "/":
+
+            tag_name = match.group(1).lower()
+
+            # a name with a non-ascii char is left to the tag states (which
+            # lowercase only the ascii letters)
+            if not tag_name.isascii():
+                return False
+
+            if tag_name in self.tag_names and not self._emit_matched_tag(match, tag_name):
+                return False
+
+            self.last_emitted_start_tag_name = tag_name
+            self.state = self.text_states.get(tag_name, self.State.DATA)
+
+        self.i = match.end()
+        return True
+
+
+    def _emit_matched_tag(self, match: _re.Match, tag_name: str) -> bool:
+
+        start = match.end(1)
+        end = match.end() - 1 # ">"
+
+        if self.normalized_chars.search(self.html_text, start, end):
+            return False
+
+        token = HTMLTokenStartTag()
+        token.tag_name = intern_name(tag_name)
+
+        for attribute in self.attribute.finditer(self.html_text, start, end):
+
+            name = attribute.group(1).lower()
+            if not name.isascii():
+                return False
+
+            start = attribute.end()
+
+            if self.attribute_names is not None and name not in self.attribute_names:
+                continue
+
+            # the value group that matched (if any)
+            value_start, value_end = max(attribute.span(2), attribute.span(3), attribute.span(4))
+
+            if self.html_text.find("&", value_start, value_end) != -1:
+                value = self._decode_value(value_start, value_end)
+                if value is None:
+                    return False
+
+            elif value_end - value_start < self.span_min_length:
+                value = self.html_text[value_start:value_end]
+
+            else:
+                value = HTMLSpan(self.html_text, value_start, value_end)
+
+            token.attributes.append([intern_name(name), value])
+
+        # a "/" right before ">" that is not in an attribute
+        if start < end and self.html_text[end-1] == "/":
+            token.self_closing_tag = 1
+
+        self.emitted_tokens.append(token)
+        return True
+
+
+    def _decode_value(self, start: int, end: int) -> None|str:
+
+        # the value with its character references decoded, None if one of
+        # them is left to the character reference states
+        parts = []
+
+        while 1:
+
+            i = self.html_text.find("&", start, end)
+            if i == -1:
+                break
+
+            reference = self.character_reference.match(self.html_text, i, end)
+            if reference is None:
+                return None
+
+            name, decimal, hexadecimal = reference.groups()
+
+            if name is not None:
+                node = named_character_references
+                for c in name:
+                    node = node.get(c)
+                    if node is None:
+                        return None
+                chars = node.get("")
+                if chars is None:
+                    return None
+
+            else:
+                code = int(decimal, 10) if decimal is not None else int(hexadecimal, 16)
+
+                # the numbers that are replaced or are a parse error are
+                # left to the numeric character reference end state
+                if not (code in (0x09, 0x0A, 0x0C) or 0x20 <= code <= 0x7E or 0xA0 <= code <= 0xD7FF or \
+                        0xE000 <= code <= 0x10FFFF and not 0xFDD0 <= code <= 0xFDEF and code & 0xFFFE != 0xFFFE):
+                    return None
+                chars = chr(code)
+
+            parts.append(self.html_text[start:i])
+            parts.append(chars)
+            start = reference.end()
+
+        parts.append(self.html_text[start:end])
+        return "".join(parts)
+
+
+    def _skip_to_less_than_sign(self):
+
+        # the current input char is text, the input jumps to the next "<"
+        i = self.html_text.find("<", self.i, self.end)
+        self.i = self.end if i == -1 else i
+
+
+    def _handle_state_data(self, c: str, is_eof: bool):
+
+        if is_eof:
+            self._emit_token(HTMLTokenEOF())
+            return
+
+        start = self.i - 1 if c == "<" else self.html_text.find("<", self.i, self.end)
+
+        # the text and the tags after it are skipped here until a tag is
+        # emitted or left to the tag states (or another state is switched to)
+        while start != -1:
+
+            self.i = start + 1
+
+            if not self._match_tag():
+                self._switch_to(self.State.TAG_OPEN)
+                return
+
+            if self.emitted_tokens or self.state is not self.State.DATA:
+                return
+
+            start = self.html_text.find("<", self.i, self.end)
+
+        self.i = self.end
+
+
+    def _handle_state_rcdata(self, c: str, is_eof: bool):
+
+        if c == "<":
+            self._switch_to(self.State.RCDATA_LESS_THAN_SIGN)
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._skip_to_less_than_sign()
+
+
+    def _handle_state_rawtext(self, c: str, is_eof: bool):
+
+        if c == "<":
+            self._switch_to(self.State.RAWTEXT_LESS_THAN_SIGN)
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._skip_to_less_than_sign()
+
+
+    def _handle_state_script_data(self, c: str, is_eof: bool):
+
+        if c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_LESS_THAN_SIGN)
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._skip_to_less_than_sign()
+
+
+    def _handle_state_plain_text(self, c: str, is_eof: bool):
+
+        if is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.i = self.end
+
+
+# state -> handler table with the handlers above
+HTMLFilteredTokenizer._state_handlers = {state: getattr(HTMLFilteredTokenizer, f"_handle_state_{state.name.lower()}") for state in HTMLTokenizer.State}
@@ -0,0 +1,10 @@
+import sys as _sys
+
+
+__all__ = ["intern_name"]
+
+
+# names are interned so that tokens and nodes share one instance per name,
+# comparing two interned names stops at the identity check
+intern_name = _sys.intern
+
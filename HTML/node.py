@@ -1,5 +1,7 @@
 from enum import Enum as _Enum, auto as _auto
 
+from .attributes import *
+
 
 __all__ = ["HTMLNode", "HTMLNodeDocument", "HTMLNodeDocumentType", "HTMLNodeComment", "HTMLNodeElement", "HTMLNodeText", "t_HTMLNode"]
 
@@ -27,7 +29,8 @@ class HTMLNode:
     
     def __repr__(self):
         
-        attributes = {key: getattr(self, key) for key in self.__dict__ if not key.startswith('__') and not callable(getattr(self, key))}
+        # a field behind a property is stored with a leading underscore
+        attributes = {key.lstrip('_'): getattr(self, key.lstrip('_')) for key in self.__dict__ if not key.startswith('__') and not callable(getattr(self, key))}
         attr_strings = ", ".join(f"{key}={value!r}" for key, value in attributes.items())
         
         return f"HTMLNode({attr_strings})"
@@ -44,6 +47,9 @@ class HTMLNodeDocument(HTMLNode):
         self.parser_cannot_change_the_mode: bool = 0
         self.is_an_iframe_srcdoc: bool = 0
         self.quirks_mode: bool = 0
+        
+        # parse errors (set by the parser)
+        self.parse_errors = None
     
     
 class HTMLNodeDocumentType(HTMLNode):
@@ -68,12 +74,12 @@ class HTMLNodeComment(HTMLNode):
     
 class HTMLNodeElement(HTMLNode):
     
-    def __init__(self, tag_name: str, attributes: list[dict[str, str]]):
+    def __init__(self, tag_name: str, attributes: HTMLAttributes|list[list[str, str]]):
         
         self.type = self.Type.ELEMENT
         
         self.tag_name = tag_name
-        self.attributes = attributes
+        self.attributes = attributes if isinstance(attributes, HTMLAttributes) else HTMLAttributes(attributes)
         self.children: list[HTMLNode] = []
     
     
@@ -84,15 +90,12 @@ class HTMLNodeElement(HTMLNode):
         
     def has_attr(self, name: str):
         
-        return any(a[0] == name for a in self.attributes)
+        return self.attributes.has(name)
     
     
     def get_attr(self, name: str):
         
-        if not self.has_attr(name):
-            return
-        
-        return list(filter(lambda a: a[0] == name, self.attributes))[0][1]
+        return self.attributes.get(name)
         
     
 class HTMLNodeText(HTMLNode):
@@ -101,7 +104,33 @@ class HTMLNodeText(HTMLNode):
 
         self.type = self.Type.TEXT
         
-        self.data = data
+        # the data, or the chunks of it appended by the parser until the
+        # data is read (they are joined once instead of once per chunk)
+        self._data: str|list[str] = data
+    
+    
+    @property
+    def data(self) -> str:
+        
+        if type(self._data) is list:
+            self._data = "".join(self._data)
+        
+        return self._data
+    
+    
+    @data.setter
+    def data(self, data: str):
+        
+        self._data = data
+    
+    
+    def append_data(self, data: str):
+        
+        if type(self._data) is list:
+            self._data.append(data)
+        
+        else:
+            self._data = [self._data, data]
         
     
 t_HTMLNode = HTMLNodeDocument | HTMLNodeDocumentType | HTMLNodeComment | HTMLNodeElement | HTMLNodeText
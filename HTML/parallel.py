@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+import re as _re
+from typing import BinaryIO as _BinaryIO, Generator as _Generator
+
+from .token import *
+from .names import *
+from .stream import *
+from .error import *
+from .tokenizer import *
+
+
+__all__ = ["HTMLParallelTokenizer"]
+
+
+class HTMLParallelTokenizer:
+
+    # tokenizes a large input in chunks in a pool of processes, the tokens
+    # are the same as HTMLTokenizer.run() gives for the whole input
+    #
+    # a chunk starts at a "<" after a newline and is tokenized as if the
+    # data state was there, which is checked when the chunk before it is
+    # merged: it must have ended in the data state (consuming the "<" of
+    # the next chunk switches it to the tag open state). if it did not (the
+    # "<" is in a comment or an attribute value) the chunks are tokenized
+    # again here from the start of that chunk until one ends in the data
+    # state and the speculative tokens of the next chunk can be used again
+    #
+    # the parser switches the tokenizer to the script and raw text states,
+    # so this is for the tokens only, the parser runs HTMLTokenizer
+
+    # a chunk boundary, "\n" and the "<" of a tag or markup declaration
+    split_point = _re.compile(r"(?<=\n)<[A-Za-z/!]")
+
+    def __init__(self, errors: HTMLParseErrors = None, workers: int = None, chunk_size: int = 1 << 20):
+
+        # parse errors (count only by default)
+        self.errors = errors if errors is not None else HTMLParseErrors()
+
+        # processes in the pool, the number of cpus if None
+        self.workers = workers
+
+        # chars per chunk (about, a chunk ends at the next boundary)
+        self.chunk_size = chunk_size
+
+
+    def _split(self, html_text: str) -> list[int]:
+
+        # the start of each chunk and the end of the input
+        bounds = [0]
+
+        while 1:
+            match = self.split_point.search(html_text, bounds[-1] + self.chunk_size)
+            if match is None:
+                break
+            bounds.append(match.start())
+
+        bounds.append(len(html_text))
+        return bounds
+
+
+    @staticmethod
+    def _encode(token: HTMLToken) -> str|tuple:
+
+        # a token as plain values, pickled much faster than the token:
+        # the data of a character token, else a tuple of the type value
+        # and the fields (the attribute names and values one after another)
+        token_type = token.type
+
+        if token_type is HTMLToken.Type.CHARACTER:
+            return token.data
+
+        if token_type is HTMLToken.Type.START_TAG or token_type is HTMLToken.Type.END_TAG:
+            return (token_type.value, token.tag_name, token.self_closing_tag, *[field for attribute in token.attributes.items() for field in attribute])
+
+        if token_type is HTMLToken.Type.COMMENT:
+            return (token_type.value, token.data)
+
+        if token_type is HTMLToken.Type.DOCTYPE:
+            return (token_type.value, token.name, token.public_identifier, token.system_identifier, token.force_quirks)
+
+        return (token_type.value,)
+
+
+    @staticmethod
+    def _decode(encoded: list[str|tuple]) -> _Generator[HTMLToken, None, None]:
+
+        for fields in encoded:
+
+            if type(fields) is str:
+                yield HTMLTokenCharacter(fields)
+                continue
+
+            kind = HTMLToken.Type(fields[0])
+
+            if kind is HTMLToken.Type.START_TAG or kind is HTMLToken.Type.END_TAG:
+                token = HTMLTokenStartTag() if kind is HTMLToken.Type.START_TAG else HTMLTokenEndTag()
+                token.tag_name = intern_name(fields[1])
+                token.self_closing_tag = fields[2]
+                for j in range(3, len(fields), 2):
+                    token.attributes.append([intern_name(fields[j]), fields[j+1]])
+
+            elif kind is HTMLToken.Type.COMMENT:
+                token = HTMLTokenComment(fields[1])
+
+            elif kind is HTMLToken.Type.DOCTYPE:
+                token = HTMLTokenDoctype()
+                token.name, token.public_identifier, token.system_identifier, token.force_quirks = fields[1:]
+
+            else:
+                token = HTMLTokenEOF()
+
+            yield token
+
+
+    @staticmethod
+    def _tokenize_chunk(html_chunk: str, last: bool, mode: HTMLParseErrors.Mode) -> tuple[list[str|tuple], list[tuple[str, int]], bool]:
+
+        # runs in a worker, a chunk that is not the last one ends with the
+        # "<" of the next chunk, returns the encoded tokens, the errors as
+        # (code, offset in the chunk) and whether the chunk ended in the
+        # data state (the next chunk started in the state it assumed)
+        errors = HTMLParseErrors(mode)
+        tokenizer = HTMLTokenizer(errors)
+
+        tokens = tokenizer.run(html_chunk) if last else tokenizer.feed(html_chunk)
+        encoded = [HTMLParallelTokenizer._encode(token) for token in tokens]
+
+        synced = last or (tokenizer.state is HTMLTokenizer.State.TAG_OPEN and tokenizer.i == tokenizer.end)
+
+        return encoded, [(error.code, error.offset) for error in errors], synced
+
+
+    def run(self, html_text: str|bytes|memoryview|_BinaryIO, encoding: str = None) -> _Generator[HTMLToken, None, None]:
+
+        if not isinstance(html_text, str):
+            html_text = "".join(HTMLInputStream(html_text, encoding).decode())
+
+        bounds = self._split(html_text)
+        chunks = len(bounds) - 1
+
+        if chunks == 1:
+            yield from HTMLTokenizer(self.errors).run(html_text)
+            return
+
+        # the workers only keep a record of the errors if they are reported here
+        mode = HTMLParseErrors.Mode.OFF if self.errors.mode is HTMLParseErrors.Mode.OFF else HTMLParseErrors.Mode.COLLECT
+
+        executor = _ProcessPoolExecutor(self.workers)
+
+        try:
+            futures = [
+                executor.submit(self._tokenize_chunk, html_text[bounds[k]:bounds[k+1]+1], k == chunks - 1, mode)
+                for k in range(chunks)
+            ]
+
+            k = 0
+            while k < chunks:
+
+                encoded, errors, synced = futures[k].result()
+
+                if synced:
+                    for code, offset in errors:
+                        self.errors.report(code, html_text, bounds[k] + offset, 0)
+                    yield from self._decode(encoded)
+                    k += 1
+                    continue
+
+                # the next chunk did not start in the data state, tokenize
+                # from the start of this one until a chunk ends in it
+                # (the lines before it are counted in the whole input)
+                self.errors.advance(html_text, bounds[k], 0)
+
+                tokenizer = HTMLTokenizer(self.errors)
+                tokenizer.offset = bounds[k]
+                fed = bounds[k]
+
+                while k < chunks:
+
+                    last = k == chunks - 1
+                    end = bounds[k+1] if last else bounds[k+1] + 1
+
+                    yield from tokenizer.feed(html_text[fed:end])
+                    fed = end
+                    k += 1
+
+                    if last:
+                        yield from tokenizer.close()
+
+                    elif tokenizer.state is HTMLTokenizer.State.TAG_OPEN and tokenizer.i == tokenizer.end:
+                        break
+
+        finally:
+            executor.shutdown(cancel_futures=True)
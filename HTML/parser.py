@@ -1,8 +1,16 @@
 from enum import Enum as _Enum, auto as _auto
+import mmap as _mmap
+import os as _os
+from itertools import chain as _chain
+from typing import BinaryIO as _BinaryIO, Iterator as _Iterator
 
 from .token import *
 from .tokenizer import *
+from .stream import *
 from .node import *
+from .error import *
+from .cache import *
+from .stack import *
 
 
 __all__ = ["HTMLParser"]
@@ -40,10 +48,45 @@ class HTMLParser:
     whitespace  = "\t\n\f " 
     ascii_alpha = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
     
-    def __init__(self):
+    # see https://html.spec.whatwg.org/multipage/parsing.html#special
+    special_tag_names = frozenset((
+        "address", "applet", "area", "article", "aside", "base", "basefont", "bgsound", "blockquote", "body", "br", "button",
+        "caption", "center", "col", "colgroup", "dd", "details", "dir", "div", "dl", "dt", "embed", "fieldset", "figcaption",
+        "figure", "footer", "form", "frame", "frameset", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr",
+        "html", "iframe", "img", "input", "keygen", "li", "link", "listing", "main", "marquee", "menu", "meta", "nav",
+        "noembed", "noframes", "noscript", "object", "ol", "p", "param", "plaintext", "pre", "script", "search", "section",
+        "select", "source", "style", "summary", "table", "tbody", "td", "template", "textarea", "tfoot", "th", "thead",
+        "title", "tr", "track", "ul", "wbr", "xmp",
+    ))
+    
+    # elements that are popped as soon as they are inserted (they have no end tag)
+    # see https://html.spec.whatwg.org/multipage/syntax.html#void-elements
+    void_tag_names = frozenset(("area", "base", "basefont", "bgsound", "br", "col", "embed", "frame", "hr", "img", "input",
+                                "keygen", "link", "meta", "param", "source", "track", "wbr"))
+    
+    # see https://html.spec.whatwg.org/multipage/parsing.html#generate-implied-end-tags
+    implied_end_tag_names = frozenset(("dd", "dt", "li", "optgroup", "option", "p", "rb", "rp", "rt", "rtc"))
+    
+    heading_tag_names = frozenset(("h1", "h2", "h3", "h4", "h5", "h6"))
+    
+    # the start and end tags of these elements in body close a p element
+    # and the elements in it (see _handle_mode_in_body_start_tag() and
+    # _handle_mode_in_body_end_tag())
+    block_tag_names = frozenset((
+        "address", "article", "aside", "blockquote", "center", "details", "dialog", "dir", "div", "dl", "fieldset",
+        "figcaption", "figure", "footer", "header", "hgroup", "listing", "main", "menu", "nav", "ol", "pre", "search",
+        "section", "summary", "ul",
+    ))
+    
+    # the start tags of these elements in body close a p element in button
+    # scope (li, dd and dt after they close the previous one)
+    closes_p_tag_names = block_tag_names | heading_tag_names | {"p", "hr", "li", "dd", "dt"}
+    
+    def __init__(self, errors: HTMLParseErrors = None):
         
-        # tokenizer
-        self.tokenizer = HTMLTokenizer()
+        # tokenizer (shares the parse errors)
+        self.tokenizer = HTMLTokenizer(errors)
+        self.errors = self.tokenizer.errors
         
         # insertion modes
         self.insertion_mode = self.InsertionMode.INITIAL
@@ -51,9 +94,10 @@ class HTMLParser:
         
         # the output document
         self.document = HTMLNodeDocument()
+        self.document.parse_errors = self.errors
         
         # stacks
-        self.stack_of_open_elements: list[HTMLNodeElement] = []
+        self.stack_of_open_elements = HTMLStackOfOpenElements()
         self.stack_of_template_insertion_modes = []
         self.list_of_active_formatting_elements = []
         
@@ -73,6 +117,17 @@ class HTMLParser:
         
         self.reprocess = 0
         
+        # the token that is processed (and reprocessed if self.reprocess is set)
+        self.token: HTMLToken = None
+        
+        # the tokens left when the parser was paused, they are processed
+        # before the tokens of the next input (see _process_tokens())
+        self.pending_tokens: _Iterator[HTMLToken] = None
+        
+        # the text node that character tokens are appended to, its chunks
+        # are joined when another node is inserted (see _flush_text())
+        self.pending_text_node: HTMLNodeText = None
+        
     
     def _switch_to(self, insertion_mode: "HTMLParser.InsertionMode"):
         
@@ -86,11 +141,62 @@ class HTMLParser:
 
     def _parse_error(self, code: str):
         
-        print("Parse Error:", code)
+        # reported at the current position of the tokenizer
+        self.tokenizer._report_error(code)
+        
+
+    def _flush_text(self):
+        
+        # join the chunks of the pending text node, the text cannot be
+        # appended to after a node is inserted (it is no longer the last
+        # child) so each text node is joined once
+        if self.pending_text_node is not None:
+            self.pending_text_node.data
+            self.pending_text_node = None
         
 
+    def _pop_element(self) -> HTMLNodeElement:
+        
+        return self.stack_of_open_elements.pop()
+    
+    
+    def _generate_implied_end_tags(self, except_tag_name: str = None):
+        
+        stack = self.stack_of_open_elements
+        
+        while stack[-1].tag_name in self.implied_end_tag_names and stack[-1].tag_name != except_tag_name:
+            self._pop_element()
+    
+    
+    def _pop_elements_until(self, *tag_names: str):
+        
+        # pop until an element with one of the names is popped
+        while self._pop_element().tag_name not in tag_names:
+            pass
+    
+    
+    def _close_p_element(self):
+        
+        # see https://html.spec.whatwg.org/multipage/parsing.html#close-a-p-element
+        self._generate_implied_end_tags("p")
+        if self.stack_of_open_elements[-1].tag_name != "p":
+            self._parse_error("")
+        
+        self._pop_elements_until("p")
+    
+    
+    def _insert_doctype_node(self, token: HTMLTokenDoctype):
+        
+        doctype_node = HTMLNodeDocumentType(token.name, token.public_identifier, token.system_identifier)
+        self.document.children.append(doctype_node)
+        
+        return doctype_node
+    
+    
     def _insert_comment_node(self, data: str, parent: HTMLNode = None):
         
+        self._flush_text()
+        
         comment_node = HTMLNodeComment(data)
         parent_ = parent if parent else self.stack_of_open_elements[-1]
         parent_.children.append(comment_node)
@@ -100,6 +206,8 @@ class HTMLParser:
 
     def _insert_element_node_with_token(self, token: HTMLTokenStartTag|HTMLTokenEndTag, parent: HTMLNode = None):
         
+        self._flush_text()
+        
         element_node = HTMLNodeElement(token.tag_name, token.attributes)
         parent_ = parent if parent else self.stack_of_open_elements[-1]
         parent_.children.append(element_node)
@@ -110,6 +218,8 @@ class HTMLParser:
     
     def _insert_element_node(self, tag_name: str, parent: HTMLNode = None):
         
+        self._flush_text()
+        
         element_node = HTMLNodeElement(tag_name, [])
         parent_ = parent if parent else self.stack_of_open_elements[-1]
         parent_.children.append(element_node)
@@ -134,12 +244,31 @@ class HTMLParser:
         self._switch_to(self.InsertionMode.TEXT)
 
 
+    def _split_leading_whitespace(self, token: HTMLTokenCharacter) -> str:
+        
+        # a character token carries a run of chars, return its leading whitespace
+        # and reprocess the rest of the run (if any) as the same token
+        data = token.data
+        rest = data.lstrip(self.whitespace)
+        
+        if rest:
+            token.data = rest
+            self._reprocess_token()
+        
+        return data[:len(data)-len(rest)]
+    
+    
     def _insert_character(self, data: str, parent: HTMLNode = None):
         
         parent_ = parent if parent else self.stack_of_open_elements[-1]
         
-        if len(parent_.children) > 0 and parent_.children[-1].type == HTMLNode.Type.TEXT:
-            parent_.children[-1].data += data
+        if len(parent_.children) > 0 and type(parent_.children[-1]) is HTMLNodeText:
+            # kept as a chunk, copying the text for each token is quadratic
+            if parent_.children[-1] is not self.pending_text_node:
+                self._flush_text()
+                self.pending_text_node = parent_.children[-1]
+            
+            self.pending_text_node.append_data(data)
             return None
 
         text_node = HTMLNodeText(data)
@@ -148,383 +277,735 @@ class HTMLParser:
         return text_node
         
 
-    def _handle_mode_initial(self, token: HTMLToken):
-            
-        if token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            pass # ignore
+    # the rules of each insertion mode are split by token type (and tag
+    # name) into methods named _handle_mode_<mode>_<token type>[_<tag name>],
+    # the token types and tags without one are handled by the "anything
+    # else" method of the mode (see _mode_handlers after the class)
+
+    def _handle_mode_not_implemented(self, token: HTMLToken):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data, self.document)
-            
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            
-            # TODO: something not implemented
-            
-            self.document.children.append(HTMLNodeDocumentType(token.name,\
-                    token.public_identifier, token.system_identifier))
+        assert 0, "NOT IMPLEMENTED"
+    
+    
+    def _handle_mode_initial_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            self._split_leading_whitespace(token) # ignore
         
-            self._switch_to(self.InsertionMode.BEFORE_HTML)
-            
         else:
-            
-            # TODO: something not implemented
-                
-            self._switch_to(self.InsertionMode.BEFORE_HTML)
-            self._reprocess_token()
-            
-            
-    def _handle_mode_before_html(self, token: HTMLToken):
+            self._handle_mode_initial_anything_else(token)
+    
+    
+    def _handle_mode_initial_comment(self, token: HTMLTokenComment):
         
-        if token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
+        self._insert_comment_node(token.data, self.document)
+    
+    
+    def _handle_mode_initial_doctype(self, token: HTMLTokenDoctype):
+        
+        # TODO: something not implemented
+        
+        self._insert_doctype_node(token)
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data, self.document)
+        self._switch_to(self.InsertionMode.BEFORE_HTML)
     
-        elif token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            pass # ignore
+    
+    def _handle_mode_initial_anything_else(self, token: HTMLToken):
         
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._insert_element_node_with_token(token, self.document)
-            self._switch_to(self.InsertionMode.BEFORE_HEAD)
+        # TODO: something not implemented
+        
+        self._switch_to(self.InsertionMode.BEFORE_HTML)
+        self._reprocess_token()
+    
+    
+    def _handle_mode_before_html_doctype(self, token: HTMLTokenDoctype):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_before_html_comment(self, token: HTMLTokenComment):
+        
+        self._insert_comment_node(token.data, self.document)
+    
+    
+    def _handle_mode_before_html_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            self._split_leading_whitespace(token) # ignore
         
-        elif token.type == HTMLToken.Type.END_TAG:
-            
-            if token.tag_name in ("head", "body", "html", "br"):
-                self._insert_element_node("html", self.document)
-                self._switch_to(self.InsertionMode.BEFORE_HEAD)
-                self._reprocess_token()
-            
-            else:
-                self._parse_error("") # ignore
-
         else:
-            self._insert_element_node("html", self.document)
-            self._switch_to(self.InsertionMode.BEFORE_HEAD)
-            self._reprocess_token()
+            self._handle_mode_before_html_anything_else(token)
     
     
-    def _handle_mode_before_head(self, token: HTMLToken):
+    def _handle_mode_before_html_start_tag_html(self, token: HTMLTokenStartTag):
+        
+        self._insert_element_node_with_token(token, self.document)
+        self._switch_to(self.InsertionMode.BEFORE_HEAD)
     
-        if token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            pass # ignore
+    
+    def _handle_mode_before_html_end_tag(self, token: HTMLTokenEndTag):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data)
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_before_html_anything_else(self, token: HTMLToken):
         
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
-            
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._switch_to(self.InsertionMode.AFTER_BODY)
-            self._reprocess_token()
-                
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "head":
-            el = self._insert_element_node_with_token(token)
-            self.head_element_pointer = el
-            self._switch_to(self.InsertionMode.IN_HEAD)
+        self._insert_element_node("html", self.document)
+        self._switch_to(self.InsertionMode.BEFORE_HEAD)
+        self._reprocess_token()
+    
+    _handle_mode_before_html_end_tag_head = \
+    _handle_mode_before_html_end_tag_body = \
+    _handle_mode_before_html_end_tag_html = \
+    _handle_mode_before_html_end_tag_br   = _handle_mode_before_html_anything_else
+    
+    
+    def _handle_mode_before_head_character(self, token: HTMLTokenCharacter):
         
-        elif token.type == HTMLToken.Type.END_TAG:
-            
-            if token.tag_name in ("head", "body", "html", "br"):
-                self.head_element_pointer = self._insert_element_node("head")
-                self._switch_to(self.InsertionMode.IN_HEAD)
-                self._reprocess_token()
+        if token.data[0] in self.whitespace:
+            self._split_leading_whitespace(token) # ignore
         
-            else:
-                self._parse_error("") # ignore
-            
         else:
-            self.head_element_pointer = self._insert_element_node("head")
-            self._switch_to(self.InsertionMode.IN_HEAD)
-            self._reprocess_token()
+            self._handle_mode_before_head_anything_else(token)
+    
     
+    def _handle_mode_before_head_comment(self, token: HTMLTokenComment):
+        
+        self._insert_comment_node(token.data)
     
-    def _handle_mode_in_head(self, token: HTMLToken):
     
-        if token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            self._insert_character(token.data)
+    def _handle_mode_before_head_doctype(self, token: HTMLTokenDoctype):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data)
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_before_head_start_tag_html(self, token: HTMLTokenStartTag):
         
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
-            
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._parse_error("") 
-            if any(e.type == HTMLNode.Type.ELEMENT and \
-                e.tag_name == "template" for e in self.stack_of_open_elements):
-                
-                pass # ignore
-            else:
-                for attr in token.attributes:
-                    if not self.stack_of_open_elements[-1].has_attr(attr[0]):
-                        self.stack_of_open_elements[-1].append_attr(attr)
+        self._switch_to(self.InsertionMode.AFTER_BODY)
+        self._reprocess_token()
+    
+    
+    def _handle_mode_before_head_start_tag_head(self, token: HTMLTokenStartTag):
         
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "meta":
-            self._insert_element_node_with_token(token)
-            self.stack_of_open_elements.pop()
-            # TODO: something not implemented
-            
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "title":
-            self._generic_rcdata_element_parsing(token)
+        el = self._insert_element_node_with_token(token)
+        self.head_element_pointer = el
+        self._switch_to(self.InsertionMode.IN_HEAD)
+    
+    
+    def _handle_mode_before_head_end_tag(self, token: HTMLTokenEndTag):
         
-        elif token.type == HTMLToken.Type.END_TAG:
-            
-            if token.tag_name == "head":
-                self.stack_of_open_elements.pop()
-                self._switch_to(self.InsertionMode.AFTER_HEAD)
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_before_head_anything_else(self, token: HTMLToken):
         
-            elif token.tag_name in ("body", "html", "br"):
-                self.stack_of_open_elements.pop()
-                self._switch_to(self.InsertionMode.AFTER_HEAD)
-                self._reprocess_token()
-            
-            else:
-                self._parse_error("") # ignore 
-                
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "head":
-            self._parse_error("") # ignore 
+        self.head_element_pointer = self._insert_element_node("head")
+        self._switch_to(self.InsertionMode.IN_HEAD)
+        self._reprocess_token()
+    
+    _handle_mode_before_head_end_tag_head = \
+    _handle_mode_before_head_end_tag_body = \
+    _handle_mode_before_head_end_tag_html = \
+    _handle_mode_before_head_end_tag_br   = _handle_mode_before_head_anything_else
+    
+    
+    def _handle_mode_in_head_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            self._insert_character(self._split_leading_whitespace(token))
         
         else:
-            self.stack_of_open_elements.pop()
-            self._switch_to(self.InsertionMode.AFTER_HEAD)
-            self._reprocess_token()
-            
-            
-    def _handle_mode_after_head(self, token: HTMLToken):
+            self._handle_mode_in_head_anything_else(token)
     
-        if token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            self._insert_character(token.data)
+    
+    def _handle_mode_in_head_comment(self, token: HTMLTokenComment):
+        
+        self._insert_comment_node(token.data)
+    
+    
+    def _handle_mode_in_head_doctype(self, token: HTMLTokenDoctype):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data)
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_in_head_start_tag_html(self, token: HTMLTokenStartTag):
         
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
-            
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._parse_error("") 
-            if any(e.type == HTMLNode.Type.ELEMENT and \
-                e.tag_name == "template" for e in self.stack_of_open_elements):
-                
-                pass # ignore
-            else:
-                for attr in token.attributes:
-                    if not self.stack_of_open_elements[-1].has_attr(attr[0]):
-                        self.stack_of_open_elements[-1].append_attr(attr)
-            
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "body":
-            self._insert_element_node_with_token(token)
-            self.frameset_ok = 0
-            self._switch_to(self.InsertionMode.IN_BODY)
-            
-        elif token.type == HTMLToken.Type.END_TAG:
-            
-            if token.tag_name in ("body", "html", "br"):
-                self._insert_element_node("body")
-                self._switch_to(self.InsertionMode.IN_BODY)
-                self._reprocess_token()
-
-            else:                
-                self._parse_error("") # ignore
-                
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "head":
-            self._parse_error("") # ignore
+        self._handle_mode_in_body_start_tag_html(token)
+    
+    
+    def _handle_mode_in_head_start_tag_meta(self, token: HTMLTokenStartTag):
+        
+        self._insert_element_node_with_token(token)
+        self._pop_element()
+        # TODO: something not implemented
+    
+    
+    def _handle_mode_in_head_start_tag_link(self, token: HTMLTokenStartTag):
+        
+        self._insert_element_node_with_token(token)
+        self._pop_element()
+    
+    _handle_mode_in_head_start_tag_base = \
+    _handle_mode_in_head_start_tag_basefont = \
+    _handle_mode_in_head_start_tag_bgsound = _handle_mode_in_head_start_tag_link
+    
+    
+    def _handle_mode_in_head_start_tag_title(self, token: HTMLTokenStartTag):
+        
+        self._generic_rcdata_element_parsing(token)
+    
+    
+    def _handle_mode_in_head_start_tag_head(self, token: HTMLTokenStartTag):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_in_head_end_tag_head(self, token: HTMLTokenEndTag):
+        
+        self._pop_element()
+        self._switch_to(self.InsertionMode.AFTER_HEAD)
+    
+    
+    def _handle_mode_in_head_end_tag(self, token: HTMLTokenEndTag):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_in_head_anything_else(self, token: HTMLToken):
+        
+        self._pop_element()
+        self._switch_to(self.InsertionMode.AFTER_HEAD)
+        self._reprocess_token()
+    
+    _handle_mode_in_head_end_tag_body = \
+    _handle_mode_in_head_end_tag_html = \
+    _handle_mode_in_head_end_tag_br   = _handle_mode_in_head_anything_else
+    
+    
+    def _handle_mode_after_head_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            self._insert_character(self._split_leading_whitespace(token))
         
         else:
-            self._insert_element_node("body")
-            self._switch_to(self.InsertionMode.IN_BODY)
-            self._reprocess_token()
+            self._handle_mode_after_head_anything_else(token)
+    
+    
+    def _handle_mode_after_head_comment(self, token: HTMLTokenComment):
         
+        self._insert_comment_node(token.data)
+    
+    
+    def _handle_mode_after_head_doctype(self, token: HTMLTokenDoctype):
         
-    def _handle_mode_in_body(self, token: HTMLToken):
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_after_head_start_tag_html(self, token: HTMLTokenStartTag):
         
-        if token.type == HTMLToken.Type.CHARACTER and token.data == "\0":
+        self._handle_mode_in_body_start_tag_html(token)
+    
+    
+    def _handle_mode_after_head_start_tag_body(self, token: HTMLTokenStartTag):
+        
+        self._insert_element_node_with_token(token)
+        self.frameset_ok = 0
+        self._switch_to(self.InsertionMode.IN_BODY)
+    
+    
+    def _handle_mode_after_head_start_tag_head(self, token: HTMLTokenStartTag):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_after_head_end_tag(self, token: HTMLTokenEndTag):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_after_head_anything_else(self, token: HTMLToken):
+        
+        self._insert_element_node("body")
+        self._switch_to(self.InsertionMode.IN_BODY)
+        self._reprocess_token()
+    
+    _handle_mode_after_head_end_tag_body = \
+    _handle_mode_after_head_end_tag_html = \
+    _handle_mode_after_head_end_tag_br   = _handle_mode_after_head_anything_else
+    
+    
+    def _handle_mode_in_body_character(self, token: HTMLTokenCharacter):
+        
+        if token.data == "\0":
             self._parse_error("") # ignore
         
-        elif token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
+        elif not token.data.lstrip(self.whitespace):
             # TODO: reconstruct ish thing 
             self._insert_character(token.data)
-            
-        elif token.type == HTMLToken.Type.CHARACTER:
+        
+        else:
             # TODO: reconstruct ish thing 
             self._insert_character(token.data)
             self.frameset_ok = 0
+    
+    
+    def _handle_mode_in_body_comment(self, token: HTMLTokenComment):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data)
+        self._insert_comment_node(token.data)
+    
+    
+    def _handle_mode_in_body_doctype(self, token: HTMLTokenDoctype):
         
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
-
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._parse_error("") 
-            if any(e.type == HTMLNode.Type.ELEMENT and \
-                e.tag_name == "template" for e in self.stack_of_open_elements):
-                
-                pass # ignore
-            else:
-                for attr in token.attributes:
-                    if not self.stack_of_open_elements[-1].has_attr(attr[0]):
-                        self.stack_of_open_elements[-1].append_attr(attr)
-                    
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "body":
-            self._parse_error("")
-            assert 0, "NOT IMPLEMENTED"
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_in_body_start_tag_html(self, token: HTMLTokenStartTag):
+        
+        self._parse_error("") 
+        if self.stack_of_open_elements.has("template"):
+            pass # ignore
+        else:
+            for name, value in token.attributes.items():
+                if not self.stack_of_open_elements[0].has_attr(name):
+                    self.stack_of_open_elements[0].append_attr(name, value)
+    
+    
+    def _handle_mode_in_body_start_tag_body(self, token: HTMLTokenStartTag):
+        
+        self._parse_error("")
+        assert 0, "NOT IMPLEMENTED"
+    
+    
+    def _handle_mode_in_body_start_tag(self, token: HTMLTokenStartTag):
+        
+        tag_name = token.tag_name
+        
+        if tag_name in self.closes_p_tag_names:
+            
+            if self.stack_of_open_elements.has_in_scope("p", HTMLStackOfOpenElements.Scope.BUTTON):
+                self._close_p_element()
             
-        elif token.type == HTMLToken.Type.EOF:
-            self.stop = 1
+            if tag_name in self.heading_tag_names and self.stack_of_open_elements[-1].tag_name in self.heading_tag_names:
+                self._parse_error("")
+                self._pop_element()
         
-        elif token.type == HTMLToken.Type.END_TAG and token.tag_name == "body":
-            # TODO: something not implemented
-            self._switch_to(self.InsertionMode.AFTER_BODY)
+        # TODO: something not implemented
+        self._insert_element_node_with_token(token)
         
-        elif token.type == HTMLToken.Type.END_TAG and token.tag_name == "html":
-            # TODO: something not implemented
-            self._switch_to(self.InsertionMode.AFTER_BODY)
-            self._reprocess_token()
+        if token.tag_name in self.void_tag_names:
+            self._pop_element()
+    
+    
+    def _handle_mode_in_body_start_tag_li(self, token: HTMLTokenStartTag):
         
-        elif token.type == HTMLToken.Type.START_TAG:
-            # TODO: something not implemented
-            self._insert_element_node_with_token(token)
+        # close the li element (and the elements in it) that is open
+        # above the special elements but address, div and p, then an
+        # open p element as any block start tag does
+        self.frameset_ok = 0
         
-        elif token.type == HTMLToken.Type.END_TAG:
-            pass # ignore
+        for index in range(len(self.stack_of_open_elements) - 1, -1, -1):
             
-        else:
-            assert 0, "UNREACHABLE"
+            node = self.stack_of_open_elements[index]
             
+            if node.tag_name == "li":
+                self._generate_implied_end_tags("li")
+                if self.stack_of_open_elements[-1].tag_name != "li":
+                    self._parse_error("")
+                self._pop_elements_until("li")
+                break
             
-    def _handle_mode_text(self, token: HTMLToken):
+            if node.tag_name in self.special_tag_names and node.tag_name not in ("address", "div", "p"):
+                break
         
-        if token.type == HTMLToken.Type.CHARACTER:
-            self._insert_character(token.data)
-
-        elif token.type == HTMLToken.Type.EOF:
-            assert 0, "NOT IMPLEMENTED"
+        self._handle_mode_in_body_start_tag(token)
+    
+    
+    def _handle_mode_in_body_start_tag_dd(self, token: HTMLTokenStartTag):
         
-        elif token.type == HTMLToken.Type.END_TAG and token.tag_name == "script":
-            assert 0, "NOT IMPLEMENTED"
+        # same as li for a dd or dt element
+        self.frameset_ok = 0
         
-        else:
-            self.stack_of_open_elements.pop()
-            self._switch_to(self.original_insertion_mode)
-
+        for index in range(len(self.stack_of_open_elements) - 1, -1, -1):
+            
+            node = self.stack_of_open_elements[index]
+            
+            if node.tag_name in ("dd", "dt"):
+                self._generate_implied_end_tags(node.tag_name)
+                if self.stack_of_open_elements[-1].tag_name != node.tag_name:
+                    self._parse_error("")
+                self._pop_elements_until(node.tag_name)
+                break
             
-    def _handle_mode_after_body(self, token: HTMLToken):
+            if node.tag_name in self.special_tag_names and node.tag_name not in ("address", "div", "p"):
+                break
         
-        if token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            # TODO: reconstruct ish thing 
-            self._insert_character(token.data)
+        self._handle_mode_in_body_start_tag(token)
+    
+    _handle_mode_in_body_start_tag_dt = _handle_mode_in_body_start_tag_dd
+    
+    
+    def _handle_mode_in_body_end_tag_body(self, token: HTMLTokenEndTag):
         
-        elif token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data, self.stack_of_open_elements[-1]) # the html element
-            
-        elif token.type == HTMLToken.Type.DOCTYPE:
+        # TODO: something not implemented
+        self._switch_to(self.InsertionMode.AFTER_BODY)
+    
+    
+    def _handle_mode_in_body_end_tag_html(self, token: HTMLTokenEndTag):
+        
+        # TODO: something not implemented
+        self._switch_to(self.InsertionMode.AFTER_BODY)
+        self._reprocess_token()
+    
+    
+    def _handle_mode_in_body_end_tag_p(self, token: HTMLTokenEndTag):
+        
+        if not self.stack_of_open_elements.has_in_scope("p", HTMLStackOfOpenElements.Scope.BUTTON):
+            self._parse_error("")
+            self._insert_element_node("p")
+        
+        self._close_p_element()
+    
+    
+    def _handle_mode_in_body_end_tag_li(self, token: HTMLTokenEndTag):
+        
+        if not self.stack_of_open_elements.has_in_scope("li", HTMLStackOfOpenElements.Scope.LIST_ITEM):
             self._parse_error("") # ignore
-
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._parse_error("") 
-            if any(e.type == HTMLNode.Type.ELEMENT and \
-                e.tag_name == "template" for e in self.stack_of_open_elements):
-                
-                pass # ignore
-            else:
-                for attr in token.attributes:
-                    if not self.stack_of_open_elements[-1].has_attr(attr[0]):
-                        self.stack_of_open_elements[-1].append_attr(attr)
+            return
         
-        elif token.type == HTMLToken.Type.END_TAG and token.tag_name == "html":
-            # TODO: something not implemented
-            self._switch_to(self.InsertionMode.AFTER_AFTER_BODY)
-            
-        elif token.type == HTMLToken.Type.EOF:
-            self.stop = 1
+        self._generate_implied_end_tags("li")
+        if self.stack_of_open_elements[-1].tag_name != "li":
+            self._parse_error("")
         
-        else:
+        self._pop_elements_until("li")
+    
+    
+    def _handle_mode_in_body_end_tag_dd(self, token: HTMLTokenEndTag):
+        
+        if not self.stack_of_open_elements.has_in_scope(token.tag_name):
+            self._parse_error("") # ignore
+            return
+        
+        self._generate_implied_end_tags(token.tag_name)
+        if self.stack_of_open_elements[-1].tag_name != token.tag_name:
             self._parse_error("")
-            self._switch_to(self.InsertionMode.IN_BODY)
-            self._reprocess_token()
+        
+        self._pop_elements_until(token.tag_name)
+    
+    _handle_mode_in_body_end_tag_dt = _handle_mode_in_body_end_tag_dd
+    
+    
+    def _handle_mode_in_body_end_tag_h1(self, token: HTMLTokenEndTag):
+        
+        # any heading closes the open one
+        if not any(self.stack_of_open_elements.has_in_scope(tag_name) for tag_name in self.heading_tag_names):
+            self._parse_error("") # ignore
+            return
+        
+        self._generate_implied_end_tags()
+        if self.stack_of_open_elements[-1].tag_name != token.tag_name:
+            self._parse_error("")
+        
+        self._pop_elements_until(*self.heading_tag_names)
+    
+    _handle_mode_in_body_end_tag_h2 = \
+    _handle_mode_in_body_end_tag_h3 = \
+    _handle_mode_in_body_end_tag_h4 = \
+    _handle_mode_in_body_end_tag_h5 = \
+    _handle_mode_in_body_end_tag_h6 = _handle_mode_in_body_end_tag_h1
+    
+    
+    def _handle_mode_in_body_end_tag(self, token: HTMLTokenEndTag):
+        
+        stack = self.stack_of_open_elements
+        
+        if token.tag_name in self.block_tag_names:
+            
+            if not stack.has_in_scope(token.tag_name):
+                self._parse_error("") # ignore
+                return
             
+            self._generate_implied_end_tags()
+            if stack[-1].tag_name != token.tag_name:
+                self._parse_error("")
             
-    def _handle_mode_after_after_body(self, token: HTMLToken):
+            self._pop_elements_until(token.tag_name)
+            return
         
-        if token.type == HTMLToken.Type.COMMENT:
-            self._insert_comment_node(token.data, self.document)
+        # any other end tag, closes the nearest element with the name unless
+        # a special element is above it
         
-        elif token.type == HTMLToken.Type.CHARACTER and token.data in self.whitespace:
-            # TODO: reconstruct ish thing 
-            self._insert_character(token.data)
+        for index in range(len(stack) - 1, -1, -1):
             
-        elif token.type == HTMLToken.Type.DOCTYPE:
-            self._parse_error("") # ignore
-
-        elif token.type == HTMLToken.Type.START_TAG and token.tag_name == "html":
-            self._parse_error("") 
-            if any(e.type == HTMLNode.Type.ELEMENT and \
-                e.tag_name == "template" for e in self.stack_of_open_elements):
+            node = stack[index]
+            
+            if node.tag_name == token.tag_name:
+                
+                self._generate_implied_end_tags(token.tag_name)
+                if node is not stack[-1]:
+                    self._parse_error("")
                 
-                pass # ignore
-            else:
-                for attr in token.attributes:
-                    if not self.stack_of_open_elements[-1].has_attr(attr[0]):
-                        self.stack_of_open_elements[-1].append_attr(attr)
+                while self._pop_element() is not node:
+                    pass
+                
+                return
             
-        elif token.type == HTMLToken.Type.EOF:
-            self.stop = 1
+            if node.tag_name in self.special_tag_names:
+                self._parse_error("") # ignore
+                return
+    
+    
+    def _handle_mode_in_body_eof(self, token: HTMLTokenEOF):
+        
+        self.stop = 1
+    
+    
+    def _handle_mode_text_character(self, token: HTMLTokenCharacter):
+        
+        self._insert_character(token.data)
+    
+    
+    def _handle_mode_text_eof(self, token: HTMLTokenEOF):
+        
+        assert 0, "NOT IMPLEMENTED"
+    
+    
+    def _handle_mode_text_end_tag_script(self, token: HTMLTokenEndTag):
+        
+        assert 0, "NOT IMPLEMENTED"
+    
+    
+    def _handle_mode_text_anything_else(self, token: HTMLToken):
+        
+        self._pop_element()
+        self._switch_to(self.original_insertion_mode)
+    
+    
+    def _handle_mode_after_body_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            # TODO: reconstruct ish thing 
+            self._insert_character(self._split_leading_whitespace(token))
         
         else:
-            self._parse_error("")
-            self._switch_to(self.InsertionMode.IN_BODY)
-            self._reprocess_token()
+            self._handle_mode_after_body_anything_else(token)
+    
+    
+    def _handle_mode_after_body_comment(self, token: HTMLTokenComment):
+        
+        self._insert_comment_node(token.data, self.stack_of_open_elements[-1]) # the html element
+    
+    
+    def _handle_mode_after_body_doctype(self, token: HTMLTokenDoctype):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_after_body_start_tag_html(self, token: HTMLTokenStartTag):
+        
+        self._handle_mode_in_body_start_tag_html(token)
+    
+    
+    def _handle_mode_after_body_end_tag_html(self, token: HTMLTokenEndTag):
+        
+        # TODO: something not implemented
+        self._switch_to(self.InsertionMode.AFTER_AFTER_BODY)
+    
+    
+    def _handle_mode_after_body_eof(self, token: HTMLTokenEOF):
+        
+        self.stop = 1
+    
+    
+    def _handle_mode_after_body_anything_else(self, token: HTMLToken):
+        
+        self._parse_error("")
+        self._switch_to(self.InsertionMode.IN_BODY)
+        self._reprocess_token()
+    
+    
+    def _handle_mode_after_after_body_comment(self, token: HTMLTokenComment):
+        
+        self._insert_comment_node(token.data, self.document)
+    
+    
+    def _handle_mode_after_after_body_character(self, token: HTMLTokenCharacter):
+        
+        if token.data[0] in self.whitespace:
+            # TODO: reconstruct ish thing 
+            self._insert_character(self._split_leading_whitespace(token))
+        
+        else:
+            self._handle_mode_after_after_body_anything_else(token)
+    
+    
+    def _handle_mode_after_after_body_doctype(self, token: HTMLTokenDoctype):
+        
+        self._parse_error("") # ignore
+    
+    
+    def _handle_mode_after_after_body_start_tag_html(self, token: HTMLTokenStartTag):
+        
+        self._handle_mode_in_body_start_tag_html(token)
+    
+    
+    def _handle_mode_after_after_body_eof(self, token: HTMLTokenEOF):
+        
+        self.stop = 1
+    
+    
+    def _handle_mode_after_after_body_anything_else(self, token: HTMLToken):
+        
+        self._parse_error("")
+        self._switch_to(self.InsertionMode.IN_BODY)
+        self._reprocess_token()
+            
+            
+    def run(self, html_text: str|bytes|memoryview|_BinaryIO, encoding: str = None, cache: HTMLTokenCache = None) -> HTMLNodeDocument:
+        
+        if cache is None or not isinstance(html_text, (str, bytes, memoryview, _mmap.mmap)):
+            # a file object can be read only once, it is not cached
+            tokens = self.tokenizer.run(html_text, encoding)
+        
+        else:
+            # replay the tokens of the same input if they are cached,
+            # else record them while tokenizing
+            key = cache.key(html_text, encoding)
+            tokens = cache.read(key, self.tokenizer)
             
+            if tokens is None:
+                tokens = cache.record(key, self.tokenizer.run(html_text, encoding), self.tokenizer)
             
-    def run(self, html_text: str) -> HTMLNodeDocument:
+            elif self.errors.mode is HTMLParseErrors.Mode.COLLECT or self.errors.mode is HTMLParseErrors.Mode.LOG:
+                # the lines of the errors are counted in the input
+                self.tokenizer.html_text = html_text if isinstance(html_text, str) else "".join(HTMLInputStream(html_text, encoding).decode())
+        
+        self._process_tokens(tokens)
+        self._flush_text()
         
-        tokens = self.tokenizer.run(html_text)
-        token = None
+        return self.document
+    
+    
+    def _process_tokens(self, tokens: _Iterator[HTMLToken]):
+        
+        # tree construction until the tokens run out (more input is needed),
+        # the parser is paused or the EOF token is processed, the state is
+        # kept in self so a token is reprocessed (and a pause holds) across
+        # the inputs that are fed
+        if self.pending_tokens is not None:
+            tokens = _chain(self.pending_tokens, tokens)
+            self.pending_tokens = None
+        
+        if self.parser_pause:
+            self.pending_tokens = tokens
+            return
+        
+        mode_handlers = self._mode_handlers
         
-        # until EOF token is processed
         while not self.stop:
             
             if not self.reprocess:
                 # get most recently emitted token
-                token = next(tokens)
-            # else: token = token # process same token
+                self.token = next(tokens, None)
+                if self.token is None:
+                    break
+            # else: process the same token
+            
+            token = self.token
             
             # reset reprocess
             self.reprocess = 0
             
-            if self.insertion_mode == self.InsertionMode.INITIAL:
-                self._handle_mode_initial(token)
-                
-            elif self.insertion_mode == self.InsertionMode.BEFORE_HTML:
-                self._handle_mode_before_html(token)
-                
-            elif self.insertion_mode == self.InsertionMode.BEFORE_HEAD:
-                self._handle_mode_before_head(token)
-                
-            elif self.insertion_mode == self.InsertionMode.IN_HEAD:
-                self._handle_mode_in_head(token)
-
-            elif self.insertion_mode == self.InsertionMode.AFTER_HEAD:
-                self._handle_mode_after_head(token)
-                
-            elif self.insertion_mode == self.InsertionMode.IN_BODY:
-                self._handle_mode_in_body(token)
-                
-            elif self.insertion_mode == self.InsertionMode.TEXT:
-                self._handle_mode_text(token)
-                
-            elif self.insertion_mode == self.InsertionMode.AFTER_BODY:
-                self._handle_mode_after_body(token)
-                
-            elif self.insertion_mode == self.InsertionMode.AFTER_AFTER_BODY:
-                self._handle_mode_after_after_body(token)
+            # dispatch to the handler of the token in the current insertion mode
+            handler = mode_handlers[self.insertion_mode][token.type]
+            
+            if type(handler) is dict:
+                handler = handler.get(token.tag_name) or handler[None]
             
-            else:
-                assert 0, "NOT IMPLEMENTED"
+            handler(self, token)
+            
+            if self.parser_pause:
+                self.pending_tokens = tokens
+                break
+    
+    
+    def feed(self, html_chunk: str) -> HTMLNodeDocument:
+        
+        # builds the tree as far as the chunk goes, the document can be read
+        # between the chunks (e.g. the head is complete once the body starts)
+        self._process_tokens(self.tokenizer.feed(html_chunk))
+        
+        return self.document
+    
+    
+    def close(self) -> HTMLNodeDocument:
+        
+        # all the input is fed, the tree is complete unless the parser is paused
+        self._process_tokens(self.tokenizer.close())
+        self._flush_text()
         
         return self.document
+    
+    
+    def resume(self) -> HTMLNodeDocument:
+        
+        # the pause ended (e.g. a script ran), process the tokens held back
+        self.parser_pause = 0
+        self._process_tokens(iter(()))
+        
+        return self.document
+    
+    
+    def parse_file(self, path: str, encoding: str = None, cache: HTMLTokenCache = None) -> HTMLNodeDocument:
+        
+        with open(path, "rb") as f:
+            
+            # an empty file cannot be mapped
+            if _os.fstat(f.fileno()).st_size == 0:
+                return self.run(b"", encoding, cache)
+            
+            # map the file instead of reading it, only the pages that are being
+            # decoded are resident and the input is never copied as a whole
+            mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+            
+            try:
+                return self.run(mapped, encoding, cache)
+            
+            finally:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass # still exported by a failed run, closed when it is collected
+
+
+def _build_mode_handlers(parser: type[HTMLParser]) -> dict:
+    
+    # insertion mode -> token type -> handler, a handler of a tag token type
+    # is a dict of tag name -> handler if the mode has a method for a tag
+    # name, the handler of the other tag names is under None
+    mode_handlers = {}
+    
+    for mode in parser.InsertionMode:
+        
+        prefix = f"_handle_mode_{mode.name.lower()}_"
+        anything_else = getattr(parser, prefix + "anything_else", parser._handle_mode_not_implemented)
+        
+        handlers = mode_handlers[mode] = {}
+        
+        for token_type in HTMLToken.Type:
+            
+            type_prefix = prefix + token_type.name.lower()
+            handler = getattr(parser, type_prefix, anything_else)
+            
+            tag_handlers = {name[len(type_prefix)+1:]: getattr(parser, name) for name in dir(parser) if name.startswith(type_prefix + "_")}
+            
+            if tag_handlers:
+                tag_handlers[None] = handler
+                handler = tag_handlers
+            
+            handlers[token_type] = handler
+    
+    return mode_handlers
+
+
+# built once so that run() finds the handler of a token in a few lookups
+HTMLParser._mode_handlers = _build_mode_handlers(HTMLParser)
@@ -0,0 +1,30 @@
+__all__ = ["HTMLSpan"]
+
+
+class HTMLSpan:
+
+    # a value that is a slice of the input, the slice is taken on first
+    # use so a value that is never read is never copied (the HTML and CSS
+    # tokenizers make a span only if the slice needs no decoding)
+    __slots__ = ("text", "start", "end")
+
+    def __init__(self, text: str, start: int, end: int):
+
+        self.text = text
+        self.start = start
+        self.end = end
+
+
+    def __len__(self):
+
+        return self.end - self.start
+
+
+    def __str__(self):
+
+        return self.text[self.start:self.end]
+
+
+    def __repr__(self):
+
+        return f"HTMLSpan(start={self.start}, end={self.end})"
@@ -0,0 +1,151 @@
+from enum import Enum as _Enum, auto as _auto
+from typing import Generator as _Generator
+
+from .node import *
+
+
+__all__ = ["HTMLStackOfOpenElements"]
+
+
+class HTMLStackOfOpenElements:
+
+    # the stack of open elements with the stack indexes of the elements of
+    # each tag name and of the boundary elements of each scope, so that
+    # "an element with the name is on the stack" and "has an element in
+    # scope" look at the last index of two lists instead of walking the stack
+    # see https://html.spec.whatwg.org/multipage/parsing.html#the-stack-of-open-elements
+    # (html elements only, the nodes have no namespace)
+
+    class Scope(_Enum):
+
+        DEFAULT   = _auto()
+        LIST_ITEM = _auto()
+        BUTTON    = _auto()
+        TABLE     = _auto()
+        SELECT    = _auto()
+
+
+    default_scope_names = frozenset(("applet", "caption", "html", "table", "td", "th", "marquee", "object", "template"))
+
+    # scope -> the tag names of its boundary elements
+    scope_names = {
+        Scope.DEFAULT:   default_scope_names,
+        Scope.LIST_ITEM: default_scope_names | {"ol", "ul"},
+        Scope.BUTTON:    default_scope_names | {"button"},
+        Scope.TABLE:     frozenset(("html", "table", "template")),
+    }
+
+    # the boundary elements of the select scope are all but these
+    select_scope_names = frozenset(("optgroup", "option"))
+
+    def __init__(self):
+
+        self.elements: list[HTMLNodeElement] = []
+
+        # tag name -> stack indexes of the elements with the name
+        self.indexes: dict[str, list[int]] = {}
+
+        # scope -> stack indexes of its boundary elements
+        self.boundaries: dict[HTMLStackOfOpenElements.Scope, list[int]] = {scope: [] for scope in self.Scope}
+
+        # tag name -> the lists above an element with the name is in, its
+        # index is appended to (and popped from) each of them
+        self.index_lists: dict[str, tuple[list[int], ...]] = {}
+
+
+    def __len__(self):
+
+        return len(self.elements)
+
+
+    def __iter__(self) -> _Generator[HTMLNodeElement, None, None]:
+
+        # from the bottom (the html element) to the current node
+        return iter(self.elements)
+
+
+    def __getitem__(self, index: int) -> HTMLNodeElement:
+
+        return self.elements[index]
+
+
+    def __repr__(self):
+
+        return repr(self.elements)
+
+
+    def _index_lists_of(self, tag_name: str) -> tuple[list[int], ...]:
+
+        index_lists = self.index_lists.get(tag_name)
+
+        if index_lists is None:
+
+            index_lists = [self.indexes.setdefault(tag_name, [])]
+
+            for scope, names in self.scope_names.items():
+                if tag_name in names:
+                    index_lists.append(self.boundaries[scope])
+
+            if tag_name not in self.select_scope_names:
+                index_lists.append(self.boundaries[self.Scope.SELECT])
+
+            index_lists = self.index_lists[tag_name] = tuple(index_lists)
+
+        return index_lists
+
+
+    def append(self, element: HTMLNodeElement):
+
+        index = len(self.elements)
+        self.elements.append(element)
+
+        for indexes in self._index_lists_of(element.tag_name):
+            indexes.append(index)
+
+
+    def pop(self) -> HTMLNodeElement:
+
+        element = self.elements.pop()
+
+        # the element is the last one in each of its lists
+        for indexes in self.index_lists[element.tag_name]:
+            indexes.pop()
+
+        return element
+
+
+    def remove(self, element: HTMLNodeElement):
+
+        # an element that is not the current node (e.g. by the adoption
+        # agency algorithm), the elements above it are pushed back
+        index = next(i for i in range(len(self.elements) - 1, -1, -1) if self.elements[i] is element)
+        above = [self.pop() for _ in range(len(self.elements) - index - 1)]
+
+        self.pop()
+
+        for above_element in reversed(above):
+            self.append(above_element)
+
+
+    def has(self, tag_name: str) -> bool:
+
+        # an element with the name is on the stack
+        return bool(self.indexes.get(tag_name))
+
+
+    def count(self, tag_name: str) -> int:
+
+        indexes = self.indexes.get(tag_name)
+        return len(indexes) if indexes else 0
+
+
+    def has_in_scope(self, tag_name: str, scope: "HTMLStackOfOpenElements.Scope" = Scope.DEFAULT) -> bool:
+
+        # the topmost element with the name is above the topmost boundary
+        # element of the scope (or is that element)
+        indexes = self.indexes.get(tag_name)
+        if not indexes:
+            return False
+
+        boundaries = self.boundaries[scope]
+        return not boundaries or indexes[-1] >= boundaries[-1]
@@ -0,0 +1,125 @@
+import json as _json
+
+from .token import *
+
+
+__all__ = ["HTMLTokenizerStats"]
+
+
+class HTMLTokenizerStats:
+
+    # what the tokenizer did in each state, recorded if it is given one
+    # (see HTMLTokenizer._tokenize_instrumented()), the states are keyed
+    # by their names
+
+    # state groups, a state is in the first group with a part of its name
+    group_parts = (
+        ("character reference", ("CHARACTER_REFERENCE", "AMBIGUOUS_AMPERSAND")),
+        ("script escaped",      ("ESCAPE",)),
+        ("attribute",           ("ATTRIBUTE",)),
+        ("doctype",             ("DOCTYPE",)),
+        ("comment",             ("COMMENT", "MARKUP_DECLARATION")),
+        ("cdata",               ("CDATA",)),
+        ("text",                ("DATA", "RCDATA", "RAWTEXT", "PLAIN_TEXT")),
+        ("tag",                 ("TAG",)),
+    )
+
+    def __init__(self):
+
+        # by state
+        self.calls: dict[str, int] = {} # handler calls
+        self.chars: dict[str, int] = {} # input chars consumed
+        self.times: dict[str, int] = {} # nanoseconds in the handler
+
+        # by (state, next state), the state changed by the handler
+        self.transitions: dict[tuple[str, str], int] = {}
+
+        # by HTMLToken.Type name
+        self.tokens: dict[str, int] = {}
+
+
+    def __repr__(self):
+
+        return f"HTMLTokenizerStats(calls={sum(self.calls.values())}, chars={sum(self.chars.values())}, tokens={sum(self.tokens.values())})"
+
+
+    @classmethod
+    def group(cls, state: str) -> str:
+
+        for group, parts in cls.group_parts:
+            if any(part in state for part in parts):
+                return group
+
+        return "other"
+
+
+    def record(self, state: str, next_state: str, chars: int, time: int, tokens: list[HTMLToken]):
+
+        self.calls[state] = self.calls.get(state, 0) + 1
+        self.chars[state] = self.chars.get(state, 0) + chars
+        self.times[state] = self.times.get(state, 0) + time
+
+        if next_state != state:
+            self.transitions[state, next_state] = self.transitions.get((state, next_state), 0) + 1
+
+        for token in tokens:
+            self.tokens[token.type.name] = self.tokens.get(token.type.name, 0) + 1
+
+
+    def group_times(self) -> dict[str, int]:
+
+        times = {}
+
+        for state, time in self.times.items():
+            group = self.group(state)
+            times[group] = times.get(group, 0) + time
+
+        return times
+
+
+    def as_dict(self) -> dict:
+
+        return {
+            "calls": self.calls,
+            "chars": self.chars,
+            "times": self.times,
+            "group_times": self.group_times(),
+            "transitions": {f"{state} -> {next_state}": count for (state, next_state), count in self.transitions.items()},
+            "tokens": self.tokens,
+        }
+
+
+    def to_json(self, indent: int = None) -> str:
+
+        return _json.dumps(self.as_dict(), indent=indent)
+
+
+    def table(self, transitions: int = 10) -> str:
+
+        # the states and groups by time, the tokens by count and the most
+        # frequent transitions
+        total = sum(self.times.values()) or 1
+        lines = [f"{'state':<44} {'group':<20} {'calls':>10} {'chars':>12} {'ms':>10} {'time':>7}"]
+
+        for state, time in sorted(self.times.items(), key=lambda item: -item[1]):
+            lines.append(f"{state:<44} {self.group(state):<20} {self.calls[state]:>10} {self.chars[state]:>12} {time / 1e6:>10.1f} {time / total:>7.1%}")
+
+        lines.append("")
+        lines.append(f"{'group':<20} {'ms':>10} {'time':>7}")
+
+        for group, time in sorted(self.group_times().items(), key=lambda item: -item[1]):
+            lines.append(f"{group:<20} {time / 1e6:>10.1f} {time / total:>7.1%}")
+
+        lines.append("")
+        lines.append(f"{'token':<20} {'count':>10}")
+
+        for token_type, count in sorted(self.tokens.items(), key=lambda item: -item[1]):
+            lines.append(f"{token_type:<20} {count:>10}")
+
+        lines.append("")
+        lines.append(f"{'transition':<70} {'count':>10}")
+
+        for (state, next_state), count in sorted(self.transitions.items(), key=lambda item: -item[1])[:transitions]:
+            lines.append(f"{state + ' -> ' + next_state:<70} {count:>10}")
+
+        return "\n".join(lines)
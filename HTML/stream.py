@@ -0,0 +1,359 @@
+import codecs as _codecs
+import mmap as _mmap
+from typing import BinaryIO as _BinaryIO, Generator as _Generator
+
+
+__all__ = ["HTMLInputStream"]
+
+
+class HTMLInputStream:
+
+    # see https://html.spec.whatwg.org/multipage/parsing.html#determining-the-character-encoding
+
+    boms = (
+        (b"\xef\xbb\xbf", "utf-8"),
+        (b"\xfe\xff",     "utf-16-be"),
+        (b"\xff\xfe",     "utf-16-le"),
+    )
+
+    # the labels of the encoding standard and the python codec of each, only
+    # these are used (a python codec like utf-7, rot13 or zlib is not a
+    # label). the replacement encoding and x-user-defined have no codec, the
+    # labels of the first are left out so the default is used and the second
+    # is windows-1252 as the prescan says
+    # see https://encoding.spec.whatwg.org/#names-and-labels
+    encoding_labels = {label: codec for codec, labels in (
+        ("utf-8",        ("unicode-1-1-utf-8", "unicode11utf8", "unicode20utf8", "utf-8", "utf8", "x-unicode20utf8")),
+        ("cp866",        ("866", "cp866", "csibm866", "ibm866")),
+        ("iso8859-2",    ("csisolatin2", "iso-8859-2", "iso-ir-101", "iso8859-2", "iso88592", "iso_8859-2", "iso_8859-2:1987", "l2", "latin2")),
+        ("iso8859-3",    ("csisolatin3", "iso-8859-3", "iso-ir-109", "iso8859-3", "iso88593", "iso_8859-3", "iso_8859-3:1988", "l3", "latin3")),
+        ("iso8859-4",    ("csisolatin4", "iso-8859-4", "iso-ir-110", "iso8859-4", "iso88594", "iso_8859-4", "iso_8859-4:1988", "l4", "latin4")),
+        ("iso8859-5",    ("csisolatincyrillic", "cyrillic", "iso-8859-5", "iso-ir-144", "iso8859-5", "iso88595", "iso_8859-5", "iso_8859-5:1988")),
+        ("iso8859-6",    ("arabic", "asmo-708", "csiso88596e", "csiso88596i", "csisolatinarabic", "ecma-114", "iso-8859-6", "iso-8859-6-e",
+                          "iso-8859-6-i", "iso-ir-127", "iso8859-6", "iso88596", "iso_8859-6", "iso_8859-6:1987")),
+        ("iso8859-7",    ("csisolatingreek", "ecma-118", "elot_928", "greek", "greek8", "iso-8859-7", "iso-ir-126", "iso8859-7", "iso88597",
+                          "iso_8859-7", "iso_8859-7:1987", "sun_eu_greek")),
+        ("iso8859-8",    ("csiso88598e", "csisolatinhebrew", "hebrew", "iso-8859-8", "iso-8859-8-e", "iso-ir-138", "iso8859-8", "iso88598",
+                          "iso_8859-8", "iso_8859-8:1988", "visual", "csiso88598i", "iso-8859-8-i", "logical")),
+        ("iso8859-10",   ("csisolatin6", "iso-8859-10", "iso-ir-157", "iso8859-10", "iso885910", "l6", "latin6")),
+        ("iso8859-13",   ("iso-8859-13", "iso8859-13", "iso885913")),
+        ("iso8859-14",   ("iso-8859-14", "iso8859-14", "iso885914")),
+        ("iso8859-15",   ("csisolatin9", "iso-8859-15", "iso8859-15", "iso885915", "iso_8859-15", "l9")),
+        ("iso8859-16",   ("iso-8859-16",)),
+        ("koi8-r",       ("cskoi8r", "koi", "koi8", "koi8-r", "koi8_r")),
+        ("koi8-u",       ("koi8-ru", "koi8-u")),
+        ("mac-roman",    ("csmacintosh", "mac", "macintosh", "x-mac-roman")),
+        ("cp874",        ("dos-874", "iso-8859-11", "iso8859-11", "iso885911", "tis-620", "windows-874")),
+        ("cp1250",       ("cp1250", "windows-1250", "x-cp1250")),
+        ("cp1251",       ("cp1251", "windows-1251", "x-cp1251")),
+        ("cp1252",       ("ansi_x3.4-1968", "ascii", "cp1252", "cp819", "csisolatin1", "ibm819", "iso-8859-1", "iso-ir-100", "iso8859-1",
+                          "iso88591", "iso_8859-1", "iso_8859-1:1987", "l1", "latin1", "us-ascii", "windows-1252", "x-cp1252", "x-user-defined")),
+        ("cp1253",       ("cp1253", "windows-1253", "x-cp1253")),
+        ("cp1254",       ("cp1254", "csisolatin5", "iso-8859-9", "iso-ir-148", "iso8859-9", "iso88599", "iso_8859-9", "iso_8859-9:1989", "l5",
+                          "latin5", "windows-1254", "x-cp1254")),
+        ("cp1255",       ("cp1255", "windows-1255", "x-cp1255")),
+        ("cp1256",       ("cp1256", "windows-1256", "x-cp1256")),
+        ("cp1257",       ("cp1257", "windows-1257", "x-cp1257")),
+        ("cp1258",       ("cp1258", "windows-1258", "x-cp1258")),
+        ("mac-cyrillic", ("x-mac-cyrillic", "x-mac-ukrainian")),
+        ("gbk",          ("chinese", "csgb2312", "csiso58gb231280", "gb2312", "gb_2312", "gb_2312-80", "gbk", "iso-ir-58", "x-gbk")),
+        ("gb18030",      ("gb18030",)),
+        ("big5hkscs",    ("big5", "big5-hkscs", "cn-big5", "csbig5", "x-x-big5")),
+        ("euc_jp",       ("cseucpkdfmtjapanese", "euc-jp", "x-euc-jp")),
+        ("iso2022_jp",   ("csiso2022jp", "iso-2022-jp")),
+        ("cp932",        ("csshiftjis", "ms932", "ms_kanji", "shift-jis", "shift_jis", "sjis", "windows-31j", "x-sjis")),
+        ("cp949",        ("cseuckr", "csksc56011987", "euc-kr", "iso-ir-149", "korean", "ks_c_5601-1987", "ks_c_5601-1989", "ksc5601",
+                          "ksc_5601", "windows-949")),
+        ("utf-16-be",    ("unicodefffe", "utf-16be")),
+        ("utf-16-le",    ("csunicode", "iso-10646-ucs-2", "ucs-2", "unicode", "unicodefeff", "utf-16", "utf-16le")),
+    ) for label in labels}
+
+    whitespace = b"\t\n\f\r "
+    ascii_alpha = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+    def __init__(self, source: bytes|memoryview|_BinaryIO, encoding: str = None, default_encoding: str = "windows-1252"):
+
+        self.source = source
+
+        # encoding given by the transport layer (e.g. Content-Type header)
+        self.transport_encoding = encoding
+        self.default_encoding = default_encoding
+
+        # bytes to prescan for <meta charset> and to decode at once
+        self.prescan_length = 1024
+        self.chunk_size = 1 << 16
+
+        # the output (after sniffing)
+        self.encoding: str = None
+        self.confidence: str = None # "tentative" or "certain"
+
+
+    def _read_chunks(self) -> _Generator[bytes|memoryview, None, None]:
+
+        if hasattr(self.source, "read") and not isinstance(self.source, _mmap.mmap):
+            # binary file object
+            while 1:
+                chunk = self.source.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+        # slices of a memoryview do not copy the bytes
+        view = memoryview(self.source).cast("B")
+        for start in range(0, len(view), self.chunk_size):
+            yield view[start:start+self.chunk_size]
+            
+            if isinstance(self.source, _mmap.mmap) and self.chunk_size % _mmap.PAGESIZE == 0:
+                # the chunk is decoded, let its pages go
+                self.source.madvise(_mmap.MADV_DONTNEED, start, min(self.chunk_size, len(view) - start))
+
+
+    def _get_encoding(self, label: str) -> None|str:
+
+        # see https://encoding.spec.whatwg.org/#concept-encoding-get
+        label = label.strip("\t\n\f\r ").lower()
+        codec = self.encoding_labels.get(label)
+
+        return codec and _codecs.lookup(codec).name
+
+
+    def _get_attribute(self, prefix: bytes, i: int) -> tuple[None|tuple[bytes, bytes], int]:
+
+        # see https://html.spec.whatwg.org/multipage/parsing.html#concept-get-attributes-when-sniffing
+
+        while i < len(prefix) and prefix[i] in self.whitespace + b"/":
+            i += 1
+
+        if i >= len(prefix) or prefix[i] == ord(">"):
+            return None, i
+
+        name = b""
+        value = b""
+
+        # attribute name
+        while 1:
+
+            if i >= len(prefix):
+                return None, i
+
+            c = prefix[i]
+
+            if c == ord("=") and name:
+                i += 1
+                break
+
+            elif c in self.whitespace:
+
+                while i < len(prefix) and prefix[i] in self.whitespace:
+                    i += 1
+
+                if i >= len(prefix) or prefix[i] != ord("="):
+                    return (name, value), i
+
+                i += 1 # consume "="
+                break
+
+            elif c in b"/>":
+                return (name, value), i
+
+            else:
+                name += bytes([c]).lower()
+
+            i += 1
+
+        while i < len(prefix) and prefix[i] in self.whitespace:
+            i += 1
+
+        if i >= len(prefix):
+            return None, i
+
+        # attribute value
+        c = prefix[i]
+
+        if c in b"\"'":
+
+            end = prefix.find(bytes([c]), i+1)
+            if end == -1:
+                return None, len(prefix)
+
+            return (name, prefix[i+1:end].lower()), end + 1
+
+        if c == ord(">"):
+            return (name, value), i
+
+        while i < len(prefix) and prefix[i] not in self.whitespace + b">":
+            value += bytes([prefix[i]]).lower()
+            i += 1
+
+        if i >= len(prefix):
+            return None, i
+
+        return (name, value), i
+
+
+    def _extract_encoding_from_meta(self, content: bytes) -> None|bytes:
+
+        # see https://html.spec.whatwg.org/multipage/urls-and-fetching.html#algorithm-for-extracting-a-character-encoding-from-a-meta-element
+
+        i = 0
+        while 1:
+
+            i = content.find(b"charset", i)
+            if i == -1:
+                return None
+
+            i += len(b"charset")
+
+            while i < len(content) and content[i] in self.whitespace:
+                i += 1
+
+            if i < len(content) and content[i] == ord("="):
+                break
+
+            # else: loop again from here
+
+        i += 1 # consume "="
+        while i < len(content) and content[i] in self.whitespace:
+            i += 1
+
+        if i >= len(content):
+            return None
+
+        if content[i] in b"\"'":
+            end = content.find(bytes([content[i]]), i+1)
+            return content[i+1:end] if end != -1 else None
+
+        end = i
+        while end < len(content) and content[end] not in self.whitespace + b";":
+            end += 1
+
+        return content[i:end]
+
+
+    def _prescan(self, prefix: bytes) -> None|str:
+
+        # see https://html.spec.whatwg.org/multipage/parsing.html#prescan-a-byte-stream-to-determine-its-encoding
+
+        i = 0
+        while i < len(prefix):
+
+            if prefix.startswith(b"<!--", i):
+
+                # skip the comment
+                i = prefix.find(b"-->", i+2)
+                if i == -1:
+                    return None
+                i += 2
+
+            elif prefix[i:i+5].lower() == b"<meta" and prefix[i+5:i+6] and prefix[i+5] in self.whitespace + b"/":
+
+                i += 5
+
+                attribute_names = set()
+                got_pragma = 0
+                need_pragma = None
+                charset = None
+
+                while 1:
+
+                    attr, i = self._get_attribute(prefix, i)
+                    if attr is None:
+                        break
+
+                    name, value = attr
+                    if name in attribute_names:
+                        continue
+                    attribute_names.add(name)
+
+                    if name == b"http-equiv":
+                        if value == b"content-type":
+                            got_pragma = 1
+
+                    elif name == b"content":
+                        meta_charset = self._extract_encoding_from_meta(value)
+                        if meta_charset is not None and charset is None:
+                            charset = meta_charset
+                            need_pragma = 1
+
+                    elif name == b"charset":
+                        charset = value
+                        need_pragma = 0
+
+                if need_pragma is None or (need_pragma and not got_pragma) or charset is None:
+                    continue
+
+                encoding = self._get_encoding(charset.decode("ascii", "replace"))
+                if encoding is None:
+                    continue
+
+                if encoding in ("utf-16-be", "utf-16-le"):
+                    return "utf-8"
+
+                return encoding
+
+            elif prefix.startswith(b"<", i) and (prefix[i+1:i+2] and prefix[i+1] in self.ascii_alpha or \
+                    prefix[i+1:i+2] == b"/" and prefix[i+2:i+3] and prefix[i+2] in self.ascii_alpha):
+
+                # skip the tag with its attributes
+                while i < len(prefix) and prefix[i] not in self.whitespace + b">":
+                    i += 1
+
+                attr = ()
+                while attr is not None:
+                    attr, i = self._get_attribute(prefix, i)
+
+            elif prefix[i:i+2] in (b"<!", b"</", b"<?"):
+
+                # skip to the next ">"
+                i = prefix.find(b">", i)
+                if i == -1:
+                    return None
+
+            i += 1
+
+        return None
+
+
+    def sniff(self, prefix: bytes) -> int:
+
+        # set the encoding and the confidence looking at the first bytes of
+        # the source, return the length of the BOM (if any) to skip
+
+        for bom, encoding in self.boms:
+            if prefix.startswith(bom):
+                self.encoding = encoding
+                self.confidence = "certain"
+                return len(bom)
+
+        encoding = self.transport_encoding and self._get_encoding(self.transport_encoding)
+        if encoding:
+            self.encoding = encoding
+            self.confidence = "certain"
+            return 0
+
+        self.encoding = self._prescan(prefix[:self.prescan_length]) or self._get_encoding(self.default_encoding)
+        self.confidence = "tentative"
+        return 0
+
+
+    def decode(self) -> _Generator[str, None, None]:
+
+        chunks = self._read_chunks()
+
+        # collect enough bytes to sniff
+        prefix = b""
+        for chunk in chunks:
+            prefix += bytes(chunk)
+            if len(prefix) >= self.prescan_length:
+                break
+
+        bom_length = self.sniff(prefix)
+
+        # decode chunk by chunk, a code point split between two chunks is
+        # kept by the decoder until the rest of it arrives
+        decoder = _codecs.getincrementaldecoder(self.encoding)(errors="replace")
+
+        yield decoder.decode(prefix[bom_length:])
+        for chunk in chunks:
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
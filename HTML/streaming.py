@@ -0,0 +1,160 @@
+from typing import BinaryIO as _BinaryIO
+
+from .token import *
+from .attributes import *
+from .node import *
+from .error import *
+from .cache import *
+from .parser import *
+
+
+__all__ = ["HTMLContentHandler", "HTMLStreamingParser"]
+
+
+class HTMLContentHandler:
+
+    # receives the events of HTMLStreamingParser, the methods do nothing
+    # and a handler overrides the ones for the events it needs
+
+    def start_document(self):
+        pass
+
+    def end_document(self):
+        pass
+
+    def start_element(self, tag_name: str, attributes: HTMLAttributes):
+        pass
+
+    def end_element(self, tag_name: str):
+        pass
+
+    def text(self, data: str):
+        pass
+
+    def comment(self, data: str):
+        pass
+
+    def doctype(self, name: str, public_id: str, system_id: str):
+        pass
+
+
+class HTMLStreamingParser(HTMLParser):
+
+    # runs the tree construction of HTMLParser but passes the nodes to a
+    # handler as events instead of building the document, only the stack of
+    # open elements is kept (the elements have no children) so the memory
+    # is bounded by the nesting depth and not by the size of the document
+    #
+    # an element is started when it is inserted and ended when it is popped
+    # off the stack (or at the end of the document), text may be passed in
+    # more than one event. a node is passed when it is inserted, so a comment
+    # after </html> comes before the end of the elements that are still open
+    # (in the document it is after the html element). the attributes a stray
+    # <html> tag adds to the html element are added to the attributes passed
+    # to start_element()
+
+    def __init__(self, handler: HTMLContentHandler, errors: HTMLParseErrors = None):
+
+        super().__init__(errors)
+
+        self.handler = handler
+
+        # start_document() is passed, end_document() is passed
+        self.started = 0
+        self.ended = 0
+
+
+    def _pop_element(self) -> HTMLNodeElement:
+
+        element = self.stack_of_open_elements.pop()
+        self.handler.end_element(element.tag_name)
+
+        return element
+
+
+    def _insert_doctype_node(self, token: HTMLTokenDoctype):
+
+        self.handler.doctype(token.name or "", token.public_identifier or "", token.system_identifier or "")
+
+
+    def _insert_comment_node(self, data: str, parent: HTMLNode = None):
+
+        self.handler.comment(data)
+
+
+    def _insert_element_node_with_token(self, token: HTMLTokenStartTag|HTMLTokenEndTag, parent: HTMLNode = None):
+
+        element_node = HTMLNodeElement(token.tag_name, token.attributes)
+        self.stack_of_open_elements.append(element_node)
+        self.handler.start_element(element_node.tag_name, element_node.attributes)
+
+        return element_node
+
+
+    def _insert_element_node(self, tag_name: str, parent: HTMLNode = None):
+
+        element_node = HTMLNodeElement(tag_name, [])
+        self.stack_of_open_elements.append(element_node)
+        self.handler.start_element(element_node.tag_name, element_node.attributes)
+
+        return element_node
+
+
+    def _insert_character(self, data: str, parent: HTMLNode = None):
+
+        self.handler.text(data)
+
+
+    def _start_document(self):
+
+        if not self.started:
+            self.started = 1
+            self.handler.start_document()
+
+
+    def _end_document(self):
+
+        # after the EOF token is processed (not while the parser is paused)
+        if not self.stop or self.ended:
+            return
+
+        # the elements that are still open end with the document
+        while len(self.stack_of_open_elements):
+            self._pop_element()
+
+        self.ended = 1
+        self.handler.end_document()
+
+
+    def run(self, html_text: str|bytes|memoryview|_BinaryIO, encoding: str = None, cache: HTMLTokenCache = None) -> HTMLContentHandler:
+
+        self._start_document()
+        super().run(html_text, encoding, cache)
+        self._end_document()
+
+        return self.handler
+
+
+    def feed(self, html_chunk: str) -> HTMLContentHandler:
+
+        self._start_document()
+        super().feed(html_chunk)
+
+        return self.handler
+
+
+    def close(self) -> HTMLContentHandler:
+
+        self._start_document()
+        super().close()
+        self._end_document()
+
+        return self.handler
+
+
+    def resume(self) -> HTMLContentHandler:
+
+        super().resume()
+        self._end_document()
+
+        return self.handler
@@ -0,0 +1,795 @@
+from os.path import abspath
+from random import Random
+from tempfile import TemporaryDirectory
+from .attributes import HTMLAttributes
+from .batch import parse_many
+from .cache import HTMLTokenCache
+from .error import HTMLParseErrors
+from .node import *
+from .parallel import HTMLParallelTokenizer
+from .parser import HTMLParser
+from .stack import HTMLStackOfOpenElements
+from .stream import HTMLInputStream
+from .streaming import HTMLContentHandler, HTMLStreamingParser
+from .token import HTMLToken
+from .tokenizer import HTMLTokenizer
+
+
+# name -> (source, expected tree), the tree is dumped by dump_tree()
+TESTS = {
+
+    # a p element is closed by the start tag of a block, a heading, li, dd or dt
+    "p_closed_by_li": ("<p>a<li>b", """
+| <html>
+|   <head>
+|   <body>
+|     <p>
+|       "a"
+|     <li>
+|       "b"
+"""),
+    "p_closed_by_dd": ("<p>a<dd>b", """
+| <html>
+|   <head>
+|   <body>
+|     <p>
+|       "a"
+|     <dd>
+|       "b"
+"""),
+    "p_closed_by_div": ("<p>a<div>b", """
+| <html>
+|   <head>
+|   <body>
+|     <p>
+|       "a"
+|     <div>
+|       "b"
+"""),
+    "p_closed_by_p": ("<p>a<p>b", """
+| <html>
+|   <head>
+|   <body>
+|     <p>
+|       "a"
+|     <p>
+|       "b"
+"""),
+
+    # an end tag of a p that is not open inserts an empty one
+    "end_tag_p_without_p": ("a</p>b", """
+| <html>
+|   <head>
+|   <body>
+|     "a"
+|     <p>
+|     "b"
+"""),
+
+    # a heading start tag closes the heading that is the current node
+    "heading_in_heading": ("<h1><h2>", """
+| <html>
+|   <head>
+|   <body>
+|     <h1>
+|     <h2>
+"""),
+    "heading_end_tag_closes_any_heading": ("<h1>a</h2>b", """
+| <html>
+|   <head>
+|   <body>
+|     <h1>
+|       "a"
+|     "b"
+"""),
+
+    # void elements are closed as they are inserted
+    "void_element": ("<br><p>", """
+| <html>
+|   <head>
+|   <body>
+|     <br>
+|     <p>
+"""),
+    "void_elements_in_text": ("a<img>b<hr>c", """
+| <html>
+|   <head>
+|   <body>
+|     "a"
+|     <img>
+|     "b"
+|     <hr>
+|     "c"
+"""),
+
+    # a block end tag closes the elements in the block
+    "block_end_tag_closes_p": ("<div><p>a</div>b", """
+| <html>
+|   <head>
+|   <body>
+|     <div>
+|       <p>
+|         "a"
+|     "b"
+"""),
+    "block_end_tag_not_in_scope": ("<div>a</ul>b", """
+| <html>
+|   <head>
+|   <body>
+|     <div>
+|       "ab"
+"""),
+
+    # li, dd and dt close the previous one, not one outside the list
+    "li_closes_li": ("<ul><li>a<li>b</ul>c", """
+| <html>
+|   <head>
+|   <body>
+|     <ul>
+|       <li>
+|         "a"
+|       <li>
+|         "b"
+|     "c"
+"""),
+    "li_in_nested_list": ("<ul><li>a<ul><li>b</ul></ul>", """
+| <html>
+|   <head>
+|   <body>
+|     <ul>
+|       <li>
+|         "a"
+|         <ul>
+|           <li>
+|             "b"
+"""),
+    "dt_closes_dd": ("<dl><dd>a<dt>b</dl>", """
+| <html>
+|   <head>
+|   <body>
+|     <dl>
+|       <dd>
+|         "a"
+|       <dt>
+|         "b"
+"""),
+    "end_tag_li": ("<ul><li><span>a</li>b", """
+| <html>
+|   <head>
+|   <body>
+|     <ul>
+|       <li>
+|         <span>
+|           "a"
+|       "b"
+"""),
+
+    # any other end tag closes the nearest element with its name
+    "any_other_end_tag": ("<span><b>a</span>b", """
+| <html>
+|   <head>
+|   <body>
+|     <span>
+|       <b>
+|         "a"
+|     "b"
+"""),
+    "any_other_end_tag_behind_special": ("<span><div>a</span>b", """
+| <html>
+|   <head>
+|   <body>
+|     <span>
+|       <div>
+|         "ab"
+"""),
+    "unknown_end_tag": ("a</zz>b", """
+| <html>
+|   <head>
+|   <body>
+|     "ab"
+"""),
+
+    # the first attribute with a name wins
+    "first_attribute_wins": ("<p a=1 A=2 b=3 a=4>x", """
+| <html>
+|   <head>
+|   <body>
+|     <p>
+|       a="1"
+|       b="3"
+|       "x"
+"""),
+}
+
+
+def dump_tree(node: HTMLNode) -> str:
+
+    """
+    Dump the children of a node one per line, indented by their depth as in the html5lib tests.
+
+    node:\n\t Node to dump, usually the document.
+    """
+
+    lines = []
+    nodes = [(child, 0) for child in reversed(node.children)]
+
+    while nodes:
+
+        node, depth = nodes.pop()
+        indent = "| " + "  " * depth
+
+        if node.type == HTMLNode.Type.ELEMENT:
+            lines.append(f"{indent}<{node.tag_name}>")
+            for name, value in node.attributes:
+                lines.append(f"{indent}  {name}=\"{value}\"")
+            nodes.extend((child, depth + 1) for child in reversed(node.children))
+
+        elif node.type == HTMLNode.Type.TEXT:
+            lines.append(f"{indent}\"{node.data}\"")
+
+        elif node.type == HTMLNode.Type.COMMENT:
+            lines.append(f"{indent}<!-- {node.data} -->")
+
+        else:
+            lines.append(f"{indent}<!DOCTYPE {node.name}>")
+
+    return "\n".join(lines)
+
+
+class _TreeBuilder(HTMLContentHandler):
+
+    # rebuilds the tree from the events of HTMLStreamingParser
+
+    def start_document(self):
+        self.stack = [HTMLNodeDocument()]
+
+    def start_element(self, tag_name, attributes):
+        element = HTMLNodeElement(tag_name, attributes)
+        self.stack[-1].children.append(element)
+        self.stack.append(element)
+
+    def end_element(self, tag_name):
+        self.stack.pop()
+
+    def text(self, data):
+        children = self.stack[-1].children
+        if children and children[-1].type == HTMLNode.Type.TEXT:
+            children[-1].append_data(data)
+        else:
+            children.append(HTMLNodeText(data))
+
+    def comment(self, data):
+        self.stack[-1].children.append(HTMLNodeComment(data))
+
+    def doctype(self, name, public_id, system_id):
+        self.stack[-1].children.append(HTMLNodeDocumentType(name, public_id, system_id))
+
+
+def _test_tokens(tokens) -> list[str]:
+
+    # tokens as strings to compare, a run of text may be split in
+    # more than one character token so they are joined
+    output = []
+
+    for token in tokens:
+        if token.type == HTMLToken.Type.CHARACTER and output and output[-1][0] == HTMLToken.Type.CHARACTER:
+            output[-1][1] += token.data
+        else:
+            output.append([token.type, token.data if token.type == HTMLToken.Type.CHARACTER else repr(token)])
+
+    return [f"{token_type.name} {data}" for token_type, data in output]
+
+
+def _test_tokenize(source: str, chunks: list[int] = None) -> tuple[list[str], list[tuple[str, int, int]]]:
+
+    # tokens and parse errors of the source, fed in chunks of the given
+    # lengths (and the rest) if any
+    errors = HTMLParseErrors(HTMLParseErrors.Mode.COLLECT)
+    tokenizer = HTMLTokenizer(errors)
+
+    if chunks is None:
+        tokens = list(tokenizer.run(source))
+
+    else:
+        tokens = []
+        i = 0
+        for length in chunks + [len(source)]:
+            tokens.extend(tokenizer.feed(source[i:i+length]))
+            i += length
+        tokens.extend(tokenizer.close())
+
+    return _test_tokens(tokens), [(error.code, error.line, error.column) for error in errors]
+
+
+FEED_SOURCES = [
+    "<!DOCTYPE html>\r\n<html lang=en>\r\n<p class='a b' id=x>text &amp; more &notin; &#x41;</p>\r\n</html>  \n",
+    "<div a=1 b=\"2\" c='3' d>\n<!-- comment -- text -->\n<br/>\r\r\n</div>",
+    "<title>a &lt; b</title><script>if (a < b) { x = \"</p>\" }</script><style>p { }</style>",
+    "<textarea>\n\r\nline</textarea>\x00<p\x00 x=\x00>&#0;&#x110000;&foo;</p \t>",
+    "   \n\t <!doctype html public \"-//W3C//DTD HTML 4.01//EN\"><a href=\"?a=1&b=2\">link</a",
+]
+
+
+def _test_feed_equivalence() -> None|str:
+
+    # feeding the source in chunks gives the same tokens and errors as run()
+    for source in FEED_SOURCES:
+
+        expected = _test_tokenize(source)
+
+        for length in range(1, 8):
+            chunks = [length] * (len(source) // length)
+            if _test_tokenize(source, chunks) != expected:
+                return f"chunks of {length} of {source!r}"
+
+        # whitespace only and empty chunks are held back
+        chunks = [0, 3, 0, 1, 0, 2, 5, 0]
+        if _test_tokenize(source, chunks) != expected:
+            return f"chunks {chunks} of {source!r}"
+
+    return None
+
+
+# source, transport encoding -> expected encoding and text
+ENCODING_SOURCES = [
+
+    # a BOM wins over everything else
+    ((b"\xef\xbb\xbf<meta charset=koi8-r>\xc3\xa9", "cp1251"), ("utf-8", "<meta charset=koi8-r>é")),
+    ((b"\xff\xfe<\x00p\x00>\x00", None), ("utf-16-le", "<p>")),
+    ((b"\xfe\xff\x00<\x00p\x00>", None), ("utf-16-be", "<p>")),
+
+    # then the transport encoding, then the prescan for <meta>
+    ((b"<meta charset=koi8-r>\xc1", "windows-1251"), ("cp1251", "<meta charset=koi8-r>Б")),
+    ((b"<meta charset=koi8-r>\xc1", None), ("koi8-r", "<meta charset=koi8-r>а")),
+    ((b"<!-- <meta charset=koi8-r> --><meta charset=' UTF-8 '>\xc3\xa9", None), ("utf-8", "<!-- <meta charset=koi8-r> --><meta charset=' UTF-8 '>é")),
+    ((b"<meta http-equiv=Content-Type content='text/html; charset=latin1'>\xe9", None), ("cp1252", "<meta http-equiv=Content-Type content='text/html; charset=latin1'>é")),
+    ((b"<meta content='text/html; charset=koi8-r'>\xe9", None), ("cp1252", "<meta content='text/html; charset=koi8-r'>é")),
+    ((b"<meta charset=utf-16>\xc3\xa9", None), ("utf-8", "<meta charset=utf-16>é")),
+
+    # a python codec that is not a label of the encoding standard is not
+    # used, the next step or the default is
+    ((b"<meta charset=rot13><p>", "hex"), ("cp1252", "<meta charset=rot13><p>")),
+    ((b"<meta charset=zlib><meta charset=idna><meta charset=utf-32><meta charset=euc-kr>\xb0\xa1", None),
+        ("cp949", "<meta charset=zlib><meta charset=idna><meta charset=utf-32><meta charset=euc-kr>가")),
+    ((b"<meta charset=iso-2022-kr><p>", "base64"), ("cp1252", "<meta charset=iso-2022-kr><p>")),
+
+    # utf-7 would decode "+ADw-script+AD4-" into a script tag
+    ((b"<meta charset=utf-7>+ADw-script+AD4-", None), ("cp1252", "<meta charset=utf-7>+ADw-script+AD4-")),
+    ((b"+ADw-script+AD4-", "utf-7"), ("cp1252", "+ADw-script+AD4-")),
+]
+
+
+def _test_encoding_sniffing() -> None|str:
+
+    # the encoding is taken from the BOM, the transport layer or a <meta> in
+    # the first bytes, only if it is a label of the encoding standard
+    for (source, encoding), expected in ENCODING_SOURCES:
+
+        stream = HTMLInputStream(source, encoding)
+        output = "".join(stream.decode())
+
+        if (stream.encoding, output) != expected:
+            return f"{source!r} is {stream.encoding} {output!r}"
+
+    tokens = HTMLTokenizer().run(b"<meta charset=utf-7>+ADw-script+AD4-")
+    if any(token.type == HTMLToken.Type.START_TAG and token.tag_name == "script" for token in tokens):
+        return "utf-7 script tag"
+
+    return None
+
+
+# source -> expected text or attribute value and parse errors
+CHARACTER_REFERENCES = {
+
+    # named, the longest name that matches is used
+    "&amp;&AMP;&lt;&notin;":  ("&&<∉", []),
+    "&notit;":                ("¬it;", ["missing-semicolon-after-character-reference"]),
+    "&amp &gt":               ("& >", ["missing-semicolon-after-character-reference"] * 2),
+    "&unknown; &unknown &;":  ("&unknown; &unknown &;", ["unknown-named-character-reference"]),
+
+    # numeric
+    "&#65;&#x42;&#X43;&#x44": ("ABCD", ["missing-semicolon-after-character-reference"]),
+    "&#128;&#x9F;":           ("€Ÿ", ["control-character-reference"] * 2),
+    "&#0;":                   ("\ufffd", ["null-character-reference"]),
+    "&#xD800;":               ("\ufffd", ["surrogate-character-reference"]),
+    "&#x110000;":             ("\ufffd", ["character-reference-outside-unicode-range"]),
+    "&#; &#x;":               ("&#; &#x;", ["absence-of-digits-in-numeric-character-reference"] * 2),
+
+    # in an attribute value a legacy name without ";" followed by "=" or
+    # an alphanumeric is not a reference
+    "<a x='&notit;'>":        ("&notit;", []),
+    "<a x='?a=1&amp=2'>":     ("?a=1&amp=2", []),
+    "<a x=&copyx&copy&copy;>": ("&copyx©©", ["missing-semicolon-after-character-reference"]),
+    "<a x=\"&notin;&lt\">":   ("∉<", ["missing-semicolon-after-character-reference"]),
+}
+
+
+def _test_character_references() -> None|str:
+
+    for source, (expected, expected_errors) in CHARACTER_REFERENCES.items():
+
+        errors = HTMLParseErrors(HTMLParseErrors.Mode.COLLECT)
+        tokens = list(HTMLTokenizer(errors).run(source))
+
+        if tokens[0].type == HTMLToken.Type.START_TAG:
+            output = tokens[0].get_attr("x")
+        else:
+            output = "".join(token.data for token in tokens if token.type == HTMLToken.Type.CHARACTER)
+
+        if output != expected or [error.code for error in errors] != expected_errors:
+            return f"{source!r} is {output!r} {[error.code for error in errors]}"
+
+    return None
+
+
+CACHE_SOURCES = [
+    "<!DOCTYPE html><p a=1 a=2>x&amp y</p></zz>\r\n<!-- c -",
+    "<title>a &lt; b</title>\r\n<div a='1'd>\x00&#0;<li>&notit;<br/></div>",
+    b"\xef\xbb\xbf<p>\xc3\xa9&amp</p \t>\n<h1><h2>",
+    b"<meta charset=koi8-r><p>\xc1</p",
+    "",
+]
+
+
+def _test_parse(source: str|bytes, cache: HTMLTokenCache = None, mode: HTMLParseErrors.Mode = HTMLParseErrors.Mode.COLLECT) -> tuple[str, int, list]:
+
+    # the tree and the parse errors of the source
+    errors = HTMLParseErrors(mode)
+    document = HTMLParser(errors).run(source, cache=cache)
+
+    return dump_tree(document), errors.count, [(error.code, error.offset, error.line, error.column) for error in errors]
+
+
+def _test_cache() -> None|str:
+
+    # the tokens replayed from the cache give the same tree and parse errors
+    # (with their positions) as tokenizing the source
+    with TemporaryDirectory() as directory:
+
+        cache = HTMLTokenCache(directory)
+
+        for source in CACHE_SOURCES:
+            for mode in (HTMLParseErrors.Mode.COLLECT, HTMLParseErrors.Mode.COUNT):
+
+                expected = _test_parse(source, None, mode)
+
+                recorded = _test_parse(source, cache, mode)
+                if cache.read(cache.key(source), HTMLTokenizer()) is None:
+                    return f"{source!r} is not cached"
+
+                replayed = _test_parse(source, cache, mode)
+
+                if recorded != expected or replayed != expected:
+                    return f"{source!r} {mode.name} is {recorded if recorded != expected else replayed}"
+
+    return None
+
+
+def _test_duplicate_attributes() -> None|str:
+
+    # a duplicate attribute is dropped with a parse error, also when the
+    # first value is kept as a span of the input
+    long_value = "v" * 100
+    sources = {
+        "<p a=1 A=2 b=3 a=4>":                     ([["a", "1"], ["b", "3"]], 2),
+        f"<p a='{long_value}' a=2 b>":              ([["a", long_value], ["b", ""]], 1),
+        f"<p a=1 a='{long_value}&amp;' B=\"\" b>": ([["a", "1"], ["b", ""]], 2),
+    }
+
+    for source, (expected, duplicates) in sources.items():
+
+        errors = HTMLParseErrors(HTMLParseErrors.Mode.COLLECT)
+        token = next(HTMLTokenizer(errors).run(source))
+
+        if token.attributes != expected or [error.code for error in errors] != ["duplicate-attribute"] * duplicates:
+            return f"{source!r} is {token.attributes} {[error.code for error in errors]}"
+
+        if token.get_attr("a") != expected[0][1] or token.has_attr("c"):
+            return f"{source!r} get_attr()"
+
+    # writing through the [name, value] views changes the map, a name can
+    # not be changed into the name of another attribute
+    attributes = HTMLAttributes([["a", "1"], ["b", "2"], ["a", "3"]])
+    attributes[1][1] = "x"
+    attributes[-1][0] = "c"
+
+    if attributes != [["a", "1"], ["c", "x"]] or attributes.get("c") != "x" or attributes.has("b"):
+        return f"attributes are {attributes}"
+
+    try:
+        attributes[0][0] = "c"
+        return "renamed into a duplicate"
+
+    except ValueError:
+        pass
+
+    return None
+
+
+def _test_long_values_in_chunks() -> None|str:
+
+    # a comment or an attribute value that is fed in many chunks is not
+    # kept in the input, so a chunk does not copy the value again
+    chunk = "x" * 1000
+
+    for start, end, decoded in (("<!--", "-->", "\0"), ("<a b='", "'>", "&amp;"), ("<a b=", ">", "\0")):
+
+        tokenizer = HTMLTokenizer()
+        tokens = list(tokenizer.feed(start))
+
+        for i in range(1000):
+            tokens.extend(tokenizer.feed(chunk + decoded if i % 3 else chunk))
+            if len(tokenizer.html_text) > 2 * len(chunk):
+                return f"{start!r} keeps {len(tokenizer.html_text)} chars of input"
+
+        tokens.extend(tokenizer.feed(end))
+        tokens.extend(tokenizer.close())
+
+        expected = "".join(chunk + decoded if i % 3 else chunk for i in range(1000))
+        expected = expected.replace("\0", u"\ufffd").replace("&amp;", "&")
+        value = tokens[0].data if tokens[0].type == HTMLToken.Type.COMMENT else tokens[0].get_attr("b")
+
+        if value != expected or len(tokens) != 2:
+            return f"{start!r} gives {len(tokens)} tokens and a value of {len(value)} chars"
+
+    return None
+
+
+PARALLEL_SOURCES = [
+    # the chunks start at a "<" after a newline, some of these are inside a
+    # comment or an attribute value and the chunks are tokenized again
+    "<!DOCTYPE html>\n<html>\n<p a=1 a=2>x&amp y</p>\n<p>\r\n<br/>\n</html>\n",
+    "<p>\n<!-- a\n<p> b -->\n<a href='x\n<b'>\n<b>\0</b>\n<!x>\n<?y>\n</p\n<div>",
+    "\n<p>&notit;\n<p>&#x110000;\n<p x=\"\n<p\">\n<p>" * 20,
+]
+
+
+def _test_parallel_tokenizer() -> None|str:
+
+    # the chunks tokenized in a pool of processes give the same tokens and
+    # parse errors as HTMLTokenizer for the whole input
+    for source in PARALLEL_SOURCES:
+        for mode in (HTMLParseErrors.Mode.COLLECT, HTMLParseErrors.Mode.COUNT):
+
+            errors = HTMLParseErrors(mode)
+            expected = [repr(token) for token in HTMLTokenizer(errors).run(source)], errors.count, list(map(repr, errors))
+
+            for chunk_size in (1, 8, 30):
+
+                errors = HTMLParseErrors(mode)
+                output = [repr(token) for token in HTMLParallelTokenizer(errors, 2, chunk_size).run(source)], errors.count, list(map(repr, errors))
+
+                if output != expected:
+                    return f"{source!r} in chunks of {chunk_size} {mode.name}"
+
+    return None
+
+
+# stack of open elements, tag name, scope -> has an element in scope
+SCOPES = HTMLStackOfOpenElements.Scope
+SCOPE_CASES = [
+    ("html body p",                 "p",  SCOPES.DEFAULT,   True),
+    ("html body p div",             "p",  SCOPES.DEFAULT,   True),
+    ("html body p table",           "p",  SCOPES.DEFAULT,   False),
+    ("html body p table td",        "p",  SCOPES.DEFAULT,   False),
+    ("html body table td p",        "p",  SCOPES.DEFAULT,   True),
+    ("html body table",             "table", SCOPES.DEFAULT, True),
+    ("html body div",               "p",  SCOPES.DEFAULT,   False),
+    ("html body ul li ul",          "li", SCOPES.DEFAULT,   True),
+    ("html body ul li ul",          "li", SCOPES.LIST_ITEM, False),
+    ("html body ul li div",         "li", SCOPES.LIST_ITEM, True),
+    ("html body ul li ol li",       "li", SCOPES.LIST_ITEM, True),
+    ("html body p button",          "p",  SCOPES.BUTTON,    False),
+    ("html body p button",          "p",  SCOPES.DEFAULT,   True),
+    ("html body button p",          "p",  SCOPES.BUTTON,    True),
+    ("html body table tbody tr",    "tr", SCOPES.TABLE,     True),
+    ("html body table tr div",      "tr", SCOPES.TABLE,     True),
+    ("html body tr table",          "tr", SCOPES.TABLE,     False),
+    ("html body tr template",       "tr", SCOPES.TABLE,     False),
+    ("html body select optgroup option", "select", SCOPES.SELECT, True),
+    ("html body select div",        "select", SCOPES.SELECT, False),
+    ("html body select",            "select", SCOPES.SELECT, True),
+]
+
+
+def _test_in_scope(elements: list[HTMLNodeElement], tag_name: str, scope: "HTMLStackOfOpenElements.Scope") -> bool:
+
+    # walks the stack from the current node as the standard says
+    # see https://html.spec.whatwg.org/multipage/parsing.html#has-an-element-in-the-specific-scope
+    for element in reversed(elements):
+
+        if element.tag_name == tag_name:
+            return True
+
+        if scope is SCOPES.SELECT:
+            if element.tag_name not in HTMLStackOfOpenElements.select_scope_names:
+                return False
+
+        elif element.tag_name in HTMLStackOfOpenElements.scope_names[scope]:
+            return False
+
+    return False
+
+
+def _test_stack_scopes() -> None|str:
+
+    for names, tag_name, scope, expected in SCOPE_CASES:
+
+        stack = HTMLStackOfOpenElements()
+        for name in names.split():
+            stack.append(HTMLNodeElement(name, []))
+
+        if stack.has_in_scope(tag_name, scope) != expected:
+            return f"{tag_name} in {scope.name} scope of {names}"
+
+    # the indexes follow appends, pops and removes, and give the same
+    # answers as walking the stack
+    names = ["html", "body", "div", "p", "table", "td", "ul", "ol", "li", "button", "select", "option", "optgroup", "template"]
+    random = Random(22)
+
+    stack = HTMLStackOfOpenElements()
+    elements = []
+
+    for _ in range(2000):
+
+        if random.random() < 0.5 or not elements:
+            element = HTMLNodeElement(random.choice(names), [])
+            stack.append(element)
+            elements.append(element)
+
+        elif random.random() < 0.8:
+            if stack.pop() is not elements.pop():
+                return "pop"
+
+        else:
+            element = random.choice(elements)
+            stack.remove(element)
+            elements.remove(element)
+
+        for tag_name in names:
+
+            if stack.has(tag_name) != any(element.tag_name == tag_name for element in elements) or \
+                    stack.count(tag_name) != sum(element.tag_name == tag_name for element in elements):
+                return f"has or count {tag_name} in {[element.tag_name for element in elements]}"
+
+            for scope in SCOPES:
+                if stack.has_in_scope(tag_name, scope) != _test_in_scope(elements, tag_name, scope):
+                    return f"{tag_name} in {scope.name} scope of {[element.tag_name for element in elements]}"
+
+    return None
+
+
+BATCH_SOURCES = [
+    "<p a=1 a=2>x&amp y</p></zz>",
+    b"<meta charset=koi8-r><p>\xc1",
+    "<![CDATA[x]]>", # not implemented, fails
+    "",
+    "<!DOCTYPE html>\n<ul><li>a<li>b\n</ul>\0",
+] * 5
+
+
+def _test_parse_many() -> None|str:
+
+    # each document gives the tree and the parse errors HTMLParser gives,
+    # or an error record, and a document that fails does not stop the batch
+    for ordered in (True, False):
+
+        results = list(parse_many(BATCH_SOURCES, workers=2, chunk_size=3, ordered=ordered, mode=HTMLParseErrors.Mode.COLLECT))
+
+        if sorted(result.index for result in results) != list(range(len(BATCH_SOURCES))):
+            return f"indexes {[result.index for result in results]}"
+
+        if ordered and [result.index for result in results] != list(range(len(BATCH_SOURCES))):
+            return f"not ordered {[result.index for result in results]}"
+
+        for result in results:
+
+            source = BATCH_SOURCES[result.index]
+            errors = HTMLParseErrors(HTMLParseErrors.Mode.COLLECT)
+
+            try:
+                expected = dump_tree(HTMLParser(errors).run(source))
+
+            except AssertionError:
+                if result.tree is not None or not result.error.startswith("AssertionError: NOT IMPLEMENTED"):
+                    return f"{source!r} gives {result.error!r}"
+                continue
+
+            document = result.document()
+            expected_errors = [(error.code, error.offset, error.line, error.column) for error in errors]
+
+            if result.error is not None or dump_tree(document) != expected or \
+                    result.parse_errors != expected_errors or result.parse_error_count != errors.count or \
+                    [(error.code, error.offset, error.line, error.column) for error in document.parse_errors] != expected_errors:
+                return f"{source!r} gives {result!r} {result.parse_errors}"
+
+    return None
+
+
+# name -> function that returns None, or what failed
+CHECKS = {
+    "feed_equivalence": _test_feed_equivalence,
+    "encoding_sniffing": _test_encoding_sniffing,
+    "character_references": _test_character_references,
+    "cache": _test_cache,
+    "duplicate_attributes": _test_duplicate_attributes,
+    "long_values_in_chunks": _test_long_values_in_chunks,
+    "parallel_tokenizer": _test_parallel_tokenizer,
+    "stack_scopes": _test_stack_scopes,
+    "parse_many": _test_parse_many,
+}
+
+
+def run_test(test_name: str | list[str] = None, out_file: str = None) -> list[str]:
+
+    """
+    Run a single test or list of tests from TESTS and CHECKS, all of them if none is given. The sources of TESTS
+    are parsed by HTMLParser and by HTMLStreamingParser. Write failed test names into the out_file if is provided.
+    Return failed test names as a list.
+
+    test_name:\n\t Test or tests to run.
+    out_file:\n\t Path to output file.
+    """
+
+    if test_name is None:
+        test_name = list(TESTS) + list(CHECKS)
+
+    if type(test_name) == str:
+        test_name = [test_name]
+
+    total_success = 0
+    total_fail = 0
+    failed_list = []
+
+    for name in test_name:
+
+        if name in CHECKS:
+
+            try:
+                failed = CHECKS[name]()
+
+            except Exception as e:
+                failed = f"{type(e).__name__} {e}"
+
+            if failed is not None:
+                print(f"🔴 FAIL: {name}, e: {failed}")
+                total_fail += 1
+                failed_list.append(name)
+                continue
+
+            print(f"🟢 SUCCESS: {name}")
+            total_success += 1
+            continue
+
+        source, expected = TESTS[name]
+        expected = expected.strip("\n")
+
+        try:
+            output = dump_tree(HTMLParser().run(source))
+            streamed = dump_tree(HTMLStreamingParser(_TreeBuilder()).run(source).stack[0])
+
+        except Exception as e:
+            print(f"🔴 FAIL: {name}, e: {e}")
+            total_fail += 1
+            failed_list.append(name)
+            continue
+
+        if output != expected or streamed != expected:
+            print(f"🔴 FAIL: {name}, e: tree mismatch")
+            print(output if output != expected else streamed)
+            total_fail += 1
+            failed_list.append(name)
+            continue
+
+        print(f"🟢 SUCCESS: {name}")
+        total_success += 1
+
+    print("Total tests:", len(test_name))
+    print("Total success:", total_success)
+    print("Total fail:", total_fail)
+
+    if out_file is not None:
+        with open(abspath(out_file), "w") as f:
+            f.writelines(failed_name + "\n" for failed_name in failed_list)
+
+    return failed_list
@@ -1,7 +1,10 @@
 from enum import Enum as _Enum, auto as _auto
 
+from .attributes import *
+from .span import *
 
-__all__ = ["HTMLToken", "HTMLTokenDoctype", "HTMLTokenStartTag", "HTMLTokenEndTag", "HTMLTokenComment", "HTMLTokenCharacter", "HTMLTokenEOF", "t_HTMLToken"]
+
+__all__ = ["HTMLToken", "HTMLTokenDoctype", "HTMLTokenTag", "HTMLTokenStartTag", "HTMLTokenEndTag", "HTMLTokenComment", "HTMLTokenCharacter", "HTMLTokenEOF", "t_HTMLToken"]
 
 
 class HTMLToken:
@@ -15,38 +18,46 @@ class HTMLToken:
         EOF       = _auto()
         
         
+    # the type is a class attribute and the fields are slots,
+    # so tokens have no __dict__ (a field behind a property is in
+    # a slot with a leading underscore)
+    __slots__ = ()
+    
     type: Type
     
     
     def __repr__(self):
         
-        attributes = {key: getattr(self, key) for key in self.__dict__ if not key.startswith('__') and not callable(getattr(self, key))}
-        attr_strings = ", ".join(f"{key}={value!r}" for key, value in attributes.items())
+        # the slots of the base classes come first
+        slots = tuple(key for cls in reversed(type(self).__mro__) for key in cls.__dict__.get("__slots__", ()))
+        attr_strings = ", ".join(f"{key}={getattr(self, key)!r}" for key in ("type",) + tuple(key.lstrip("_") for key in slots))
         
         return f"HTMLToken({attr_strings})"
 
 
 class HTMLTokenDoctype(HTMLToken):
     
+    type = HTMLToken.Type.DOCTYPE
+    __slots__ = ("name", "public_identifier", "system_identifier", "force_quirks")
+    
     def __init__(self):
         
-        self.type = self.Type.DOCTYPE
-        
         self.name: None | str = None
         self.public_identifier: None | str = None
         self.system_identifier: None | str = None
         self.force_quirks: bool = 0
         
 
-class HTMLTokenStartTag(HTMLToken):
+class HTMLTokenTag(HTMLToken):
+    
+    # the fields and methods of the start and end tags
+    __slots__ = ("tag_name", "self_closing_tag", "attributes")
     
     def __init__(self):
         
-        self.type = self.Type.START_TAG
-        
         self.tag_name: None | str = None
         self.self_closing_tag: bool = 0
-        self.attributes: list[list[str, str]] = [] # (name, value)
+        self.attributes = HTMLAttributes() # name -> value
     
     
     def append_attr(self, name: str, value: str):
@@ -56,69 +67,65 @@ class HTMLTokenStartTag(HTMLToken):
         
     def has_attr(self, name: str):
         
-        return any(a[0] == name for a in self.attributes)
+        return self.attributes.has(name)
     
     
     def get_attr(self, name: str):
         
-        if not self.has_attr(name):
-            return
-        
-        return list(filter(lambda a: a[0] == name, self.attributes))[0][1]
+        return self.attributes.get(name)
 
 
-class HTMLTokenEndTag(HTMLToken):
+class HTMLTokenStartTag(HTMLTokenTag):
     
-    def __init__(self):
+    type = HTMLToken.Type.START_TAG
+    __slots__ = ()
+
+
+class HTMLTokenEndTag(HTMLTokenTag):
+    
+    type = HTMLToken.Type.END_TAG
+    __slots__ = ()
         
-        self.type = self.Type.END_TAG
         
-        self.tag_name: None | str = None
-        self.self_closing_tag: bool = 0
-        self.attributes: list[list[str, str]] = [] # (name, value)
+class HTMLTokenComment(HTMLToken):
     
+    type = HTMLToken.Type.COMMENT
+    __slots__ = ("_data",)
     
-    def append_attr(self, name: str, value: str):
+    def __init__(self, data: str|HTMLSpan = None):
         
-        self.attributes.append([name, value])
-       
-        
-    def has_attr(self, name: str):
-        
-        return any(a[0] == name for a in self.attributes)
+        self._data = data
     
     
-    def get_attr(self, name: str):
-        
-        if not self.has_attr(name):
-            return
+    @property
+    def data(self) -> None|str:
         
-        return list(filter(lambda a: a[0] == name, self.attributes))[0][1]
+        # the data may be a span of the input until it is read
+        if type(self._data) is HTMLSpan:
+            self._data = str(self._data)
         
-        
-class HTMLTokenComment(HTMLToken):
+        return self._data
     
-    def __init__(self, data: str = None):
-        
-        self.type = self.Type.COMMENT
+    
+    @data.setter
+    def data(self, data: str|HTMLSpan):
         
-        self.data = data
+        self._data = data
 
 
 class HTMLTokenCharacter(HTMLToken):
     
+    type = HTMLToken.Type.CHARACTER
+    __slots__ = ("data",)
+    
     def __init__(self, char: str):
         
-        self.type = self.Type.CHARACTER
-        
         self.data = char
         
         
 class HTMLTokenEOF(HTMLToken):
     
-    def __init__(self):
-        
-        self.type = self.Type.EOF
-        
+    type = HTMLToken.Type.EOF
+    __slots__ = ()
 
 t_HTMLToken = HTMLTokenDoctype | HTMLTokenStartTag | HTMLTokenEndTag | HTMLTokenComment | HTMLTokenCharacter | HTMLTokenEOF
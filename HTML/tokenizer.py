@@ -1,7 +1,15 @@
 from enum import Enum as _Enum, auto as _auto
-from typing import Generator as _Generator
+import re as _re
+from time import perf_counter_ns as _perf_counter_ns
+from typing import BinaryIO as _BinaryIO, Generator as _Generator
 
 from .token import *
+from .entities import *
+from .names import *
+from .stream import *
+from .span import *
+from .error import *
+from .stats import *
 
 
 __all__ = ["HTMLTokenizer"]
@@ -95,29 +103,117 @@ class HTMLTokenizer:
         
     whitespace  = "\t\n\f " 
     ascii_alpha = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    ascii_digit = "0123456789"
+    ascii_hex_digit = "0123456789abcdefABCDEF"
+    ascii_alphanumeric = ascii_alpha + ascii_digit
     
-    def __init__(self):
+    # runs of chars that have no special meaning in the text states
+    data_run       = _re.compile(r"[^&<\0]*")
+    rcdata_run     = _re.compile(r"[^&<\0]*")
+    rawtext_run    = _re.compile(r"[^<\0]*")
+    script_run     = _re.compile(r"[^<\0]*")
+    plain_text_run = _re.compile(r"[^\0]*")
+    
+    # the same in the escaped script and comment states, a run stops at the
+    # next char that may start "</", "<!--" or "-->" (">" in a bogus comment)
+    script_escaped_run = _re.compile(r"[^-<\0]*")
+    comment_run        = _re.compile(r"[^-<\0]*")
+    bogus_comment_run  = _re.compile(r"[^>\0]*")
+    
+    # runs of chars that are simply appended in the tag states
+    tag_name_run                 = _re.compile(r"[^\t\n\r\f />\0]*")
+    attribute_name_run           = _re.compile(r"[^\t\n\r\f />=\0\"'<]*")
+    attribute_value_double_run   = _re.compile(r"[^\"&\0]*")
+    attribute_value_single_run   = _re.compile(r"[^'&\0]*")
+    attribute_value_unquoted_run = _re.compile(r"[^\t\n\r\f &>\0\"'<=`]*")
+    
+    # a value that is a slice of the input is kept as a span if it is at
+    # least this long, a shorter slice is smaller than the span
+    span_min_length = 64
+    
+    # whitespace before the first tag or text is skipped (see feed())
+    leading_whitespace = _re.compile(r"\s*")
+    
+    def __init__(self, errors: HTMLParseErrors = None, stats: HTMLTokenizerStats = None):
         
         # states
         self.state = self.State.DATA
         self.return_state: self.State = None
         
         self.temporary_buffer = None
+        self.character_reference_code = 0
         self.last_emitted_start_tag_name = ""
         
         # current token (to emit)
         self.curr_token: HTMLToken = None
         
+        # current attribute of the tag token as [name, value], added to the
+        # token when the next attribute starts or the token is emitted
+        self.curr_attribute: list[str, str] = None
+        
+        # input range of the value that is built (attribute value or comment
+        # data) after its decoded part, the value is a span of the input if
+        # nothing in it is decoded (see _append_value_range())
+        self.value_start: int = None
+        self.value_end = 0
+        
+        # the value before the range (decoded chars and input of the previous
+        # chunks) in pieces that are joined once when the value is built
+        self.value_pieces: list[str] = []
+        
+        # tokens emitted while handling the current input char
+        self.emitted_tokens: list[HTMLToken] = []
+        
+        # decodes the input if it is given as bytes (see run())
+        self.input_stream: HTMLInputStream = None
+        
+        # received input that is not consumed yet, as it is received
+        # (newlines are normalized as the chars are consumed)
+        self.html_text: str = ""
+        
+        # end of the input in html_text that is ready to tokenize,
+        # the whitespace after it is held back until more input is fed
+        self.end = 0
+        
+        # chunks of only whitespace received after html_text, held back
+        # without copying html_text until a chunk that is not comes
+        self.held_back: list[str] = []
+        
+        # offset of html_text in the whole input
+        self.offset = 0
+        
+        # parts of a character run that reached the end of the received input
+        self.character_run: list[str] = []
+        self.character_run_pattern: _re.Pattern = None
+        
         # current char index
         self.i = 0
         
+        # parse errors (count only by default)
+        self.errors = errors if errors is not None else HTMLParseErrors()
+        
+        # the parse errors of the tokenizer (not of the parser) as (code,
+        # offset) are added to it if it is a list (see HTMLTokenCache.record())
+        self.error_log: list[tuple[str, int]] = None
+        
+        # what is done in each state, not recorded if None (the default)
+        # so that _tokenize() does not check it per char
+        self.stats = stats
+        
+        # flags
+        self.started = 0 # a non-whitespace char is received
+        self.closed = 0  # all the input is received
+        self.paused = 0  # the current char needs input that is not received yet
+        
     
-    def preprocess(self, html_text: str) -> str:
+    def _normalize_newlines(self, text: str) -> str:
         
-        # TODO: consider first few lines in https://html.spec.whatwg.org/multipage/parsing.html#preprocessing-the-input-stream
+        # see https://html.spec.whatwg.org/multipage/parsing.html#preprocessing-the-input-stream
+        # for a slice of the input, single chars are normalized in _tokenize()
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
         
-        # normalize newlines
-        return html_text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
         
     
     def _switch_to(self, state: "HTMLTokenizer.State"):
@@ -140,1579 +236,2056 @@ class HTMLTokenizer:
         
         if token: self.curr_token = token # shortcut
         
-        # store last emitted start tag name
-        # to check if appropriate end tag token
-        if self.curr_token.type == HTMLToken.Type.START_TAG:
-            self.last_emitted_start_tag_name = self.curr_token.tag_name
+        if self.curr_token.type == HTMLToken.Type.START_TAG or self.curr_token.type == HTMLToken.Type.END_TAG:
+            
+            self._append_attribute()
+            
+            # share one instance per name with the other tokens (and nodes)
+            self.curr_token.tag_name = intern_name(self.curr_token.tag_name)
+            
+            # store last emitted start tag name
+            # to check if appropriate end tag token
+            if self.curr_token.type == HTMLToken.Type.START_TAG:
+                self.last_emitted_start_tag_name = self.curr_token.tag_name
+        
+        elif self.curr_token.type == HTMLToken.Type.COMMENT:
+            self.curr_token.data = self._comment_data()
         
         temp_tok = self.curr_token
         self.curr_token = None
+        self.emitted_tokens.append(temp_tok)
         return temp_tok
     
 
-    def _parse_error(self, code: str):
+    def _start_attribute(self, name: str = ""):
         
-        print("Parse Error:", code)
+        self._append_attribute()
+        self.curr_attribute = [name, ""]
+        self.value_start = self.value_end = self.i
+        self.value_pieces.clear()
+    
+    
+    def _leave_attribute_name(self):
         
+        # see https://html.spec.whatwg.org/multipage/parsing.html#attribute-name-state
+        # a name that is already on the token is dropped with its value
+        if self.curr_token.attributes.has(self.curr_attribute[0]):
+            self._parse_error("duplicate-attribute")
+            self.curr_attribute[0] = None
     
-    def run(self, html_text: str) -> _Generator[HTMLToken, None, None]:
+    
+    def _append_attribute(self):
         
-        html_text = self.preprocess(html_text.strip())
+        if self.curr_attribute is None:
+            return
         
-        self.i = 0
-        while self.i <= len(html_text):
-            
-            is_eof = (self.i == len(html_text))
-            
-            c = ""
-            if is_eof:
-                c = "EOF" # will not be used
+        name, value = self.curr_attribute
+        
+        if self.value_pieces:
+            value += "".join(self.value_pieces) + self.html_text[self.value_start:self.value_end]
+            self.value_pieces.clear()
+        
+        elif self.value_start != self.value_end:
+            if self.value_end - self.value_start < self.span_min_length:
+                value += self.html_text[self.value_start:self.value_end]
             else:
-                # consume the current input char
-                c = html_text[self.i]
-                self.i += 1
-            
-            if self.state == self.State.DATA:
-                
-                if c == "&":
-                    self._set_return(self.State.DATA)
-                    self._switch_to(self.State.CHARACTER_REFERENCE)
-                
-                elif c == "<":
-                    self._switch_to(self.State.TAG_OPEN)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-                elif is_eof:
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.RCDATA:
-                
-                if c == "&":
-                    self._set_return(self.State.DATA)
-                    self._switch_to(self.State.CHARACTER_REFERENCE)
-                
-                elif c == "<":
-                    self._switch_to(self.State.RCDATA_LESS_THAN_SIGN)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.RAWTEXT:
-                
-                if c == "<":
-                    self._switch_to(self.State.RAWTEXT_LESS_THAN_SIGN)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.SCRIPT_DATA:
-                
-                if c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_LESS_THAN_SIGN)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.PLAIN_TEXT:
-                
-                if c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-            
-            elif self.state == self.State.TAG_OPEN:
-                
-                if c == "!":
-                    self._switch_to(self.State.MARKUP_DECLARATION_OPEN)
-                    
-                elif c == "/":
-                    self._switch_to(self.State.END_TAG_OPEN)
-                    
-                elif c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenStartTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.TAG_NAME)
-
-                elif c == "?":
-                    self._parse_error("unexpected-question-mark-instead-of-tag-name")
-                    self.curr_token = HTMLTokenComment("")
-                    self._reconsume_in(self.State.BOGUS_COMMENT)
-                
-                elif is_eof:
-                    self._parse_error("eof-before-tag-name")
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("invalid-first-character-of-tag-name")
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    self._reconsume_in(self.State.DATA)
-                    
-            elif self.state == self.State.END_TAG_OPEN:
-                
-                if c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenEndTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.TAG_NAME)
-                    
-                elif c == ">":
-                    self._parse_error("missing-end-tag-name")
-                    self._switch_to(self.State.DATA)
-                
-                elif is_eof:
-                    self._parse_error("eof-before-tag-name")
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("invalid-first-character-of-tag-name")
-                    self.curr_token = HTMLTokenComment("")
-                    self._reconsume_in(self.State.BOGUS_COMMENT)
-            
-            elif self.state == self.State.TAG_NAME:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                
-                elif c == "/":
-                    self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-question-mark-instead-of-tag-name")
-                    self.curr_token.tag_name += u"\ufffd"
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.tag_name += c.lower()
-                    
-            elif self.state == self.State.RCDATA_LESS_THAN_SIGN:
-                
-                if c == "/":
-                    self.temporary_buffer = ""
-                    self._switch_to(self.State.RCDATA_END_TAG_OPEN)
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    self._reconsume_in(self.RCDATA)
-                
-            elif self.state == self.State.RCDATA_END_TAG_OPEN:
-                
-                if c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenEndTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.RCDATA_END_TAG_NAME)
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    self._reconsume_in(self.RCDATA)
-                
-            elif self.state == self.State.RCDATA_END_TAG_NAME:
-                
-                if c in self.whitespace:
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RCDATA)
-                        
-                elif c == "/":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RCDATA)
-                        
-                elif c == ">":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.DATA)
-                        yield self._emit_token()
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RCDATA)
-                
-                elif c in self.ascii_alpha:
-                    self.curr_token.tag_name += c.lower()
-                    self.temporary_buffer += c
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    while len(self.temporary_buffer):
-                        # pop first char of temporary buffer
-                        c_ = self.temporary_buffer[0]
-                        self.temporary_buffer = self.temporary_buffer[1:]
-                        yield self._emit_token(HTMLTokenCharacter(c_))
-                    self._reconsume_in(self.State.RCDATA)
-                    
-            elif self.state == self.State.RAWTEXT_LESS_THAN_SIGN:
-                
-                if c == "/":
-                    self.temporary_buffer = ""
-                    self._switch_to(self.State.RAWTEXT_END_TAG_OPEN)
-                
-                else:
-                   yield self._emit_token(HTMLTokenCharacter("<"))
-                   self._reconsume_in(self.State.RAWTEXT)
-               
-            elif self.state == self.State.RAWTEXT_END_TAG_OPEN:
-                
-                if c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenEndTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.RAWTEXT_END_TAG_NAME)
-                
-                else:
-                   yield self._emit_token(HTMLTokenCharacter("<"))
-                   yield self._emit_token(HTMLTokenCharacter("/"))
-                   self._reconsume_in(self.State.RAWTEXT)
-            
-            elif self.state == self.State.RAWTEXT_END_TAG_NAME:
-                
-                if c in self.whitespace:
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RAWTEXT)
-                
-                elif c == "/":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RAWTEXT)
-                
-                elif c == ">":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.DATA)
-                        yield self._emit_token()
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.RAWTEXT)
-                
-                elif c in self.ascii_alpha:
-                    self.curr_token.tag_name += c.lower()
-                    self.temporary_buffer += c
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    while len(self.temporary_buffer):
-                        # pop first char of temporary buffer
-                        c_ = self.temporary_buffer[0]
-                        self.temporary_buffer = self.temporary_buffer[1:]
-                        yield self._emit_token(HTMLTokenCharacter(c_))
-                    self._reconsume_in(self.State.RAWTEXT)
-            
-            elif self.state == self.State.SCRIPT_DATA_LESS_THAN_SIGN:
-                
-                if c == "/":
-                    self.temporary_buffer = ""
-                    self._switch_to(self.State.SCRIPT_DATA_END_TAG_OPEN)
-                
-                elif c == "!":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPE_START)
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("!"))
-
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    self._reconsume_in(self.State.SCRIPT_DATA)
-                    
-            elif self.state == self.State.SCRIPT_DATA_END_TAG_OPEN:
-                
-                if c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenEndTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.SCRIPT_DATA_END_TAG_NAME)
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    self._reconsume_in(self.State.SCRIPT_DATA)
-                
-            elif self.state == self.State.SCRIPT_DATA_END_TAG_NAME:
-                
-                if c in self.whitespace:
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA)
-                
-                elif c == "/":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA)
-                
-                elif c == ">":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.DATA)
-                        yield self._emit_token()
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA)
-                
-                elif c in self.ascii_alpha:
-                    self.curr_token.tag_name += c.lower()
-                    self.temporary_buffer += c
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    while len(self.temporary_buffer):
-                        # pop first char of temporary buffer
-                        c_ = self.temporary_buffer[0]
-                        self.temporary_buffer = self.temporary_buffer[1:]
-                        yield self._emit_token(HTMLTokenCharacter(c_))
-                    self._reconsume_in(self.State.SCRIPT_DATA)
-            
-            elif self.state == self.State.SCRIPT_DATA_ESCAPE_START:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPE_START_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-                
-                else:
-                    self._reconsume_in(self.State.SCRIPT_DATA)
-            
-            elif self.state == self.State.SCRIPT_DATA_ESCAPE_START_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-                
-                else:
-                    self._reconsume_in(self.State.SCRIPT_DATA)
-            
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
-
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                    
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
+                value = HTMLSpan(self.html_text, self.value_start, self.value_end)
+        
+        if name is not None:
+            self.curr_token.attributes.append([intern_name(name), value])
+        
+        self.curr_attribute = None
+        self.value_start = None
+    
+    
+    def _append_value_range(self, start: int, end: int):
+        
+        # input chars of the attribute value, the range grows while they
+        # come one after another and need no decoding
+        if self.html_text.find("\r", start, end) != -1:
+            self._append_value(self._normalize_newlines(self.html_text[start:end]))
+        
+        elif self.value_start == self.value_end:
+            self.value_start = start
+            self.value_end = end
+        
+        elif start == self.value_end:
+            self.value_end = end
+        
+        else:
+            self._append_value(self.html_text[start:end])
+    
+    
+    def _append_value_run(self, run: _re.Pattern):
+        
+        # the current input char starts the run
+        start = self.i - 1
+        self.i = run.match(self.html_text, self.i, self.end).end()
+        
+        self._append_value_range(start, self.i)
+    
+    
+    def _append_value(self, text: str):
+        
+        # decoded chars of the attribute value, it is not a span anymore
+        if self.value_start != self.value_end:
+            self.value_pieces.append(self.html_text[self.value_start:self.value_end])
+        
+        self.value_pieces.append(text)
+        self.value_start = self.value_end
+    
+    
+    def _start_comment(self, start: int):
+        
+        # the data starts at html_text[start], the comment states move
+        # self.value_end to the end of the data instead of appending to it
+        self.curr_token = HTMLTokenComment("")
+        self.value_start = self.value_end = start
+        self.value_pieces.clear()
+    
+    
+    def _comment_data(self) -> str|HTMLSpan:
+        
+        start = self.value_start
+        end = self.value_end
+        self.value_start = None
+        
+        if self.value_pieces:
+            data = "".join(self.value_pieces) + self.html_text[start:end]
+            self.value_pieces.clear()
+            return self._normalize_newlines(data).replace("\0", u"\ufffd")
+        
+        if end - start < self.span_min_length or \
+                self.html_text.find("\0", start, end) != -1 or self.html_text.find("\r", start, end) != -1:
+            return self._normalize_newlines(self.html_text[start:end]).replace("\0", u"\ufffd")
+        
+        return HTMLSpan(self.html_text, start, end)
+    
+    
+    def _consume_run(self, run: _re.Pattern) -> str:
+        
+        # the current input char starts the run, consume the rest of it at once
+        start = self.i - 1
+        self.i = run.match(self.html_text, self.i, self.end).end()
+        
+        return self._normalize_newlines(self.html_text[start:self.i])
+    
+    
+    def _emit_character_run(self, run: _re.Pattern, start: int = None) -> HTMLToken:
+        
+        # the run starts at the current input char if not given
+        if start is None:
+            start = self.i - 1
+        
+        self.i = run.match(self.html_text, self.i, self.end).end()
+        data = self._normalize_newlines(self.html_text[start:self.i])
+        
+        if self.i == self.end and not self.closed:
+            # the run may go on in the input that is not received yet,
+            # keep it until _tokenize() continues it
+            self.character_run.append(data)
+            self.character_run_pattern = run
+            return None
+        
+        if self.character_run:
+            self.character_run.append(data)
+            data = "".join(self.character_run)
+            self.character_run.clear()
+        
+        return self._emit_token(HTMLTokenCharacter(data))
+    
+    
+    def _emit_text_run(self, text: str, state: "HTMLTokenizer.State", run: _re.Pattern) -> HTMLToken:
+        
+        # the text of what did not turn out to be a tag ("<", "</" and the
+        # temporary buffer) is emitted with the run after it as one token,
+        # the current input char is reconsumed as the start of the run
+        self._reconsume_in(state)
+        self.character_run.append(text)
+        
+        return self._emit_character_run(run, self.i)
+    
+    
+    def _consumed_as_part_of_an_attribute(self) -> bool:
+        
+        return self.return_state in (
+            self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED,
+            self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED,
+            self.State.ATTRIBUTE_VALUE_UNQUOTED,
+        )
+    
+    
+    def _flush_character_reference(self):
+        
+        # flush code points consumed as a character reference
+        if self._consumed_as_part_of_an_attribute():
+            self._append_value(self.temporary_buffer)
+        else:
+            self._emit_token(HTMLTokenCharacter(self.temporary_buffer))
+    
+    
+    def _pause(self):
+        
+        # give the current char back and stop until more input is fed
+        self.i -= 1
+        self.paused = 1
+        
+    
+    def _needs_input(self, n: int) -> bool:
+        
+        # check if the current char can be handled only by looking at
+        # the next n chars and they are not received yet
+        if self.closed or self.i + n <= self.end:
+            return False
+        
+        self._pause()
+        return True
+    
 
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
+    def position(self) -> int:
+        
+        # offset of the current char in the whole input
+        return self.offset + min(self.i, self.end)
+    
+    
+    def _report_error(self, code: str):
+        
+        # at the current char, the parser reports its errors here too
+        self.errors.report(code, self.html_text, max(self.i - 1, 0), self.offset)
+        
+    
+    def _parse_error(self, code: str):
+        
+        self._report_error(code)
+        
+        if self.error_log is not None:
+            self.error_log.append((code, self.offset + max(self.i - 1, 0)))
+        
+    
+    def _handle_state_data(self, c: str, is_eof: bool):
+        
+        if c == "&":
+            self._set_return(self.State.DATA)
+            self._switch_to(self.State.CHARACTER_REFERENCE)
 
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED_DASH_DASH:
-                
-                if c == "-":
-                    yield self._emit_token(HTMLTokenCharacter("-"))
+        elif c == "<":
+            self._switch_to(self.State.TAG_OPEN)
 
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(c))
 
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token(HTMLTokenCharacter(">"))
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
 
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN:
-                
-                if c == "/":
-                    self.temporary_buffer = ""
-                    self._switch_to(self.State.SCRIPT_DATA_ESCAPED_END_TAG_OPEN)
-                
-                elif c in self.ascii_alpha:
-                    self.temporary_buffer = ""
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPE_START)
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-                    
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED_END_TAG_OPEN:
-                
-                if c in self.ascii_alpha:
-                    self.curr_token = HTMLTokenEndTag()
-                    self.curr_token.tag_name = ""
-                    self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED_END_TAG_NAME)
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-            
-            elif self.state == self.State.SCRIPT_DATA_ESCAPED_END_TAG_NAME:
-                
-                if c in self.whitespace:
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-                
-                elif c == "/":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-                
-                elif c == ">":
-                    # if the current end token is an appropriate end tag token
-                    if self.curr_token.tag_name == self.last_emitted_start_tag_name:
-                        self._switch_to(self.State.DATA)
-                        yield self._emit_token()
-                    
-                    else:
-                        yield self._emit_token(HTMLTokenCharacter("<"))
-                        yield self._emit_token(HTMLTokenCharacter("/"))
-                        while len(self.temporary_buffer):
-                            # pop first char of temporary buffer
-                            c_ = self.temporary_buffer[0]
-                            self.temporary_buffer = self.temporary_buffer[1:]
-                            yield self._emit_token(HTMLTokenCharacter(c_))
-                        self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-                
-                elif c in self.ascii_alpha:
-                    self.curr_token.tag_name += c.lower()
-                    self.temporary_buffer += c
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                    while len(self.temporary_buffer):
-                        # pop first char of temporary buffer
-                        c_ = self.temporary_buffer[0]
-                        self.temporary_buffer = self.temporary_buffer[1:]
-                        yield self._emit_token(HTMLTokenCharacter(c_))
-                    self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-            
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPE_START:
-                
-                if c in self.whitespace:
-                    if self.temporary_buffer == "script":
-                        self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                    else:
-                        self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
-                        yield self._emit_token(HTMLTokenCharacter(c))
-                
-                elif c in self.ascii_alpha:
-                    self.temporary_buffer += c.lower()
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-                else:
-                    self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
-                        
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPED:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-                
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                        
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH_DASH)
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-                
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                        
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH_DASH:
-                
-                if c == "-":
-                    yield self._emit_token(HTMLTokenCharacter("-"))
-                
-                elif c == "<":
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
-                    yield self._emit_token(HTMLTokenCharacter("<"))
-                
-                elif c == ">":
-                    self._switch_to(self.State.SCRIPT_DATA)
-                    yield self._emit_token(HTMLTokenCharacter(">"))
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(u"\ufffd"))
-                
-                elif is_eof:
-                    self._parse_error("eof-in-script-html-comment-like-text")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                    
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN:
-                
-                if c == "/":
-                    self.temporary_buffer = ""
-                    self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPE_END)
-                    yield self._emit_token(HTMLTokenCharacter("/"))
-                
-                else:
-                    self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-            
-            elif self.state == self.State.SCRIPT_DATA_DOUBLE_ESCAPE_END:
-                
-                if c in self.whitespace:
-                    if self.temporary_buffer == "script":
-                        self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+        else:
+            self._emit_character_run(self.data_run)
 
-                    else:
-                        self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-                        yield self._emit_token(HTMLTokenCharacter(c))
-                
-                elif c in self.ascii_alpha:
-                    self.temporary_buffer += c.lower()
-                    yield self._emit_token(HTMLTokenCharacter(c))
-                
-                else:
-                    self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
-            
-            elif self.state == self.State.BEFORE_ATTRIBUTE_NAME:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                
-                elif c in "/>" or is_eof:
-                    self._reconsume_in(self.State.AFTER_ATTRIBUTE_NAME)
-                
-                elif c == "=":
-                    self._parse_error("unexpected-equals-sign-before-attribute-name")
-                    self.curr_token.attributes.append([c, ""])
-                    self._switch_to(self.State.ATTRIBUTE_NAME)
-                    
-                else:
-                    self.curr_token.attributes.append(["", "" ])
-                    self._reconsume_in(self.State.ATTRIBUTE_NAME)
-            
-            elif self.state == self.State.ATTRIBUTE_NAME:
-                
-                if c in self.whitespace or c in "/>" or is_eof:
-                    self._reconsume_in(self.State.AFTER_ATTRIBUTE_NAME)
-                
-                elif c == "=":
-                    self._switch_to(self.State.BEFORE_ATTRIBUTE_VALUE)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.attributes[-1][0] += u"\ufffd"
-                    assert 0, "NOT IMPLEMENTED"
-                
-                elif c in "\"'<":
-                    self._parse_error("unexpected-character-in-attribute-name")
-                    self.curr_token.attributes[-1][0] += c.lower()
-                
-                else:
-                    self.curr_token.attributes[-1][0] += c.lower()
-                
-                # TODO: check if same attr name exists already in the token see
-                # https://html.spec.whatwg.org/multipage/parsing.html#attribute-name-state
-            
-            elif self.state == self.State.AFTER_ATTRIBUTE_NAME:
 
-                if c in self.whitespace:
-                    pass # ignore
-                    
-                elif c == "/":
-                    self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                
-                elif c == "=":
-                    self._switch_to(self.State.BEFORE_ATTRIBUTE_VALUE)
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                    
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.attributes.append(["", "" ])
-                    self._reconsume_in(self.State.ATTRIBUTE_NAME)
-                    
-            elif self.state == self.State.BEFORE_ATTRIBUTE_VALUE:
-                
-                if c in self.whitespace:
-                    pass # ignore 
-                
-                elif c == "\"":
-                    self._switch_to(self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self._switch_to(self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED)
-                
-                elif c == ">":
-                    self._parse_error("missing-attribute-value")
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                    
-                else:
-                    self._reconsume_in(self.State.ATTRIBUTE_VALUE_UNQUOTED)
-
-            elif self.state == self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED:
-                
-                if c == "\"":
-                    self._switch_to(self.State.AFTER_ATTRIBUTE_VALUE_QUOTED)
-                    
-                elif c == "&":
-                    self._set_return(self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED)
-                    self._switch_to(self.State.CHARACTER_REFERENCE)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.attributes[-1][1] += u"\ufffd"
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.attributes[-1][1] += c
-            
-            elif self.state == self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED:
-                
-                if c == "'":
-                    self._switch_to(self.State.AFTER_ATTRIBUTE_VALUE_QUOTED)
-                    
-                elif c == "&":
-                    self._set_return(self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED)
-                    self._switch_to(self.State.CHARACTER_REFERENCE)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.attributes[-1][1] += u"\ufffd"
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.attributes[-1][1] += c
-            
-            elif self.state == self.State.ATTRIBUTE_VALUE_UNQUOTED:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                elif c == "&":
-                    self._set_return(self.State.ATTRIBUTE_VALUE_UNQUOTED)
-                    self._switch_to(self.State.CHARACTER_REFERENCE)
-
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.attributes[-1][1] += u"\ufffd"
-                    
-                elif c in "\"'<=`":
-                    self._parse_error("unexpected-character-in-unquoted-attribute-value")
-                    self.curr_token.attributes[-1][1] += c
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.attributes[-1][1] += c
-            
-            elif self.state == self.State.AFTER_ATTRIBUTE_VALUE_QUOTED:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-                elif c == "/":
-                    self._switch_to(self.State.SELF_CLOSING_START_TAG)
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-whitespace-between-attributes")
-                    self._reconsume_in(self.State.BEFORE_ATTRIBUTE_NAME)
-            
-            elif self.state == self.State.SELF_CLOSING_START_TAG:
-                
-                if c == ">":
-                    self.curr_token.self_closing_tag = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-tag")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("unexpected-solidus-in-tag")
-                    self._reconsume_in(self.State.BEFORE_ATTRIBUTE_NAME)
-                    
-            # HELP ME!
-            
-            elif self.state == self.State.BOGUS_COMMENT:
-                
-                if c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # comment token
-                    
-                elif is_eof:
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF()) # comment token
-                
-                else:
-                    self.curr_token.data += c
-                    
-            elif self.state == self.State.MARKUP_DECLARATION_OPEN:
-                
-                if html_text[self.i-1:self.i+1] == "--":
-                    self.curr_token = HTMLTokenComment("")
-                    self._switch_to(self.State.COMMENT_START)
-                    self.i += 1 # consume also the second "-"
-                
-                elif self.i+5 < len(html_text) and html_text[self.i-1:self.i+6].upper() == "DOCTYPE":
-                    self._switch_to(self.State.DOCTYPE)
-                    self.i += 6 # consume also the rest "OCTYPE" 
-                
-                elif self.i+5 < len(html_text) and html_text[self.i-1:self.i+6] == "[CDATA[":
-                    assert 0, "NOT IMPLEMENTED"
-                    # TODO: see https://html.spec.whatwg.org/multipage/parsing.html#markup-declaration-open-state
-                    self.i += 6 # consume also the rest "CDATA[" 
-                
-                else:
-                    self._parse_error("incorrectly-opened-comment")
-                    self.curr_token = HTMLTokenComment("")
-                    self._reconsume_in(self.State.BOGUS_COMMENT)
-                    # TODO: is this reconsume or switch I could not get it
-                    # see https://html.spec.whatwg.org/multipage/parsing.html#markup-declaration-open-state
-            
-            elif self.state == self.State.COMMENT_START:
-                
-                if c == "-":
-                    self._switch_to(self.State.COMMENT_START_DASH)
-                
-                elif c == ">":
-                    self._parse_error("abrupt-closing-of-empty-comment")
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # comment token
-                    
-                else:
-                    self._reconsume_in(self.State.COMMENT)
-                    
-            elif self.state == self.State.COMMENT_START_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.COMMENT_END)
-                
-                elif c == ">":
-                    self._parse_error("abrupt-closing-of-empty-comment")
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # comment token
-                
-                elif is_eof:
-                    self._parse_error("eof-in-comment")
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF())
-
-                else:
-                    self.curr_token.data += "-"
-                    self._reconsume_in(self.State.COMMENT)
-                    
-            elif self.state == self.State.COMMENT:
-                
-                if c == "<":
-                    self.curr_token.data += c
-                    self._switch_to(self.State.COMMENT_LESS_THAN_SIGN)
-                
-                elif c == "-":
-                    self._switch_to(self.State.COMMENT_END_DASH)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.data += u"\ufffd"
-                
-                elif is_eof:
-                    self._parse_error("eof-in-comment")
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.data += c
-            
-            elif self.state == self.State.COMMENT_LESS_THAN_SIGN:
-                
-                if c == "!":
-                    self.curr_token.data += c
-                    self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG)
-                
-                elif c == "<":
-                    self.curr_token.data += c 
-                
-                else:
-                    self._reconsume_in(self.State.COMMENT)
-            
-            elif self.state == self.State.COMMENT_LESS_THAN_SIGN_BANG:
-                
-                if c == "-":
-                    self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH)
-                
-                else:
-                    self._reconsume_in(self.State.COMMENT)
-                    
-            elif self.state == self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH_DASH)
-                
-                else:
-                    self._reconsume_in(self.State.COMMENT_END_DASH)
-                    
-            elif self.state == self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH_DASH:
-                
-                if c == ">" or is_eof:
-                    self._reconsume_in(self.State.COMMENT_END)
-                
-                else:
-                    self._parse_error("nested-comment")
-                    self._reconsume_in(self.State.COMMENT_END)
-                    
-            elif self.state == self.State.COMMENT_END_DASH:
-                
-                if c == "-":
-                    self._switch_to(self.State.COMMENT_END)
-                
-                elif is_eof:
-                    self._parse_error("eof-in-comment")
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.data += "-"
-                    self._reconsume_in(self.State.COMMENT)
-                    
-            elif self.state == self.State.COMMENT_END:
-                
-                if c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
+    def _handle_state_rcdata(self, c: str, is_eof: bool):
+        
+        if c == "&":
+            self._set_return(self.State.RCDATA)
+            self._switch_to(self.State.CHARACTER_REFERENCE)
+
+        elif c == "<":
+            self._switch_to(self.State.RCDATA_LESS_THAN_SIGN)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.rcdata_run)
+
+
+    def _handle_state_rawtext(self, c: str, is_eof: bool):
+        
+        if c == "<":
+            self._switch_to(self.State.RAWTEXT_LESS_THAN_SIGN)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.rawtext_run)
+
+
+    def _handle_state_script_data(self, c: str, is_eof: bool):
+        
+        if c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_LESS_THAN_SIGN)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.script_run)
+
+
+    def _handle_state_plain_text(self, c: str, is_eof: bool):
+        
+        if c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.plain_text_run)
+
+
+    def _handle_state_tag_open(self, c: str, is_eof: bool):
+        
+        if c == "!":
+            self._switch_to(self.State.MARKUP_DECLARATION_OPEN)
+
+        elif c == "/":
+            self._switch_to(self.State.END_TAG_OPEN)
+
+        elif c in self.ascii_alpha:
+            self.curr_token = HTMLTokenStartTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.TAG_NAME)
+
+        elif c == "?":
+            self._parse_error("unexpected-question-mark-instead-of-tag-name")
+            self._start_comment(self.i - 1)
+            self._reconsume_in(self.State.BOGUS_COMMENT)
+
+        elif is_eof:
+            self._parse_error("eof-before-tag-name")
+            self._emit_token(HTMLTokenCharacter("<"))
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("invalid-first-character-of-tag-name")
+            self._emit_token(HTMLTokenCharacter("<"))
+            self._reconsume_in(self.State.DATA)
+
+
+    def _handle_state_end_tag_open(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alpha:
+            self.curr_token = HTMLTokenEndTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.TAG_NAME)
+
+        elif c == ">":
+            self._parse_error("missing-end-tag-name")
+            self._switch_to(self.State.DATA)
+
+        elif is_eof:
+            self._parse_error("eof-before-tag-name")
+            self._emit_token(HTMLTokenCharacter("<"))
+            self._emit_token(HTMLTokenCharacter("/"))
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("invalid-first-character-of-tag-name")
+            self._start_comment(self.i - 1)
+            self._reconsume_in(self.State.BOGUS_COMMENT)
+
+
+    def _handle_state_tag_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+        elif c == "/":
+            self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif c == "\0":
+            self._parse_error("unexpected-question-mark-instead-of-tag-name")
+            self.curr_token.tag_name += u"\ufffd"
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.tag_name += self._consume_run(self.tag_name_run).lower()
+
+
+    def _handle_state_rcdata_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "/":
+            self.temporary_buffer = ""
+            self._switch_to(self.State.RCDATA_END_TAG_OPEN)
+
+        else:
+            self._emit_text_run("<", self.State.RCDATA, self.rcdata_run)
+
+
+    def _handle_state_rcdata_end_tag_open(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alpha:
+            self.curr_token = HTMLTokenEndTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.RCDATA_END_TAG_NAME)
+
+        else:
+            self._emit_text_run("</", self.State.RCDATA, self.rcdata_run)
+
+
+    def _handle_state_rcdata_end_tag_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RCDATA, self.rcdata_run)
+                self.temporary_buffer = ""
+
+        elif c == "/":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RCDATA, self.rcdata_run)
+                self.temporary_buffer = ""
+
+        elif c == ">":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.DATA)
+                self._emit_token()
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RCDATA, self.rcdata_run)
+                self.temporary_buffer = ""
+
+        elif c in self.ascii_alpha:
+            self.curr_token.tag_name += c.lower()
+            self.temporary_buffer += c
+
+        else:
+            self._emit_text_run("</" + self.temporary_buffer, self.State.RCDATA, self.rcdata_run)
+            self.temporary_buffer = ""
+
+
+    def _handle_state_rawtext_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "/":
+            self.temporary_buffer = ""
+            self._switch_to(self.State.RAWTEXT_END_TAG_OPEN)
+
+        else:
+           self._emit_text_run("<", self.State.RAWTEXT, self.rawtext_run)
+
+
+    def _handle_state_rawtext_end_tag_open(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alpha:
+            self.curr_token = HTMLTokenEndTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.RAWTEXT_END_TAG_NAME)
+
+        else:
+           self._emit_text_run("</", self.State.RAWTEXT, self.rawtext_run)
+
+
+    def _handle_state_rawtext_end_tag_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RAWTEXT, self.rawtext_run)
+                self.temporary_buffer = ""
+
+        elif c == "/":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RAWTEXT, self.rawtext_run)
+                self.temporary_buffer = ""
+
+        elif c == ">":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.DATA)
+                self._emit_token()
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.RAWTEXT, self.rawtext_run)
+                self.temporary_buffer = ""
+
+        elif c in self.ascii_alpha:
+            self.curr_token.tag_name += c.lower()
+            self.temporary_buffer += c
+
+        else:
+            self._emit_text_run("</" + self.temporary_buffer, self.State.RAWTEXT, self.rawtext_run)
+            self.temporary_buffer = ""
+
+
+    def _handle_state_script_data_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "/":
+            self.temporary_buffer = ""
+            self._switch_to(self.State.SCRIPT_DATA_END_TAG_OPEN)
+
+        elif c == "!":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPE_START)
+            self._emit_token(HTMLTokenCharacter("<"))
+            self._emit_token(HTMLTokenCharacter("!"))
+
+        else:
+            self._emit_text_run("<", self.State.SCRIPT_DATA, self.script_run)
+
+
+    def _handle_state_script_data_end_tag_open(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alpha:
+            self.curr_token = HTMLTokenEndTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.SCRIPT_DATA_END_TAG_NAME)
+
+        else:
+            self._emit_text_run("</", self.State.SCRIPT_DATA, self.script_run)
+
+
+    def _handle_state_script_data_end_tag_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA, self.script_run)
+                self.temporary_buffer = ""
+
+        elif c == "/":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA, self.script_run)
+                self.temporary_buffer = ""
+
+        elif c == ">":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.DATA)
+                self._emit_token()
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA, self.script_run)
+                self.temporary_buffer = ""
+
+        elif c in self.ascii_alpha:
+            self.curr_token.tag_name += c.lower()
+            self.temporary_buffer += c
+
+        else:
+            self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA, self.script_run)
+            self.temporary_buffer = ""
+
+
+    def _handle_state_script_data_escape_start(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPE_START_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        else:
+            self._reconsume_in(self.State.SCRIPT_DATA)
+
+
+    def _handle_state_script_data_escape_start_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        else:
+            self._reconsume_in(self.State.SCRIPT_DATA)
+
+
+    def _handle_state_script_data_escaped(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_escaped_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_DASH_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_escaped_dash_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_LESS_THAN_SIGN)
+
+        elif c == ">":
+            self._switch_to(self.State.SCRIPT_DATA)
+            self._emit_token(HTMLTokenCharacter(">"))
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_escaped_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "/":
+            self.temporary_buffer = ""
+            self._switch_to(self.State.SCRIPT_DATA_ESCAPED_END_TAG_OPEN)
+
+        elif c in self.ascii_alpha:
+            self.temporary_buffer = ""
+            self._emit_token(HTMLTokenCharacter("<"))
+            self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPE_START)
+
+        else:
+            self._emit_text_run("<", self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+
+
+    def _handle_state_script_data_escaped_end_tag_open(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alpha:
+            self.curr_token = HTMLTokenEndTag()
+            self.curr_token.tag_name = ""
+            self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED_END_TAG_NAME)
+
+        else:
+            self._emit_text_run("</", self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+
+
+    def _handle_state_script_data_escaped_end_tag_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+                self.temporary_buffer = ""
+
+        elif c == "/":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+                self.temporary_buffer = ""
+
+        elif c == ">":
+            # if the current end token is an appropriate end tag token
+            if self.curr_token.tag_name == self.last_emitted_start_tag_name:
+                self._switch_to(self.State.DATA)
+                self._emit_token()
+
+            else:
+                self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+                self.temporary_buffer = ""
+
+        elif c in self.ascii_alpha:
+            self.curr_token.tag_name += c.lower()
+            self.temporary_buffer += c
+
+        else:
+            self._emit_text_run("</" + self.temporary_buffer, self.State.SCRIPT_DATA_ESCAPED, self.script_escaped_run)
+            self.temporary_buffer = ""
+
+
+    def _handle_state_script_data_double_escape_start(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            if self.temporary_buffer == "script":
+                self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+            else:
+                self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+                self._emit_token(HTMLTokenCharacter(c))
+
+        elif c in self.ascii_alpha:
+            self.temporary_buffer += c.lower()
+            self._emit_token(HTMLTokenCharacter(c))
+
+        else:
+            self._reconsume_in(self.State.SCRIPT_DATA_ESCAPED)
+
+
+    def _handle_state_script_data_double_escaped(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
+            self._emit_token(HTMLTokenCharacter("<"))
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_double_escaped_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_DASH_DASH)
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
+            self._emit_token(HTMLTokenCharacter("<"))
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_double_escaped_dash_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._emit_token(HTMLTokenCharacter("-"))
+
+        elif c == "<":
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED_LESS_THAN_SIGN)
+            self._emit_token(HTMLTokenCharacter("<"))
+
+        elif c == ">":
+            self._switch_to(self.State.SCRIPT_DATA)
+            self._emit_token(HTMLTokenCharacter(">"))
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+            self._emit_token(HTMLTokenCharacter(u"\ufffd"))
+
+        elif is_eof:
+            self._parse_error("eof-in-script-html-comment-like-text")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+            self._emit_character_run(self.script_escaped_run)
+
+
+    def _handle_state_script_data_double_escaped_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "/":
+            self.temporary_buffer = ""
+            self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPE_END)
+            self._emit_token(HTMLTokenCharacter("/"))
+
+        else:
+            self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+
+
+    def _handle_state_script_data_double_escape_end(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            if self.temporary_buffer == "script":
+                self._switch_to(self.State.SCRIPT_DATA_ESCAPED)
+
+            else:
+                self._switch_to(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+                self._emit_token(HTMLTokenCharacter(c))
+
+        elif c in self.ascii_alpha:
+            self.temporary_buffer += c.lower()
+            self._emit_token(HTMLTokenCharacter(c))
+
+        else:
+            self._reconsume_in(self.State.SCRIPT_DATA_DOUBLE_ESCAPED)
+
+
+    def _handle_state_before_attribute_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c in "/>" or is_eof:
+            self._reconsume_in(self.State.AFTER_ATTRIBUTE_NAME)
+
+        elif c == "=":
+            self._parse_error("unexpected-equals-sign-before-attribute-name")
+            self._start_attribute(c)
+            self._switch_to(self.State.ATTRIBUTE_NAME)
+
+        else:
+            self._start_attribute()
+            self._reconsume_in(self.State.ATTRIBUTE_NAME)
+
+
+    def _handle_state_attribute_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace or c in "/>" or is_eof:
+            self._leave_attribute_name()
+            self._reconsume_in(self.State.AFTER_ATTRIBUTE_NAME)
+
+        elif c == "=":
+            self._leave_attribute_name()
+            self._switch_to(self.State.BEFORE_ATTRIBUTE_VALUE)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_attribute[0] += u"\ufffd"
+
+        elif c in "\"'<":
+            self._parse_error("unexpected-character-in-attribute-name")
+            self.curr_attribute[0] += c.lower()
+
+        else:
+            self.curr_attribute[0] += self._consume_run(self.attribute_name_run).lower()
+
+
+    def _handle_state_after_attribute_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == "/":
+            self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+        elif c == "=":
+            self._switch_to(self.State.BEFORE_ATTRIBUTE_VALUE)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._start_attribute()
+            self._reconsume_in(self.State.ATTRIBUTE_NAME)
+
+
+    def _handle_state_before_attribute_value(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore 
+
+        elif c == "\"":
+            self._switch_to(self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self._switch_to(self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED)
+
+        elif c == ">":
+            self._parse_error("missing-attribute-value")
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        else:
+            self._reconsume_in(self.State.ATTRIBUTE_VALUE_UNQUOTED)
+
+
+    def _handle_state_attribute_value_double_quoted(self, c: str, is_eof: bool):
+        
+        if c == "\"":
+            self._switch_to(self.State.AFTER_ATTRIBUTE_VALUE_QUOTED)
+
+        elif c == "&":
+            self._set_return(self.State.ATTRIBUTE_VALUE_DOUBLE_QUOTED)
+            self._switch_to(self.State.CHARACTER_REFERENCE)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._append_value(u"\ufffd")
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._append_value_run(self.attribute_value_double_run)
+
+
+    def _handle_state_attribute_value_single_quoted(self, c: str, is_eof: bool):
+        
+        if c == "'":
+            self._switch_to(self.State.AFTER_ATTRIBUTE_VALUE_QUOTED)
+
+        elif c == "&":
+            self._set_return(self.State.ATTRIBUTE_VALUE_SINGLE_QUOTED)
+            self._switch_to(self.State.CHARACTER_REFERENCE)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._append_value(u"\ufffd")
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._append_value_run(self.attribute_value_single_run)
+
+
+    def _handle_state_attribute_value_unquoted(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+        elif c == "&":
+            self._set_return(self.State.ATTRIBUTE_VALUE_UNQUOTED)
+            self._switch_to(self.State.CHARACTER_REFERENCE)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self._append_value(u"\ufffd")
+
+        elif c in "\"'<=`":
+            self._parse_error("unexpected-character-in-unquoted-attribute-value")
+            self._append_value_range(self.i - 1, self.i)
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._append_value_run(self.attribute_value_unquoted_run)
+
+
+    def _handle_state_after_attribute_value_quoted(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_ATTRIBUTE_NAME)
+
+        elif c == "/":
+            self._switch_to(self.State.SELF_CLOSING_START_TAG)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-whitespace-between-attributes")
+            self._reconsume_in(self.State.BEFORE_ATTRIBUTE_NAME)
+
+
+    def _handle_state_self_closing_start_tag(self, c: str, is_eof: bool):
+        
+        if c == ">":
+            self.curr_token.self_closing_tag = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-tag")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("unexpected-solidus-in-tag")
+            self._reconsume_in(self.State.BEFORE_ATTRIBUTE_NAME)
+
+
+    def _handle_state_bogus_comment(self, c: str, is_eof: bool):
+        
+        if c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # comment token
+
+        elif is_eof:
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF()) # comment token
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.value_end = self.i
+
+        else:
+            self.i = self.value_end = self.bogus_comment_run.match(self.html_text, self.i, self.end).end()
+
+
+    def _handle_state_markup_declaration_open(self, c: str, is_eof: bool):
+        
+        if self._needs_input(6):
+            pass # wait for "OCTYPE" or "CDATA["
+        
+        elif self.html_text[self.i-1:self.i+1] == "--":
+            self._switch_to(self.State.COMMENT_START)
+            self.i += 1 # consume also the second "-"
+            self._start_comment(self.i)
+
+        elif self.i+5 < self.end and self.html_text[self.i-1:self.i+6].upper() == "DOCTYPE":
+            self._switch_to(self.State.DOCTYPE)
+            self.i += 6 # consume also the rest "OCTYPE" 
+
+        elif self.i+5 < self.end and self.html_text[self.i-1:self.i+6] == "[CDATA[":
+            assert 0, "NOT IMPLEMENTED"
+            # TODO: see https://html.spec.whatwg.org/multipage/parsing.html#markup-declaration-open-state
+            self.i += 6 # consume also the rest "CDATA[" 
+
+        else:
+            self._parse_error("incorrectly-opened-comment")
+            self._start_comment(self.i - 1)
+            self._reconsume_in(self.State.BOGUS_COMMENT)
+            # TODO: is this reconsume or switch I could not get it
+            # see https://html.spec.whatwg.org/multipage/parsing.html#markup-declaration-open-state
+
+
+    def _handle_state_comment_start(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.COMMENT_START_DASH)
+
+        elif c == ">":
+            self._parse_error("abrupt-closing-of-empty-comment")
+            self._switch_to(self.State.DATA)
+            self._emit_token() # comment token
+
+        else:
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment_start_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.COMMENT_END)
+
+        elif c == ">":
+            self._parse_error("abrupt-closing-of-empty-comment")
+            self._switch_to(self.State.DATA)
+            self._emit_token() # comment token
+
+        elif is_eof:
+            self._parse_error("eof-in-comment")
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.value_end = self.i - 1 # "-"
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment(self, c: str, is_eof: bool):
+        
+        if c == "<":
+            self.value_end = self.i
+            self._switch_to(self.State.COMMENT_LESS_THAN_SIGN)
+
+        elif c == "-":
+            self._switch_to(self.State.COMMENT_END_DASH)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.value_end = self.i # replaced in _comment_data()
+
+        elif is_eof:
+            self._parse_error("eof-in-comment")
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.i = self.value_end = self.comment_run.match(self.html_text, self.i, self.end).end()
+
+
+    def _handle_state_comment_less_than_sign(self, c: str, is_eof: bool):
+        
+        if c == "!":
+            self.value_end = self.i
+            self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG)
+
+        elif c == "<":
+            self.value_end = self.i
+
+        else:
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment_less_than_sign_bang(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH)
+
+        else:
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment_less_than_sign_bang_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.COMMENT_LESS_THAN_SIGN_BANG_DASH_DASH)
+
+        else:
+            self._reconsume_in(self.State.COMMENT_END_DASH)
+
+
+    def _handle_state_comment_less_than_sign_bang_dash_dash(self, c: str, is_eof: bool):
+        
+        if c == ">" or is_eof:
+            self._reconsume_in(self.State.COMMENT_END)
+
+        else:
+            self._parse_error("nested-comment")
+            self._reconsume_in(self.State.COMMENT_END)
+
+
+    def _handle_state_comment_end_dash(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self._switch_to(self.State.COMMENT_END)
+
+        elif is_eof:
+            self._parse_error("eof-in-comment")
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.value_end = self.i - 1 # "-"
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment_end(self, c: str, is_eof: bool):
+        
+        if c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif c == "!":
+            self._switch_to(self.State.COMMENT_END_BANG)
+
+        elif c == "-":
+            self.value_end = self.i - 2 # the first of "---"
+
+        elif is_eof:
+            self._parse_error("eof-in-comment")
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.value_end = self.i - 1 # "--"
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_comment_end_bang(self, c: str, is_eof: bool):
+        
+        if c == "-":
+            self.value_end = self.i - 1 # "--!"
+            self._switch_to(self.State.COMMENT_END_DASH)
+
+        elif c == ">":
+            self._parse_error("incorrectly-closed-comment")
+            self._switch_to(self.State.DATA)
+            self._emit_token() # comment token
+
+        elif is_eof:
+            self._parse_error("eof-in-comment")
+            self._emit_token() # comment token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.value_end = self.i - 1 # "--!"
+            self._reconsume_in(self.State.COMMENT)
+
+
+    def _handle_state_doctype(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_DOCTYPE_NAME)
+
+        elif c == ">":
+            self._reconsume_in(self.State.BEFORE_DOCTYPE_NAME)
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token = HTMLTokenDoctype()
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-whitespace-before-doctype-name")
+            self._reconsume_in(self.State.BEFORE_DOCTYPE_NAME)
+
+
+    def _handle_state_before_doctype_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token = HTMLTokenDoctype()
+            self.curr_token.name = u"\ufffd"
+            self._switch_to(self.State.DOCTYPE_NAME)
+
+        elif c == ">":
+            self._parse_error("missing-doctype-name")
+            self.curr_token = HTMLTokenDoctype()
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token = HTMLTokenDoctype()
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token = HTMLTokenDoctype()
+            self.curr_token.name = c.lower()
+            self._switch_to(self.State.DOCTYPE_NAME)
+
+
+    def _handle_state_doctype_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.AFTER_DOCTYPE_NAME)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token.name += u"\ufffd"
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.name += c.lower()
+
+
+    def _handle_state_after_doctype_name(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+
+            if self._needs_input(5):
+                pass # wait for "UBLIC" or "YSTEM"
+
+            elif self.i+4 < self.end and self.html_text[self.i-1:self.i+5].upper() == "PUBLIC":
+                self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_KEYWORD)
+                self.i += 5 # consume the rest "UBLIC"
+
+            elif self.i+4 < self.end and self.html_text[self.i-1:self.i+5].upper() == "SYSTEM":
+                self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_KEYWORD)
+                self.i += 5 # consume the rest "YSTEM"
+
+            else:
+                self._parse_error("invalid-character-sequence-after-doctype-name")
+                self.curr_token.force_quirks = 1
+                self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_after_doctype_public_keyword(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_DOCTYPE_PUBLIC_IDENTIFIER)
+
+        elif c == "\"":
+            self._parse_error("missing-whitespace-after-doctype-public-keyword")
+            self.curr_token.public_identifier = ""
+            self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self._parse_error("missing-whitespace-after-doctype-public-keyword")
+            self.curr_token.public_identifier = ""
+            self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_SINGLE_QUOTED)
+
+        elif c == ">":
+            self._parse_error("missing-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_before_doctype_public_identifier(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == "\"":
+            self.curr_token.public_identifier = ""
+            self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self.curr_token.public_identifier = ""
+            self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_SINGLE_QUOTED)
+
+        elif c == ">":
+            self._parse_error("missing-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_doctype_public_identifier_double_quoted(self, c: str, is_eof: bool):
+        
+        if c == "\"":
+            self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_IDENTIFIER)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token.public_identifier += u"\ufffd"
+
+        elif c == ">":
+            self._parse_error("abrupt-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.public_identifier += c
+
+
+    def _handle_state_doctype_public_identifier_single_quoted(self, c: str, is_eof: bool):
+        
+        if c == "'":
+            self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_IDENTIFIER)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token.public_identifier += u"\ufffd"
+
+        elif c == ">":
+            self._parse_error("abrupt-doctype-public-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
 
-                elif c == "!":
-                    self._switch_to(self.State.COMMENT_END_BANG)
-                
-                elif c == "-":
-                    self.curr_token.data += "-"
-                    
-                elif is_eof:
-                    self._parse_error("eof-in-comment")
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.data += "--"
-                    self._reconsume_in(self.State.COMMENT)
-                    
-            elif self.state == self.State.COMMENT_END_BANG:
-                
-                if c == "-":
-                    self.curr_token.data += "--!"
-                    self._switch_to(self.State.COMMENT_END_DASH)
-                
-                elif c == ">":
-                    self._parse_error("incorrectly-closed-comment")
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # comment token
-                    
-                elif is_eof:
-                    self._parse_error("eof-in-comment")
-                    yield self._emit_token() # comment token
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.data += "--!"
-                    self.return_state(self.State.COMMENT)
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.public_identifier += c
+
+
+    def _handle_state_after_doctype_public_identifier(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BETWEEN_DOCTYPE_PUBLIC_AND_SYSTEM_IDENTIFIERS)
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif c == "\"":
+            self._parse_error("missing-whitespace-between-doctype-public-and-system-identifiers")
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self._parse_error("missing-whitespace-between-doctype-public-and-system-identifiers")
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_between_doctype_public_and_system_identifiers(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif c == "\"":
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_after_doctype_system_keyword(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            self._switch_to(self.State.BEFORE_DOCTYPE_SYSTEM_IDENTIFIER)
+
+        elif c == "\"":
+            self._parse_error("missing-whitespace-after-doctype-system-keyword")
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self._parse_error("missing-whitespace-after-doctype-system-keyword")
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
+
+        elif c == ">":
+            self._parse_error("missing-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_before_doctype_system_identifier(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == "\"":
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
+
+        elif c == "'":
+            self.curr_token.system_identifier = ""
+            self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
+
+        elif c == ">":
+            self._parse_error("missing-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("missing-quote-before-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_doctype_system_identifier_double_quoted(self, c: str, is_eof: bool):
+        
+        if c == "\"":
+            self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_IDENTIFIER)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token.system_identifier = u"\ufffd"
+
+        elif c == ">":
+            self._parse_error("abrupt-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.system_identifier += c
+
+
+    def _handle_state_doctype_system_identifier_single_quoted(self, c: str, is_eof: bool):
+        
+        if c == "'":
+            self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_IDENTIFIER)
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            self.curr_token.system_identifier = u"\ufffd"
+
+        elif c == ">":
+            self._parse_error("abrupt-doctype-system-identifier")
+            self.curr_token.force_quirks = 1
+            self._switch_to(self.State.DATA)
+            self._emit_token()
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self.curr_token.system_identifier += c
+
+
+    def _handle_state_after_doctype_system_identifier(self, c: str, is_eof: bool):
+        
+        if c in self.whitespace:
+            pass # ignore
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif is_eof:
+            self._parse_error("eof-in-doctype")
+            self.curr_token.force_quirks = 1
+            self._emit_token()
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._parse_error("unexpected-character-after-doctype-system-identifier")
+            self._reconsume_in(self.State.BOGUS_DOCTYPE)
+
+
+    def _handle_state_bogus_doctype(self, c: str, is_eof: bool):
+        
+        if c == ">":
+            self._switch_to(self.State.DATA)
+            self._emit_token() # doctype token
+
+        elif c == "\0":
+            self._parse_error("unexpected-null-character")
+            pass # ignore
+
+        elif is_eof:
+            self._emit_token() # doctype token
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            pass # ignore
+
+
+    def _handle_state_cdata_section(self, c: str, is_eof: bool):
+        
+        if c == "]":
+            self._switch_to(self.State.CDATA_SECTION_BRACKET)
+
+        elif is_eof:
+            self._parse_error("eof-in-cdata")
+            self._emit_token(HTMLTokenEOF())
+
+        else:
+            self._emit_token(HTMLTokenCharacter(c))
+
+
+    def _handle_state_cdata_section_bracket(self, c: str, is_eof: bool):
+        
+        if c == "]":
+            self._switch_to(self.State.CDATA_SECTION_END)
+
+        else:
+            self._emit_token(HTMLTokenCharacter("]"))
+            self._reconsume_in(self.State.CDATA_SECTION)
+
+
+    def _handle_state_cdata_section_end(self, c: str, is_eof: bool):
+        
+        if c == "]":
+            self._emit_token(HTMLTokenCharacter("]"))
+
+        elif c == ">":
+            self._switch_to(self.State.DATA)
+
+        else:
+            self._emit_token(HTMLTokenCharacter("]"))
+            self._emit_token(HTMLTokenCharacter("]"))
+            self._reconsume_in(self.State.CDATA_SECTION)
+
+
+    def _handle_state_character_reference(self, c: str, is_eof: bool):
+        
+        self.temporary_buffer = "&"
+        
+        if c in self.ascii_alphanumeric:
+            self._reconsume_in(self.State.NAMED_CHARACTER_REFERENCE)
+
+        elif c == "#":
+            self.temporary_buffer += c
+            self._switch_to(self.State.NUMERIC_CHARACTER_REFERENCE)
+
+        else:
+            self._flush_character_reference()
+            self._reconsume_in(self.return_state)
+
+
+    def _handle_state_named_character_reference(self, c: str, is_eof: bool):
+        
+        # walk the trie from the current char, remembering the longest name
+        # that ends on the way
+        start = self.i - 1
+        node = named_character_references
+        match_end = None
+        
+        j = start
+        while j < self.end:
+            node = node.get(self.html_text[j])
+            if node is None:
+                break
+            j += 1
+            if "" in node:
+                match_end = j
+                chars = node[""]
+        
+        else:
+            if not self.closed:
+                # a longer name may end in the input that is not received yet
+                self._pause()
+                return
+        
+        if match_end is None:
+            self._flush_character_reference()
+            self._reconsume_in(self.State.AMBIGUOUS_AMPERSAND)
+            return
+        
+        self.i = match_end
+        self.temporary_buffer += self.html_text[start:match_end]
+        
+        next_c = self.html_text[match_end:min(match_end+1, self.end)]
+        
+        if self._consumed_as_part_of_an_attribute() and self.temporary_buffer[-1] != ";" and \
+                next_c and (next_c == "=" or next_c in self.ascii_alphanumeric):
+            # for historical reasons
+            self._flush_character_reference()
+            self._switch_to(self.return_state)
+        
+        else:
+            if self.temporary_buffer[-1] != ";":
+                self._parse_error("missing-semicolon-after-character-reference")
             
-            elif self.state == self.State.DOCTYPE:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_DOCTYPE_NAME)
-                
-                elif c == ">":
-                    self._reconsume_in(self.State.BEFORE_DOCTYPE_NAME)
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token = HTMLTokenDoctype()
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-whitespace-before-doctype-name")
-                    self._reconsume_in(self.State.BEFORE_DOCTYPE_NAME)
-                    
-            elif self.state == self.State.BEFORE_DOCTYPE_NAME:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                    
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token = HTMLTokenDoctype()
-                    self.curr_token.name = u"\ufffd"
-                    self._switch_to(self.State.DOCTYPE_NAME)
-                    
-                elif c == ">":
-                    self._parse_error("missing-doctype-name")
-                    self.curr_token = HTMLTokenDoctype()
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token = HTMLTokenDoctype()
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                                    
-                else:
-                    self.curr_token = HTMLTokenDoctype()
-                    self.curr_token.name = c.lower()
-                    self._switch_to(self.State.DOCTYPE_NAME)
+            self.temporary_buffer = chars
+            self._flush_character_reference()
+            self._switch_to(self.return_state)
+
+
+    def _handle_state_ambiguous_ampersand(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_alphanumeric:
+            if self._consumed_as_part_of_an_attribute():
+                self._append_value(c)
+            else:
+                self._emit_token(HTMLTokenCharacter(c))
+
+        elif c == ";":
+            self._parse_error("unknown-named-character-reference")
+            self._reconsume_in(self.return_state)
+
+        else:
+            self._reconsume_in(self.return_state)
+
+
+    def _handle_state_numeric_character_reference(self, c: str, is_eof: bool):
+        
+        self.character_reference_code = 0
+        
+        if c in "xX":
+            self.temporary_buffer += c
+            self._switch_to(self.State.HEXADECIMAL_CHARACTER_REFERENCE_START)
+
+        else:
+            self._reconsume_in(self.State.DECIMAL_CHARACTER_REFERENCE_START)
+
+
+    def _handle_state_hexadecimal_character_reference_start(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_hex_digit:
+            self._reconsume_in(self.State.HEXADECIMAL_CHARACTER_REFERENCE)
+
+        else:
+            self._parse_error("absence-of-digits-in-numeric-character-reference")
+            self._flush_character_reference()
+            self._reconsume_in(self.return_state)
+
+
+    def _handle_state_decimal_character_reference_start(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_digit:
+            self._reconsume_in(self.State.DECIMAL_CHARACTER_REFERENCE)
+
+        else:
+            self._parse_error("absence-of-digits-in-numeric-character-reference")
+            self._flush_character_reference()
+            self._reconsume_in(self.return_state)
+
+
+    def _handle_state_hexadecimal_character_reference(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_hex_digit:
+            self.character_reference_code = self.character_reference_code * 16 + int(c, 16)
+
+        elif c == ";":
+            self._switch_to(self.State.NUMERIC_CHARACTER_REFERENCE_END)
+
+        else:
+            self._parse_error("missing-semicolon-after-character-reference")
+            self._reconsume_in(self.State.NUMERIC_CHARACTER_REFERENCE_END)
+
+
+    def _handle_state_decimal_character_reference(self, c: str, is_eof: bool):
+        
+        if c in self.ascii_digit:
+            self.character_reference_code = self.character_reference_code * 10 + int(c)
+
+        elif c == ";":
+            self._switch_to(self.State.NUMERIC_CHARACTER_REFERENCE_END)
+
+        else:
+            self._parse_error("missing-semicolon-after-character-reference")
+            self._reconsume_in(self.State.NUMERIC_CHARACTER_REFERENCE_END)
+
+
+    def _handle_state_numeric_character_reference_end(self, c: str, is_eof: bool):
+        
+        code = self.character_reference_code
+        
+        if code == 0:
+            self._parse_error("null-character-reference")
+            code = 0xFFFD
+
+        elif code > 0x10FFFF:
+            self._parse_error("character-reference-outside-unicode-range")
+            code = 0xFFFD
+
+        elif 0xD800 <= code <= 0xDFFF:
+            self._parse_error("surrogate-character-reference")
+            code = 0xFFFD
+
+        elif 0xFDD0 <= code <= 0xFDEF or code & 0xFFFE == 0xFFFE:
+            self._parse_error("noncharacter-character-reference")
+
+        elif code == 0x0D or (code <= 0x1F or 0x7F <= code <= 0x9F) and chr(code) not in self.whitespace:
+            self._parse_error("control-character-reference")
+            code = numeric_character_references.get(code, code)
+        
+        self.temporary_buffer = chr(code)
+        self._flush_character_reference()
+        
+        # the end state does not consume a char
+        self._reconsume_in(self.return_state)
+
+
+    def _tokenize(self) -> _Generator[HTMLToken, None, None]:
+        
+        handlers = self._state_handlers
+        emitted_tokens = self.emitted_tokens
+        
+        if self.character_run:
+            # continue the run from the previous input
+            self._emit_character_run(self.character_run_pattern, self.i)
+            yield from emitted_tokens
+            emitted_tokens.clear()
+        
+        while 1:
             
-            elif self.state == self.State.DOCTYPE_NAME:
+            is_eof = 0
             
-                if c in self.whitespace:
-                    self._switch_to(self.State.AFTER_DOCTYPE_NAME)
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.name += u"\ufffd"
+            if self.i < self.end:
+                # consume the current input char
+                c = self.html_text[self.i]
+                self.i += 1
                 
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.name += c.lower()
+                if c == "\r":
+                    # "\r\n" and "\r" are consumed as "\n", the input never
+                    # ends with "\r" before it is closed (see feed())
+                    c = "\n"
+                    if self.html_text.startswith("\n", self.i):
+                        self.i += 1
             
-            elif self.state == self.State.AFTER_DOCTYPE_NAME:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                
-                    if self.i+4 < len(html_text) and html_text[self.i-1:self.i+5].upper() == "PUBLIC":
-                        self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_KEYWORD)
-                        self.i += 5 # consume the rest "UBLIC"
-                    
-                    elif self.i+4 < len(html_text) and html_text[self.i-1:self.i+5].upper() == "SYSTEM":
-                        self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_KEYWORD)
-                        self.i += 5 # consume the rest "YSTEM"
-                    
-                    else:
-                        self._parse_error("invalid-character-sequence-after-doctype-name")
-                        self.curr_token.force_quirks = 1
-                        self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                        
-            elif self.state == self.State.AFTER_DOCTYPE_PUBLIC_KEYWORD:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_DOCTYPE_PUBLIC_IDENTIFIER)
-                
-                elif c == "\"":
-                    self._parse_error("missing-whitespace-after-doctype-public-keyword")
-                    self.curr_token.public_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self._parse_error("missing-whitespace-after-doctype-public-keyword")
-                    self.curr_token.public_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_SINGLE_QUOTED)
-                    
-                elif c == ">":
-                    self._parse_error("missing-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-quote-before-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
+            elif self.closed and self.i == self.end:
+                # consume EOF, reconsuming it moves self.i back here
+                c = "EOF" # will not be used
+                is_eof = 1
+                self.i += 1
             
-            elif self.state == self.State.BEFORE_DOCTYPE_PUBLIC_IDENTIFIER:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                
-                elif c == "\"":
-                    self.curr_token.public_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self.curr_token.public_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_PUBLIC_IDENTIFIER_SINGLE_QUOTED)
-                    
-                elif c == ">":
-                    self._parse_error("missing-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-quote-before-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                
-            elif self.state == self.State.DOCTYPE_PUBLIC_IDENTIFIER_DOUBLE_QUOTED:
-                
-                if c == "\"":
-                    self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_IDENTIFIER)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.public_identifier += u"\ufffd"
-                
-                elif c == ">":
-                    self._parse_error("abrupt-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.public_identifier += c
-                    
-            elif self.state == self.State.DOCTYPE_PUBLIC_IDENTIFIER_SINGLE_QUOTED:
-                
-                if c == "'":
-                    self._switch_to(self.State.AFTER_DOCTYPE_PUBLIC_IDENTIFIER)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.public_identifier += u"\ufffd"
-                
-                elif c == ">":
-                    self._parse_error("abrupt-doctype-public-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self.curr_token.public_identifier += c
+            else:
+                break # until more input is fed or EOF is consumed
             
-            elif self.state == self.State.AFTER_DOCTYPE_PUBLIC_IDENTIFIER:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BETWEEN_DOCTYPE_PUBLIC_AND_SYSTEM_IDENTIFIERS)
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                
-                elif c == "\"":
-                    self._parse_error("missing-whitespace-between-doctype-public-and-system-identifiers")
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self._parse_error("missing-whitespace-between-doctype-public-and-system-identifiers")
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self._parse_error("missing-quote-before-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                    
-            elif self.state == self.State.BETWEEN_DOCTYPE_PUBLIC_AND_SYSTEM_IDENTIFIERS:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                
-                elif c == "\"":
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-quote-before-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                    
-            elif self.state == self.State.AFTER_DOCTYPE_SYSTEM_KEYWORD:
-                
-                if c in self.whitespace:
-                    self._switch_to(self.State.BEFORE_DOCTYPE_SYSTEM_IDENTIFIER)
-                
-                elif c == "\"":
-                    self._parse_error("missing-whitespace-after-doctype-system-keyword")
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self._parse_error("missing-whitespace-after-doctype-system-keyword")
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
-                
-                elif c == ">":
-                    self._parse_error("missing-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-quote-before-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                    
-            elif self.state == self.State.BEFORE_DOCTYPE_SYSTEM_IDENTIFIER:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                
-                elif c == "\"":
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED)
-                
-                elif c == "'":
-                    self.curr_token.system_identifier = ""
-                    self._switch_to(self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED)
-                
-                elif c == ">":
-                    self._parse_error("missing-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("missing-quote-before-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
-                    
-            elif self.state == self.State.DOCTYPE_SYSTEM_IDENTIFIER_DOUBLE_QUOTED:
-                
-                if c == "\"":
-                    self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_IDENTIFIER)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.system_identifier = u"\ufffd"
-                
-                elif c == ">":
-                    self._parse_error("abrupt-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.system_identifier += c
-                    
-            elif self.state == self.State.DOCTYPE_SYSTEM_IDENTIFIER_SINGLE_QUOTED:
-                
-                if c == "'":
-                    self._switch_to(self.State.AFTER_DOCTYPE_SYSTEM_IDENTIFIER)
-                
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    self.curr_token.system_identifier = u"\ufffd"
-                
-                elif c == ">":
-                    self._parse_error("abrupt-doctype-system-identifier")
-                    self.curr_token.force_quirks = 1
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token()
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                    
-                else:
-                    self.curr_token.system_identifier += c
-                    
-            elif self.state == self.State.AFTER_DOCTYPE_SYSTEM_IDENTIFIER:
-                
-                if c in self.whitespace:
-                    pass # ignore
-                    
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                
-                elif is_eof:
-                    self._parse_error("eof-in-doctype")
-                    self.curr_token.force_quirks = 1
-                    yield self._emit_token()
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    self._parse_error("unexpected-character-after-doctype-system-identifier")
-                    self._reconsume_in(self.State.BOGUS_DOCTYPE)
+            # dispatch to the handler of the current state
+            handlers[self.state](self, c, is_eof)
             
-            elif self.state == self.State.BOGUS_COMMENT:
-                
-                if c == ">":
-                    self._switch_to(self.State.DATA)
-                    yield self._emit_token() # doctype token
-                    
-                elif c == "\0":
-                    self._parse_error("unexpected-null-character")
-                    pass # ignore
+            # pass the emitted tokens (if any) to the consumer
+            if emitted_tokens:
+                yield from emitted_tokens
+                emitted_tokens.clear()
             
-                elif is_eof:
-                    yield self._emit_token() # doctype token
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    pass # ignore
+            if self.paused:
+                self.paused = 0
+                break
+    
+    
+    def _tokenize_instrumented(self) -> _Generator[HTMLToken, None, None]:
+        
+        # same as _tokenize() but the chars consumed, the time and the
+        # tokens emitted are recorded in self.stats for each handler call
+        handlers = self._state_handlers
+        emitted_tokens = self.emitted_tokens
+        record = self.stats.record
+        clock = _perf_counter_ns
+        
+        if self.character_run:
+            state, i, time = self.state, self.i, clock()
+            self._emit_character_run(self.character_run_pattern, self.i)
+            record(state.name, state.name, self.i - i, clock() - time, emitted_tokens)
+            yield from emitted_tokens
+            emitted_tokens.clear()
+        
+        while 1:
             
-            elif self.state == self.State.CDATA_SECTION:
-                
-                if c == "]":
-                    self._switch_to(self.State.CDATA_SECTION_BRACKET)
-                
-                elif is_eof:
-                    self._parse_error("eof-in-cdata")
-                    yield self._emit_token(HTMLTokenEOF())
-                
-                else:
-                    yield self._emit_token(HTMLTokenCharacter(c))
+            is_eof = 0
+            i = self.i
             
-            elif self.state == self.State.CDATA_SECTION_BRACKET:
-                
-                if c == "]":
-                    self._switch_to(self.State.CDATA_SECTION_END)
+            if self.i < self.end:
+                c = self.html_text[self.i]
+                self.i += 1
                 
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("]"))
-                    self._reconsume_in(self.State.CDATA_SECTION)
-            
-            elif self.state == self.State.CDATA_SECTION_END:
-            
-                if c == "]":
-                    yield self._emit_token(HTMLTokenCharacter("]"))
-                    
-                elif c == ">":
-                    self._switch_to(self.State.DATA)
-                    
-                else:
-                    yield self._emit_token(HTMLTokenCharacter("]"))
-                    yield self._emit_token(HTMLTokenCharacter("]"))
-                    self._reconsume_in(self.State.CDATA_SECTION)
-            
-            elif self.state == self.State.CHARACTER_REFERENCE:
-                assert 0, "NOT IMPLEMENTED"
+                if c == "\r":
+                    c = "\n"
+                    if self.html_text.startswith("\n", self.i):
+                        self.i += 1
             
-            elif self.state == self.State.NAMED_CHARACTER_REFERENCE:
-                assert 0, "NOT IMPLEMENTED"
-            
-            elif self.state == self.State.AMBIGUOUS_AMPERSAND:
-                assert 0, "NOT IMPLEMENTED"
-            
-            elif self.state == self.State.NUMERIC_CHARACTER_REFERENCE:
-                assert 0, "NOT IMPLEMENTED"
-            
-            elif self.state == self.State.HEXADECIMAL_CHARACTER_REFERENCE_START:
-                assert 0, "NOT IMPLEMENTED"
-            
-            elif self.state == self.State.DECIMAL_CHARACTER_REFERENCE_START:
-                assert 0, "NOT IMPLEMENTED"
+            elif self.closed and self.i == self.end:
+                c = "EOF" # will not be used
+                is_eof = 1
+                self.i += 1
             
-            elif self.state == self.State.HEXADECIMAL_CHARACTER_REFERENCE:
-                assert 0, "NOT IMPLEMENTED"
+            else:
+                break
             
-            elif self.state == self.State.DECIMAL_CHARACTER_REFERENCE:
-                assert 0, "NOT IMPLEMENTED"
+            state, time = self.state, clock()
+            handlers[state](self, c, is_eof)
+            record(state.name, self.state.name, self.i - i, clock() - time, emitted_tokens)
             
-            elif self.state == self.State.NUMERIC_CHARACTER_REFERENCE_END:
-                assert 0, "NOT IMPLEMENTED"
+            if emitted_tokens:
+                yield from emitted_tokens
+                emitted_tokens.clear()
             
-            else:
-                assert 0, "UNREACHABLE"
-            
\ No newline at end of file
+            if self.paused:
+                self.paused = 0
+                break
+    
+    
+    def feed(self, html_chunk: str) -> _Generator[HTMLToken, None, None]:
+        
+        # hold back trailing whitespace, it is stripped if the input ends
+        # there and a trailing "\r" may be followed by "\n" in the next chunk,
+        # nothing more is ready to tokenize if the chunk is only whitespace
+        if not html_chunk or html_chunk.isspace():
+            self.held_back.append(html_chunk)
+            return self._tokenize() if self.stats is None else self._tokenize_instrumented()
+        
+        if self.held_back:
+            html_chunk = "".join(self.held_back) + html_chunk
+            self.held_back.clear()
+        
+        # the range of the value that is built moves to value_pieces, so
+        # the input of a long value is not copied again with every chunk
+        if self.value_start is not None and self.value_start != self.value_end:
+            self.value_pieces.append(self.html_text[self.value_start:self.value_end])
+            self.value_start = self.value_end
+        
+        # drop the consumed input (but the chars after the value that may
+        # still be added to it), the chunk is not copied if all the previous
+        # input is dropped
+        drop = self.i if self.value_start is None else min(self.i, self.value_start)
+        
+        self.errors.advance(self.html_text, drop, self.offset)
+        self.offset += drop
+        
+        html_text = self.html_text[drop:] + html_chunk
+        self.i -= drop
+        
+        if self.value_start is not None:
+            self.value_start -= drop
+            self.value_end -= drop
+        
+        # only the whitespace at the end of the chunk is scanned
+        end = len(html_text)
+        while html_text[end-1].isspace():
+            end -= 1
+        
+        if not self.started:
+            self.i = self.leading_whitespace.match(html_text, 0, end).end()
+            self.started = 1
+        
+        self.html_text = html_text
+        self.end = end
+        
+        return self._tokenize() if self.stats is None else self._tokenize_instrumented()
+    
+    
+    def close(self) -> _Generator[HTMLToken, None, None]:
+        
+        # trailing whitespace (after self.end) is stripped
+        self.closed = 1
+        
+        return self._tokenize() if self.stats is None else self._tokenize_instrumented()
+    
+    
+    def run(self, html_text: str|bytes|memoryview|_BinaryIO, encoding: str = None) -> _Generator[HTMLToken, None, None]:
+        
+        if isinstance(html_text, str):
+            yield from self.feed(html_text)
+        
+        else:
+            # sniff the encoding and decode the bytes chunk by chunk as they are tokenized
+            self.input_stream = HTMLInputStream(html_text, encoding)
+            for html_chunk in self.input_stream.decode():
+                yield from self.feed(html_chunk)
+        
+        yield from self.close()
+    
+    
+# state -> handler table, built once so that run() does a single lookup per char
+HTMLTokenizer._state_handlers = {state: getattr(HTMLTokenizer, f"_handle_state_{state.name.lower()}") for state in HTMLTokenizer.State}